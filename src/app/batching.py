@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import asyncio
+import math
+from dataclasses import dataclass
+from typing import Any, Callable, List, Optional, Set
+
+from src.app.metrics import MICRO_BATCH_QUEUE_WAIT, MICRO_BATCH_SIZE
+
+
+@dataclass
+class _Pending:
+    item: Any
+    future: asyncio.Future
+    enqueued: float
+    deadline: float
+
+
+class MicroBatcher:
+    """
+    Groups items submitted within a short window into one worker-thread call.
+
+    A batch is dispatched when ``max_batch_size`` items are waiting or
+    ``max_wait_seconds`` after the first of them arrived, whichever comes
+    first. ``run_batch`` receives the items in arrival order and must return
+    one result per item. Items whose caller gave up, or whose deadline passed
+    while queued, are dropped before the batch runs; an exception from
+    ``run_batch`` is raised to every caller in that batch. Must be used from a
+    single event loop.
+    """
+
+    def __init__(
+        self,
+        run_batch: Callable[[List[Any]], List[Any]],
+        *,
+        max_batch_size: int,
+        max_wait_seconds: float,
+    ) -> None:
+        self.run_batch = run_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait_seconds = max(0.0, max_wait_seconds)
+        self._pending: List[_Pending] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def submit(self, item: Any, timeout: Optional[float] = None) -> Any:
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        deadline = now + timeout if timeout is not None and timeout >= 0 else math.inf
+        future = loop.create_future()
+        self._pending.append(_Pending(item, future, now, deadline))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush(loop)
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait_seconds, self._flush, loop)
+        return await future
+
+    def _flush(self, loop: asyncio.AbstractEventLoop) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self._pending:
+            batch = self._pending[: self.max_batch_size]
+            self._pending = self._pending[self.max_batch_size :]
+            task = loop.create_task(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[_Pending]) -> None:
+        now = asyncio.get_running_loop().time()
+        live: List[_Pending] = []
+        for pending in batch:
+            if pending.future.done():
+                continue
+            if pending.deadline <= now:
+                pending.future.set_exception(TimeoutError())
+                continue
+            MICRO_BATCH_QUEUE_WAIT.observe(now - pending.enqueued)
+            live.append(pending)
+        if not live:
+            return
+        MICRO_BATCH_SIZE.observe(len(live))
+        try:
+            results = await asyncio.to_thread(
+                self.run_batch, [pending.item for pending in live]
+            )
+        except Exception as exc:
+            for pending in live:
+                if not pending.future.done():
+                    pending.future.set_exception(exc)
+            return
+        for pending, result in zip(live, results):
+            if not pending.future.done():
+                pending.future.set_result(result)
@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+
+def normalize_query(query: str) -> str:
+    """Cache-key form of a query: surrounding and repeated whitespace removed."""
+    return " ".join(query.split())
+
+
+class LRUCache:
+    """
+    Bounded least-recently-used cache with an optional per-entry TTL.
+
+    Every operation takes a lock, so one instance can be shared by the event
+    loop and the ``asyncio.to_thread`` workers. ``maxsize <= 0`` disables it.
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl_seconds: Optional[float] = None,
+        *,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds if ttl_seconds and ttl_seconds > 0 else None
+        self._clock = clock
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < self._clock():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        if self.maxsize <= 0:
+            return
+        expires = (
+            self._clock() + self.ttl_seconds if self.ttl_seconds else float("inf")
+        )
+        with self._lock:
+            self._entries[key] = (expires, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class VersionedCache:
+    """
+    LRU cache whose entries belong to one index version at a time.
+
+    Lookups under any other version miss, and the first write under a new
+    version drops everything cached for the old one, so results never outlive
+    the index that produced them.
+    """
+
+    def __init__(self, maxsize: int) -> None:
+        self._cache = LRUCache(maxsize)
+        self._version: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    def get(self, version: str, key: Hashable) -> Optional[Any]:
+        if version != self._version:
+            return None
+        return self._cache.get((version, key))
+
+    def put(self, version: str, key: Hashable, value: Any) -> None:
+        with self._lock:
+            if version != self._version:
+                self._cache.clear()
+                self._version = version
+            self._cache.put((version, key), value)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+            self._version = None
@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical calls onto one in-flight computation.
+
+    The first caller for a key starts the work; callers that arrive while it
+    is running await the same future. Every caller gets the shared future
+    behind ``asyncio.shield``, so one caller timing out or disconnecting does
+    not cancel the work the others are waiting on. Errors reach every waiter.
+    Must be used from a single event loop.
+    """
+
+    def __init__(self) -> None:
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    def start(
+        self, key: Hashable, factory: Callable[[], Awaitable[Any]]
+    ) -> tuple[Awaitable[Any], bool]:
+        """Return ``(awaitable, shared)``; ``shared`` is True for joined calls."""
+        call = self._calls.get(key)
+        shared = call is not None
+        if call is None:
+            call = asyncio.ensure_future(factory())
+            self._calls[key] = call
+            call.add_done_callback(lambda done: self._finish(key, done))
+        return asyncio.shield(call), shared
+
+    def _finish(self, key: Hashable, call: asyncio.Future) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
+        if not call.cancelled():
+            # Mark the exception retrieved when every waiter already gave up.
+            call.exception()
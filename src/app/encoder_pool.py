@@ -0,0 +1,268 @@
+from __future__ import annotations
+
+import multiprocessing
+import os
+import queue
+import sys
+import threading
+from dataclasses import dataclass
+from multiprocessing.connection import Connection
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Callable, List, Optional, Sequence
+
+import numpy as np
+
+_THREAD_ENV_VARS = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS")
+
+
+def _load_sentence_transformer(model_name: str):
+    from sentence_transformers import SentenceTransformer
+
+    return SentenceTransformer(model_name)
+
+
+def _attach(name: str) -> SharedMemory:
+    # The parent owns the block; keep the child's resource tracker out of it.
+    if sys.version_info >= (3, 13):
+        return SharedMemory(name=name, track=False)
+    from multiprocessing import resource_tracker
+
+    shm = SharedMemory(name=name)
+    resource_tracker.unregister(shm._name, "shared_memory")  # type: ignore[attr-defined]
+    return shm
+
+
+def _embedding_dim(model) -> int:
+    get_dim = getattr(model, "get_sentence_embedding_dimension", None)
+    dim = get_dim() if get_dim is not None else None
+    if not dim:
+        dim = np.asarray(model.encode(["dimension probe"], show_progress_bar=False)).shape[1]
+    return int(dim)
+
+
+def _worker_main(
+    conn: Connection,
+    model_name: str,
+    threads: int,
+    model_factory: Callable[[str], Any],
+) -> None:
+    for var in _THREAD_ENV_VARS:
+        os.environ[var] = str(threads)
+    try:
+        import torch
+
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    shm = None
+    try:
+        model = model_factory(model_name)
+        dim = _embedding_dim(model)
+        conn.send(("ready", dim))
+        _, name, max_rows = conn.recv()
+        shm = _attach(name)
+        out = np.ndarray((max_rows, dim), dtype=np.float32, buffer=shm.buf)
+        while True:
+            message = conn.recv()
+            if message is None:
+                break
+            _, texts, normalize = message
+            try:
+                vectors = model.encode(
+                    texts, normalize_embeddings=normalize, show_progress_bar=False
+                )
+                vectors = np.asarray(vectors, dtype=np.float32)
+                out[: len(vectors)] = vectors
+                conn.send(("ok", len(vectors)))
+            except Exception as exc:  # reported to the caller, worker keeps serving
+                conn.send(("error", f"{type(exc).__name__}: {exc}"))
+        del out
+    except (EOFError, KeyboardInterrupt):
+        pass
+    except Exception as exc:
+        conn.send(("error", f"{type(exc).__name__}: {exc}"))
+    finally:
+        if shm is not None:
+            shm.close()
+        conn.close()
+
+
+@dataclass
+class _Worker:
+    process: multiprocessing.process.BaseProcess
+    conn: Connection
+    shm: SharedMemory
+    out: np.ndarray
+
+
+class EncoderPool:
+    """
+    Query encoder running in worker processes instead of the API threads.
+
+    Each of ``workers`` processes loads ``model_name`` (through
+    ``model_factory``, SentenceTransformer by default) with its intra-op
+    thread count capped at ``threads_per_worker``, so encoding neither holds
+    the API process's GIL nor oversubscribes its cores. Texts go to a worker
+    over a pipe; vectors come back through a shared-memory buffer owned by the
+    parent (one per worker, ``max_rows`` rows), and are copied out once.
+
+    ``encode`` matches ``SentenceTransformer.encode`` for the arguments the
+    service uses and is safe to call from many threads; each call holds one
+    idle worker until it returns. A worker whose process dies fails the call
+    it was serving and is replaced by a fresh process; if no replacement can
+    start and none are left, later calls raise at once instead of waiting.
+    After ``close`` no worker is replaced and ``encode`` raises RuntimeError.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        *,
+        workers: int,
+        threads_per_worker: int = 1,
+        max_rows: int = 64,
+        model_factory: Callable[[str], Any] = _load_sentence_transformer,
+        start_method: str = "spawn",
+    ) -> None:
+        if workers <= 0:
+            raise ValueError("workers must be > 0")
+        self.model_name = model_name
+        self.max_rows = max(1, max_rows)
+        self.dim = 0
+        self._workers: List[_Worker] = []
+        self._idle: queue.Queue[Optional[_Worker]] = queue.Queue()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._context = multiprocessing.get_context(start_method)
+        self._threads = max(1, threads_per_worker)
+        self._model_factory = model_factory
+        pending = [self._start_process() for _ in range(workers)]
+        try:
+            for process, conn in pending:
+                worker = self._handshake(process, conn)
+                self._workers.append(worker)
+                self._idle.put(worker)
+        except BaseException:
+            for process, conn in pending:
+                process.kill()
+                conn.close()
+            self.close()
+            raise
+
+    def _start_process(self) -> tuple[multiprocessing.process.BaseProcess, Connection]:
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(
+            target=_worker_main,
+            args=(child_conn, self.model_name, self._threads, self._model_factory),
+            daemon=True,
+        )
+        process.start()
+        child_conn.close()
+        return process, parent_conn
+
+    def _handshake(self, process, conn: Connection) -> _Worker:
+        try:
+            status, payload = conn.recv()
+        except (EOFError, OSError) as exc:
+            raise RuntimeError("encoder worker exited during startup") from exc
+        if status != "ready":
+            raise RuntimeError(f"encoder worker failed to start: {payload}")
+        self.dim = payload
+        shm = SharedMemory(create=True, size=self.max_rows * self.dim * 4)
+        conn.send(("buffer", shm.name, self.max_rows))
+        out = np.ndarray((self.max_rows, self.dim), dtype=np.float32, buffer=shm.buf)
+        return _Worker(process, conn, shm, out)
+
+    def _replace(self, dead: _Worker) -> None:
+        """Release a worker whose process died and start a replacement."""
+        with self._lock:
+            if self._closed:
+                # ``close`` took every worker, ``dead`` included, and releases them.
+                return
+            if dead in self._workers:
+                self._workers.remove(dead)
+        _release(dead)
+        try:
+            worker = self._handshake(*self._start_process())
+        except Exception:
+            worker = None
+        with self._lock:
+            closed = self._closed
+            if worker is not None and not closed:
+                self._workers.append(worker)
+                self._idle.put(worker)
+            elif not self._workers and not closed:
+                # Wake every waiting caller instead of leaving them blocked.
+                self._idle.put(None)
+        if worker is not None and closed:
+            worker.process.kill()
+            _release(worker)
+
+    def encode(
+        self,
+        texts: Sequence[str],
+        normalize_embeddings: bool = True,
+        show_progress_bar: bool = False,
+    ) -> np.ndarray:
+        if self._closed:
+            raise RuntimeError("encoder pool is closed")
+        texts = list(texts)
+        result = np.empty((len(texts), self.dim), dtype=np.float32)
+        if not texts:
+            return result
+        worker = self._idle.get()
+        if worker is None:
+            self._idle.put(None)
+            if self._closed:
+                raise RuntimeError("encoder pool is closed")
+            raise RuntimeError("no encoder workers left")
+        dead = False
+        try:
+            for start in range(0, len(texts), self.max_rows):
+                chunk = texts[start : start + self.max_rows]
+                try:
+                    worker.conn.send(("encode", chunk, normalize_embeddings))
+                    status, payload = worker.conn.recv()
+                except (EOFError, OSError) as exc:
+                    dead = True
+                    raise RuntimeError("encoder worker exited") from exc
+                if status != "ok":
+                    raise RuntimeError(f"encoder worker failed: {payload}")
+                result[start : start + payload] = worker.out[:payload]
+        finally:
+            if dead:
+                self._replace(worker)
+            else:
+                with self._lock:
+                    if not self._closed:
+                        self._idle.put(worker)
+        return result
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+            workers, self._workers = self._workers, []
+            while True:
+                try:
+                    self._idle.get_nowait()
+                except queue.Empty:
+                    break
+            # Wake callers waiting for a worker; they raise instead of blocking.
+            self._idle.put(None)
+        for worker in workers:
+            try:
+                worker.conn.send(None)
+            except (OSError, ValueError):
+                pass
+        for worker in workers:
+            _release(worker)
+
+
+def _release(worker: _Worker) -> None:
+    worker.process.join(timeout=5)
+    if worker.process.is_alive():
+        worker.process.kill()
+    worker.conn.close()
+    del worker.out
+    worker.shm.close()
+    worker.shm.unlink()
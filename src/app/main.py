@@ -1,24 +1,32 @@
 from __future__ import annotations
 
 import asyncio
+import time
+from contextlib import asynccontextmanager
 from pathlib import Path
+from typing import Hashable
 
 from fastapi import FastAPI, Request
 from fastapi.responses import Response
-from prometheus_client import CONTENT_TYPE_LATEST, Counter, generate_latest
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 
+from src.app.batching import MicroBatcher
+from src.app.cache import VersionedCache, normalize_query
+from src.app.coalesce import SingleFlight
 from src.app.errors import add_exception_handlers, error_response
+from src.app.metrics import (
+    COALESCED_REQUESTS,
+    PREDICT_REQUESTS,
+    RESULT_CACHE_HITS,
+    RESULT_CACHE_MISSES,
+)
 from src.app.middleware import add_middlewares
+from src.app.reload import IndexGeneration, IndexManager
 from src.app.retrieval_service import RetrievalService
+from src.app.routing import ModeRouter
 from src.app.schemas import HealthResponse, PredictBatchRequest, PredictRequest, PredictResponse
 from src.app.settings import Settings
 
-PREDICT_REQUESTS = Counter(
-    "rag_predict_requests_total",
-    "Total predict requests.",
-    ["endpoint", "mode"],
-)
-
 
 def _build_answer(citations: list[dict]) -> tuple[str, bool]:
     if not citations:
@@ -37,38 +45,277 @@ def _validation_error(message: str, request_id: str):
     )
 
 
-async def _retrieve_with_timeout(service: RetrievalService, query: str, mode: str | None, top_k: int, timeout: float):
+async def _retrieve_with_timeout(
+    service: RetrievalService,
+    query: str,
+    mode: str | None,
+    top_k: int,
+    timeout: float,
+    flights: SingleFlight | None = None,
+    flight_key: Hashable | None = None,
+    endpoint: str = "/predict",
+    batcher: MicroBatcher | None = None,
+    candidates: int | None = None,
+):
+    def run():
+        if batcher is not None and (mode or service.default_mode) == "dense":
+            return batcher.submit((query, top_k), timeout)
+        return asyncio.to_thread(service.retrieve, query, mode, top_k, candidates)
+
+    if flights is None:
+        call = run()
+    else:
+        # Each waiter keeps its own deadline on the shared computation.
+        call, shared = flights.start(flight_key, run)
+        if shared:
+            COALESCED_REQUESTS.labels(
+                endpoint=endpoint, mode=mode or service.default_mode
+            ).inc()
+    return await _await_with_timeout(call, timeout)
+
+
+async def _await_with_timeout(call, timeout: float):
     try:
         if timeout is not None and timeout >= 0:
-            return await asyncio.wait_for(
-                asyncio.to_thread(service.retrieve, query, mode, top_k),
-                timeout=timeout,
-            )
-        return await asyncio.to_thread(service.retrieve, query, mode, top_k)
+            return await asyncio.wait_for(call, timeout=timeout)
+        return await call
     except (asyncio.TimeoutError, TimeoutError):
         raise TimeoutError from None
 
 
-def create_app(settings: Settings | None = None) -> FastAPI:
-    settings = settings or Settings()
-    service = RetrievalService(
+async def _timed(router: ModeRouter | None, mode: str, call, queries: int = 1):
+    """
+    Await ``call``, feeding its latency (timeouts included) to the router.
+    A call that retrieves several ``queries`` is recorded as one sample of its
+    per-query latency, the figure ``choose`` compares against the budget.
+    """
+    if router is None:
+        return await call
+    router.in_flight += 1
+    start = time.perf_counter()
+    try:
+        return await call
+    finally:
+        router.in_flight -= 1
+        router.observe(mode, (time.perf_counter() - start) / max(1, queries))
+
+
+async def _answer_batch(
+    service: RetrievalService,
+    cache: VersionedCache,
+    queries: list[str],
+    mode: str | None,
+    top_k: int,
+    timeout: float,
+    candidates: int | None = None,
+    router: ModeRouter | None = None,
+) -> list[tuple[list[dict], str, bool]]:
+    chosen_mode = mode or service.default_mode
+    if chosen_mode != "cascade":
+        candidates = None
+    version = service.index_version
+    results: list[tuple[list[dict], str, bool] | None] = [None] * len(queries)
+    misses: dict[tuple, list[int]] = {}
+    for row, query in enumerate(queries):
+        key = (normalize_query(query), chosen_mode, top_k, candidates)
+        cached = cache.get(version, key)
+        if cached is not None:
+            RESULT_CACHE_HITS.labels(endpoint="/predict_batch", mode=chosen_mode).inc()
+            results[row] = cached
+        else:
+            RESULT_CACHE_MISSES.labels(endpoint="/predict_batch", mode=chosen_mode).inc()
+            misses.setdefault(key, []).append(row)
+    if misses:
+        # Every distinct miss is retrieved together in one thread hop.
+        batch = await _timed(
+            router,
+            chosen_mode,
+            _await_with_timeout(
+                asyncio.to_thread(
+                    service.retrieve_batch,
+                    [queries[rows[0]] for rows in misses.values()],
+                    mode,
+                    top_k,
+                    candidates,
+                ),
+                timeout,
+            ),
+            queries=len(misses),
+        )
+        for (key, rows), citations in zip(misses.items(), batch):
+            answer, no_answer = _build_answer(citations)
+            result = (citations, answer, no_answer)
+            cache.put(version, key, result)
+            for row in rows:
+                results[row] = result
+    return results
+
+
+async def _answer_query(
+    service: RetrievalService,
+    cache: VersionedCache,
+    flights: SingleFlight,
+    query: str,
+    mode: str | None,
+    top_k: int,
+    timeout: float,
+    endpoint: str,
+    batcher: MicroBatcher | None = None,
+    candidates: int | None = None,
+    router: ModeRouter | None = None,
+) -> tuple[list[dict], str, bool]:
+    chosen_mode = mode or service.default_mode
+    if chosen_mode != "cascade":
+        candidates = None
+    version = service.index_version
+    key = (normalize_query(query), chosen_mode, top_k, candidates)
+    # Checked before the thread hop so hot queries never leave the event loop.
+    cached = cache.get(version, key)
+    if cached is not None:
+        RESULT_CACHE_HITS.labels(endpoint=endpoint, mode=chosen_mode).inc()
+        return cached
+    RESULT_CACHE_MISSES.labels(endpoint=endpoint, mode=chosen_mode).inc()
+    citations = await _timed(
+        router,
+        chosen_mode,
+        _retrieve_with_timeout(
+            service,
+            query,
+            mode,
+            top_k,
+            timeout,
+            flights=flights,
+            flight_key=(*key, version),
+            endpoint=endpoint,
+            batcher=batcher,
+            candidates=candidates,
+        ),
+    )
+    answer, no_answer = _build_answer(citations)
+    result = (citations, answer, no_answer)
+    cache.put(version, key, result)
+    return result
+
+
+def _dense_batch_runner(service: RetrievalService):
+    def run(items: list[tuple[str, int]]) -> list[list[dict]]:
+        # One retrieval at the largest top_k; rankings are ordered, so each
+        # request keeps its own prefix.
+        k = max(top_k for _, top_k in items)
+        batch = service.retrieve_batch([query for query, _ in items], "dense", k)
+        return [citations[:top_k] for citations, (_, top_k) in zip(batch, items)]
+
+    return run
+
+
+def _load_service(settings: Settings) -> RetrievalService:
+    return RetrievalService(
         Path(settings.index_dir),
         api_version=settings.api_version,
         max_top_k=settings.max_top_k,
         snippet_chars=settings.snippet_chars,
         default_mode=settings.default_mode,
+        dense_search=settings.dense_search,
+        rescore_candidates=settings.rescore_candidates,
+        use_pca=settings.use_pca,
+        ivf_nprobe=settings.ivf_nprobe,
+        hnsw_ef_search=settings.hnsw_ef_search,
+        dense_tile_rows=settings.dense_tile_rows,
+        dense_threads=settings.dense_threads,
+        query_cache_size=settings.query_cache_size,
+        query_cache_ttl_seconds=settings.query_cache_ttl_seconds,
+        encoder_workers=settings.encoder_workers,
+        encoder_threads=settings.encoder_threads_per_worker,
+        hybrid_candidates=settings.hybrid_candidates,
+        hybrid_rrf_k=settings.hybrid_rrf_k,
+        hybrid_leg_timeout_seconds=settings.hybrid_leg_timeout_seconds,
+        hybrid_threads=settings.hybrid_threads,
+        cascade_candidates=settings.cascade_candidates,
     )
 
+
+def create_app(settings: Settings | None = None) -> FastAPI:
+    settings = settings or Settings()
     app = FastAPI(title="RAG Retrieval API", version=settings.api_version)
-    app.state.retrieval_service = service
+
+    def make_batcher(service: RetrievalService) -> MicroBatcher | None:
+        if settings.dense_batch_max_size <= 1:
+            return None
+        return MicroBatcher(
+            _dense_batch_runner(service),
+            max_batch_size=settings.dense_batch_max_size,
+            max_wait_seconds=settings.dense_batch_max_wait_ms / 1000.0,
+        )
+
+    # Modes are set from each index generation as it is swapped in.
+    router = ModeRouter(["bm25"], half_life_seconds=settings.auto_estimate_half_life_seconds)
+
+    def on_swap(generation: IndexGeneration) -> None:
+        app.state.retrieval_service = generation.service
+        # A rebuilt index may add or drop embeddings, and with them dense modes.
+        available = generation.service.available_modes()
+        router.set_modes([mode for mode in settings.auto_modes if mode in available] or ["bm25"])
+
+    indexes = IndexManager(
+        lambda: _load_service(settings), make_batcher=make_batcher, on_swap=on_swap
+    )
+    result_cache = VersionedCache(settings.result_cache_size)
+    flights = SingleFlight()
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        watcher = None
+        if settings.reload_watch_seconds > 0:
+            watcher = asyncio.create_task(
+                indexes.watch(
+                    Path(settings.index_dir) / "params.json", settings.reload_watch_seconds
+                )
+            )
+        yield
+        if watcher is not None:
+            watcher.cancel()
+        indexes.close()
+
+    app.router.lifespan_context = lifespan
+    app.state.indexes = indexes
+    app.state.result_cache = result_cache
+    app.state.mode_router = router
     app.state.settings = settings
 
     add_exception_handlers(app)
     add_middlewares(app, settings)
 
+    def resolve_mode(service: RetrievalService, mode: str | None) -> str:
+        mode = mode or service.default_mode
+        if mode != "auto":
+            return mode
+        timeout = settings.request_timeout_seconds
+        budget = timeout * settings.auto_budget_fraction if timeout >= 0 else None
+        return router.choose(budget)
+
     @app.get("/health", response_model=HealthResponse)
     def health() -> HealthResponse:
-        return HealthResponse(status="ok", versions=service.versions())
+        return HealthResponse(status="ok", versions=indexes.current.service.versions())
+
+    @app.post("/admin/reload", response_model=HealthResponse)
+    async def reload_index(request: Request):
+        if not settings.admin_reload_enabled:
+            return error_response(
+                code="not_found",
+                message="Not Found",
+                request_id=request.state.request_id,
+                status_code=404,
+            )
+        try:
+            generation = await indexes.reload()
+        except Exception as exc:
+            return error_response(
+                code="reload_failed",
+                message=f"Index reload failed: {exc}",
+                request_id=request.state.request_id,
+                status_code=500,
+            )
+        return HealthResponse(status="ok", versions=generation.service.versions())
 
     @app.post("/predict", response_model=PredictResponse)
     async def predict(payload: PredictRequest, request: Request):
@@ -83,29 +330,42 @@ def create_app(settings: Settings | None = None) -> FastAPI:
                 f"top_k exceeds {settings.max_top_k}",
                 request_id,
             )
-        try:
-            citations = await _retrieve_with_timeout(
-                service,
-                payload.query,
-                payload.mode,
-                payload.top_k,
-                settings.request_timeout_seconds,
-            )
-        except TimeoutError:
-            return error_response(
-                code="timeout",
-                message="Request timed out.",
-                request_id=request_id,
-                status_code=504,
+        if payload.candidates and payload.candidates > settings.max_cascade_candidates:
+            return _validation_error(
+                f"candidates exceeds {settings.max_cascade_candidates}",
+                request_id,
             )
-        answer, no_answer = _build_answer(citations)
-        mode = payload.mode or service.default_mode
+        with indexes.lease() as generation:
+            service = generation.service
+            mode = resolve_mode(service, payload.mode)
+            try:
+                citations, answer, no_answer = await _answer_query(
+                    service,
+                    result_cache,
+                    flights,
+                    payload.query,
+                    mode,
+                    payload.top_k,
+                    settings.request_timeout_seconds,
+                    "/predict",
+                    batcher=generation.batcher,
+                    candidates=payload.candidates,
+                    router=router,
+                )
+            except TimeoutError:
+                return error_response(
+                    code="timeout",
+                    message="Request timed out.",
+                    request_id=request_id,
+                    status_code=504,
+                )
+            versions = {**service.versions(), "mode": mode}
         PREDICT_REQUESTS.labels(endpoint="/predict", mode=mode).inc()
         return PredictResponse(
             answer=answer,
             no_answer=no_answer,
             citations=citations,
-            versions=service.versions(),
+            versions=versions,
             request_id=request_id,
         )
 
@@ -127,21 +387,30 @@ def create_app(settings: Settings | None = None) -> FastAPI:
                 f"top_k exceeds {settings.max_top_k}",
                 request_id,
             )
+        if payload.candidates and payload.candidates > settings.max_cascade_candidates:
+            return _validation_error(
+                f"candidates exceeds {settings.max_cascade_candidates}",
+                request_id,
+            )
         for query in queries:
             if len(query) > settings.max_query_chars:
                 return _validation_error(
                     f"query exceeds {settings.max_query_chars} characters",
                     request_id,
                 )
-        responses = []
-        for query in queries:
+        with indexes.lease() as generation:
+            service = generation.service
+            mode = resolve_mode(service, mode)
             try:
-                citations = await _retrieve_with_timeout(
+                results = await _answer_batch(
                     service,
-                    query,
+                    result_cache,
+                    queries,
                     mode,
                     top_k,
                     settings.request_timeout_seconds,
+                    candidates=payload.candidates,
+                    router=router,
                 )
             except TimeoutError:
                 return error_response(
@@ -150,19 +419,18 @@ def create_app(settings: Settings | None = None) -> FastAPI:
                     request_id=request_id,
                     status_code=504,
                 )
-            answer, no_answer = _build_answer(citations)
-            responses.append(
-                PredictResponse(
-                    answer=answer,
-                    no_answer=no_answer,
-                    citations=citations,
-                    versions=service.versions(),
-                    request_id=request_id,
-                )
+            versions = {**service.versions(), "mode": mode}
+        responses = [
+            PredictResponse(
+                answer=answer,
+                no_answer=no_answer,
+                citations=citations,
+                versions=versions,
+                request_id=request_id,
             )
-        PREDICT_REQUESTS.labels(
-            endpoint="/predict_batch", mode=mode or service.default_mode
-        ).inc(len(queries))
+            for citations, answer, no_answer in results
+        ]
+        PREDICT_REQUESTS.labels(endpoint="/predict_batch", mode=mode).inc(len(queries))
         return responses
 
     @app.get("/metrics")
@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+from prometheus_client import Counter, Gauge, Histogram
+
+PREDICT_REQUESTS = Counter(
+    "rag_predict_requests_total",
+    "Total predict requests.",
+    ["endpoint", "mode"],
+)
+QUERY_EMBEDDING_CACHE_HITS = Counter(
+    "rag_query_embedding_cache_hits_total",
+    "Dense query embeddings served from the LRU cache.",
+)
+QUERY_EMBEDDING_CACHE_MISSES = Counter(
+    "rag_query_embedding_cache_misses_total",
+    "Dense query embeddings computed by the encoder.",
+)
+RESULT_CACHE_HITS = Counter(
+    "rag_result_cache_hits_total",
+    "Predict queries answered from the result cache.",
+    ["endpoint", "mode"],
+)
+RESULT_CACHE_MISSES = Counter(
+    "rag_result_cache_misses_total",
+    "Predict queries that ran the retrieval pipeline.",
+    ["endpoint", "mode"],
+)
+COALESCED_REQUESTS = Counter(
+    "rag_coalesced_requests_total",
+    "Predict queries that joined an identical in-flight retrieval.",
+    ["endpoint", "mode"],
+)
+MICRO_BATCH_SIZE = Histogram(
+    "rag_dense_micro_batch_size",
+    "Dense queries encoded and scored together per micro-batch.",
+    buckets=(1, 2, 4, 8, 16, 32, 64),
+)
+MICRO_BATCH_QUEUE_WAIT = Histogram(
+    "rag_dense_micro_batch_queue_wait_seconds",
+    "Time a dense query waited for its micro-batch to be dispatched.",
+    buckets=(0.0005, 0.001, 0.002, 0.005, 0.01, 0.025, 0.05, 0.1),
+)
+HYBRID_LEGS_SKIPPED = Counter(
+    "rag_hybrid_legs_skipped_total",
+    "Hybrid retrieval legs dropped for missing the leg budget.",
+    ["leg"],
+)
+AUTO_MODE_ROUTED = Counter(
+    "rag_auto_mode_routed_total",
+    "Retrieval mode chosen for auto-mode requests.",
+    ["mode"],
+)
+MODE_LATENCY_ESTIMATE = Gauge(
+    "rag_mode_latency_estimate_seconds",
+    "EWMA retrieval latency per mode used by auto routing.",
+    ["mode"],
+)
+INDEX_GENERATION = Gauge(
+    "rag_index_generation",
+    "Generation number of the index currently serving requests.",
+)
+INDEX_RELOADS = Counter(
+    "rag_index_reloads_total",
+    "Index reload attempts.",
+    ["status"],
+)
@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import asyncio
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Iterator, Optional
+
+from src.app.metrics import INDEX_GENERATION, INDEX_RELOADS
+from src.app.retrieval_service import RetrievalService
+
+
+class IndexGeneration:
+    """One loaded index plus the per-index helpers built around it."""
+
+    def __init__(self, service: RetrievalService, generation: int, batcher: Any = None) -> None:
+        self.service = service
+        self.generation = generation
+        self.batcher = batcher
+        self.leases = 0
+        self.retired = False
+
+    def close(self) -> None:
+        self.service.close()
+
+
+class IndexManager:
+    """
+    Serves requests from the current index generation and swaps in new ones.
+
+    Requests hold a lease on the generation they started on, so a reload
+    never changes the index under an in-flight request. ``reload`` builds the
+    next service on a worker thread (the old one keeps serving meanwhile),
+    hands it the warm encoder and query-embedding cache, and swaps it in with
+    a single assignment; the old generation is closed once its last lease is
+    released. Leases and swaps happen on the event loop.
+    """
+
+    def __init__(
+        self,
+        load_service: Callable[[], RetrievalService],
+        *,
+        make_batcher: Callable[[RetrievalService], Any] = lambda service: None,
+        on_swap: Callable[[IndexGeneration], None] = lambda generation: None,
+    ) -> None:
+        self._load_service = load_service
+        self._make_batcher = make_batcher
+        self._on_swap = on_swap
+        self._reload_lock = asyncio.Lock()
+        self.current = self._generation(load_service(), 0)
+
+    def _generation(self, service: RetrievalService, number: int) -> IndexGeneration:
+        service.generation = number
+        INDEX_GENERATION.set(number)
+        generation = IndexGeneration(service, number, self._make_batcher(service))
+        self._on_swap(generation)
+        return generation
+
+    @contextmanager
+    def lease(self) -> Iterator[IndexGeneration]:
+        generation = self.current
+        generation.leases += 1
+        try:
+            yield generation
+        finally:
+            generation.leases -= 1
+            if generation.retired and generation.leases == 0:
+                generation.close()
+
+    async def reload(self) -> IndexGeneration:
+        async with self._reload_lock:
+            old = self.current
+            try:
+                service = await asyncio.to_thread(self._load_service)
+            except Exception:
+                INDEX_RELOADS.labels(status="failed").inc()
+                raise
+            service.adopt_warm_state(old.service)
+            self.current = self._generation(service, old.generation + 1)
+            old.retired = True
+            if old.leases == 0:
+                old.close()
+            INDEX_RELOADS.labels(status="ok").inc()
+            return self.current
+
+    def close(self) -> None:
+        self.current.close()
+
+    async def watch(self, path: Path, interval_seconds: float) -> None:
+        """Reload whenever ``path`` (e.g. ``params.json``) changes."""
+        last = _signature(path)
+        while True:
+            await asyncio.sleep(interval_seconds)
+            current = _signature(path)
+            if current == last:
+                continue
+            last = current
+            try:
+                await self.reload()
+            except Exception:
+                # Keep serving the old index; the next change retries.
+                continue
+
+
+def _signature(path: Path) -> Optional[tuple[int, int]]:
+    try:
+        stat = Path(path).stat()
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
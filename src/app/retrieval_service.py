@@ -1,13 +1,33 @@
 from __future__ import annotations
 
+import hashlib
 import json
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional
 
 import numpy as np
-from rank_bm25 import BM25Okapi
+
+from src.app.cache import LRUCache, normalize_query
+from src.app.encoder_pool import EncoderPool
+from src.app.metrics import (
+    HYBRID_LEGS_SKIPPED,
+    QUERY_EMBEDDING_CACHE_HITS,
+    QUERY_EMBEDDING_CACHE_MISSES,
+)
+from src.rag.bm25_index import BM25Index, load_bm25_index
+from src.rag.chunk_store import ChunkStore, freeze_heap, load_chunk_store
+from src.rag.dense_search import ExactDenseSearcher
+from src.rag.fusion import DEFAULT_RRF_K, reciprocal_rank_fusion
+from src.rag.hnsw import HNSWIndex
+from src.rag.ivf import IVFIndex
+from src.rag.pca import PCAProjection, load_pca
+from src.rag.quantization import QuantizedSearcher
+from src.rag.ranking import top_k as rank_top_k
 
 DEFAULT_MODEL_NAME = "all-MiniLM-L6-v2"
+INDEX_VERSION_FILES = ("params.json", "metadata.jsonl", "embeddings.npy")
 
 
 class RetrievalService:
@@ -19,21 +39,71 @@ class RetrievalService:
         max_top_k: int,
         snippet_chars: int,
         default_mode: str,
+        dense_search: str = "exact",
+        rescore_candidates: int = 100,
+        use_pca: bool = True,
+        ivf_nprobe: int = 8,
+        hnsw_ef_search: int = 64,
+        dense_tile_rows: int = 65536,
+        dense_threads: int = 4,
+        query_cache_size: int = 1024,
+        query_cache_ttl_seconds: float = 300.0,
+        encoder_workers: int = 0,
+        encoder_threads: int = 1,
+        hybrid_candidates: int = 50,
+        hybrid_rrf_k: int = DEFAULT_RRF_K,
+        hybrid_leg_timeout_seconds: float = 1.0,
+        hybrid_threads: int = 8,
+        cascade_candidates: int = 200,
     ) -> None:
         self.index_dir = Path(index_dir)
         self.api_version = api_version
         self.max_top_k = max_top_k
         self.snippet_chars = snippet_chars
         self.default_mode = default_mode
+        self.dense_search = dense_search
+        self.rescore_candidates = rescore_candidates
+        self.use_pca = use_pca
+        self.ivf_nprobe = ivf_nprobe
+        self.hnsw_ef_search = hnsw_ef_search
+        self.dense_tile_rows = dense_tile_rows
+        self.dense_threads = dense_threads
+        self.encoder_workers = encoder_workers
+        self.encoder_threads = encoder_threads
+        self.hybrid_candidates = hybrid_candidates
+        self.hybrid_rrf_k = hybrid_rrf_k
+        self.hybrid_leg_timeout_seconds = hybrid_leg_timeout_seconds
+        self.hybrid_threads = hybrid_threads
+        self.cascade_candidates = cascade_candidates
 
-        self.chunks = self._load_metadata()
-        self.texts = [chunk["text"] for chunk in self.chunks]
-        self.doc_ids = [chunk["doc_id"] for chunk in self.chunks]
+        self.chunks = self._load_chunks()
 
-        self.bm25 = BM25Okapi([text.lower().split() for text in self.texts]) if self.texts else None
+        self.bm25 = self._load_bm25()
         self.embeddings = self._load_embeddings()
+        self.pca: Optional[PCAProjection] = None
+        if self.use_pca and self.embeddings.size:
+            loaded = load_pca(self.index_dir, len(self.chunks))
+            if loaded is not None:
+                # Dense search runs in the reduced space; queries are projected too.
+                self.pca, self.embeddings = loaded
+        self.dense_searcher = self._load_dense_searcher()
         self.embed_model_name = self._load_embed_model_name()
+        self.index_version = self._load_index_version()
         self._dense_model = None
+        self._owns_dense_model = True
+        self.generation = 0
+        self._lazy_lock = threading.Lock()
+        self._hybrid_executor: Optional[ThreadPoolExecutor] = None
+        self.query_cache = LRUCache(query_cache_size, query_cache_ttl_seconds)
+        freeze_heap()
+
+    def _load_chunks(self) -> ChunkStore:
+        store = load_chunk_store(self.index_dir, snippet_chars=self.snippet_chars)
+        if store is None:
+            store = ChunkStore.from_chunks(
+                self._load_metadata(), snippet_chars=self.snippet_chars
+            )
+        return store
 
     def _load_metadata(self) -> List[Dict]:
         metadata_path = self.index_dir / "metadata.jsonl"
@@ -48,17 +118,55 @@ class RetrievalService:
                 chunks.append(json.loads(line))
         return chunks
 
+    def _load_bm25(self) -> Optional[BM25Index]:
+        bm25 = load_bm25_index(self.index_dir, len(self.chunks))
+        if bm25 is None and len(self.chunks):
+            bm25 = BM25Index.from_texts(
+                [self.chunks.text(idx) for idx in range(len(self.chunks))]
+            )
+        return bm25
+
     def _load_embeddings(self) -> np.ndarray:
         embeddings_path = self.index_dir / "embeddings.npy"
         if not embeddings_path.exists():
             return np.empty((0, 0), dtype=np.float32)
-        embeddings = np.load(embeddings_path)
+        # Read-only mapping: workers share the OS page cache instead of each
+        # holding a private copy of the matrix.
+        embeddings = np.load(embeddings_path, mmap_mode="r")
         if embeddings.ndim == 1:
             embeddings = embeddings.reshape(1, -1)
-        if embeddings.size and embeddings.shape[0] != len(self.texts):
+        if embeddings.size and embeddings.shape[0] != len(self.chunks):
             return np.empty((0, 0), dtype=np.float32)
         return embeddings.astype(np.float32, copy=False)
 
+    def _load_dense_searcher(
+        self,
+    ) -> Optional[ExactDenseSearcher | QuantizedSearcher | IVFIndex | HNSWIndex]:
+        if self.embeddings.size == 0:
+            return None
+        searcher = None
+        if self.dense_search == "ivf":
+            searcher = IVFIndex.load(self.index_dir, self.embeddings, nprobe=self.ivf_nprobe)
+        elif self.dense_search == "hnsw":
+            searcher = HNSWIndex.load(
+                self.index_dir, self.embeddings, ef_search=self.hnsw_ef_search
+            )
+        elif self.dense_search != "exact":
+            searcher = QuantizedSearcher.load(
+                self.index_dir,
+                self.dense_search,
+                self.embeddings,
+                rescore_candidates=self.rescore_candidates,
+            )
+        if searcher is None:
+            # Exact scan, also the fallback when ANN / quantized artifacts are missing.
+            searcher = ExactDenseSearcher(
+                self.embeddings,
+                tile_rows=self.dense_tile_rows,
+                max_workers=self.dense_threads,
+            )
+        return searcher
+
     def _load_embed_model_name(self) -> str:
         params_path = self.index_dir / "params.json"
         if not params_path.exists():
@@ -67,14 +175,43 @@ class RetrievalService:
             params = json.load(handle)
         return params.get("embed_model_name", DEFAULT_MODEL_NAME)
 
+    def _load_index_version(self) -> str:
+        # Cheap fingerprint of the build outputs: a rebuilt index changes the
+        # size or mtime of at least one of them.
+        digest = hashlib.sha1()
+        for name in INDEX_VERSION_FILES:
+            path = self.index_dir / name
+            if path.exists():
+                stat = path.stat()
+                digest.update(f"{name}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+        return digest.hexdigest()[:12]
+
     def versions(self) -> Dict[str, str]:
         return {
             "api": self.api_version,
             "embed_model": self.embed_model_name,
             "index_dir": str(self.index_dir),
+            "index_version": self.index_version,
+            "index_generation": str(self.generation),
         }
 
-    def retrieve(self, query: str, mode: Optional[str], top_k: int) -> List[Dict]:
+    def available_modes(self) -> List[str]:
+        if self.embeddings.size == 0:
+            return ["bm25"]
+        return ["bm25", "dense", "hybrid", "cascade"]
+
+    def retrieve(
+        self,
+        query: str,
+        mode: Optional[str],
+        top_k: int,
+        candidates: Optional[int] = None,
+    ) -> List[Dict]:
+        """
+        Top-k citations for ``query``. ``candidates`` is the BM25 candidate
+        depth for ``"cascade"`` (default ``cascade_candidates``); other modes
+        ignore it.
+        """
         if not query or not query.strip():
             return []
         k = max(1, min(top_k, self.max_top_k))
@@ -84,46 +221,271 @@ class RetrievalService:
             return self._retrieve_bm25(query, k)
         if chosen_mode == "dense":
             return self._retrieve_dense(query, k)
+        if chosen_mode == "hybrid":
+            return self._retrieve_hybrid(query, k)
+        if chosen_mode == "cascade":
+            return self._retrieve_cascade(query, k, candidates or self.cascade_candidates)
         raise ValueError(f"Unknown retrieval mode: {chosen_mode}")
 
+    def retrieve_batch(
+        self,
+        queries: List[str],
+        mode: Optional[str],
+        top_k: int,
+        candidates: Optional[int] = None,
+    ) -> List[List[Dict]]:
+        """
+        ``retrieve`` for a whole batch in one pass: one encoder call and one
+        batched scan for dense, shared postings work for BM25, and citations
+        decoded once per distinct chunk.
+        """
+        k = max(1, min(top_k, self.max_top_k))
+        chosen_mode = mode or self.default_mode
+        if chosen_mode not in ("bm25", "dense", "hybrid", "cascade"):
+            raise ValueError(f"Unknown retrieval mode: {chosen_mode}")
+        rows = [row for row, query in enumerate(queries) if query and query.strip()]
+        ranked: List[List[tuple[int, float]]] = [[] for _ in queries]
+        active = [queries[row] for row in rows]
+        if not active:
+            return [[] for _ in queries]
+
+        if chosen_mode == "bm25":
+            hits = self._search_bm25_batch(active, k)
+        elif chosen_mode == "dense":
+            hits = self._search_dense_batch(active, k)
+        elif chosen_mode == "cascade":
+            hits = self._search_cascade_batch(
+                active, k, candidates or self.cascade_candidates
+            )
+        else:
+            depth = max(k, self.hybrid_candidates)
+            legs = self._run_legs(
+                bm25=lambda: [
+                    _matches(ranked) for ranked in self._search_bm25_batch(active, depth)
+                ],
+                dense=lambda: self._search_dense_batch(active, depth),
+            )
+            hits = [
+                reciprocal_rank_fusion(
+                    [leg[row] if row < len(leg) else [] for leg in legs],
+                    k,
+                    rrf_k=self.hybrid_rrf_k,
+                )
+                for row in range(len(active))
+            ]
+        for row, row_hits in zip(rows, hits):
+            ranked[row] = row_hits
+        return self._build_citations_batch(ranked)
+
+    def _search_bm25_batch(self, queries: List[str], k: int) -> List[List[tuple[int, float]]]:
+        return self.bm25.search_batch(queries, k) if self.bm25 else []
+
+    def _search_dense_batch(self, queries: List[str], k: int) -> List[List[tuple[int, float]]]:
+        if self.dense_searcher is None:
+            return []
+        model = self._get_dense_model()
+        if model is None:
+            return []
+        query_embs = self._embed_queries(model, queries)
+        search_batch = getattr(self.dense_searcher, "search_batch", None)
+        if search_batch is not None:
+            return search_batch(query_embs, k)
+        return [self.dense_searcher.search(query_emb, k) for query_emb in query_embs]
+
     def _retrieve_bm25(self, query: str, k: int) -> List[Dict]:
         if not self.bm25:
             return []
-        scores = self.bm25.get_scores(query.lower().split())
-        ranked = sorted(enumerate(scores), key=lambda pair: (-pair[1], pair[0]))
-        return self._build_citations(ranked[:k])
+        ranked = self.bm25.search(query, k)
+        return self._build_citations(ranked)
 
     def _retrieve_dense(self, query: str, k: int) -> List[Dict]:
-        if self.embeddings.size == 0:
+        return self._build_citations(self._search_dense(query, k))
+
+    def _search_dense(self, query: str, k: int) -> List[tuple[int, float]]:
+        if self.dense_searcher is None:
             return []
         model = self._get_dense_model()
         if model is None:
             return []
-        query_emb = model.encode([query], normalize_embeddings=True, show_progress_bar=False)
-        scores = np.dot(query_emb, self.embeddings.T)[0]
-        ranked = sorted(enumerate(scores), key=lambda pair: (-pair[1], pair[0]))
-        return self._build_citations(ranked[:k])
+        query_emb = self._embed_query(model, query)
+        return self.dense_searcher.search(query_emb[0], k)
+
+    def _retrieve_hybrid(self, query: str, k: int) -> List[Dict]:
+        depth = max(k, self.hybrid_candidates)
+        legs = self._run_legs(
+            bm25=lambda: _matches(self.bm25.search(query, depth)) if self.bm25 else [],
+            dense=lambda: self._search_dense(query, depth),
+        )
+        return self._build_citations(
+            reciprocal_rank_fusion(legs, k, rrf_k=self.hybrid_rrf_k)
+        )
+
+    def _retrieve_cascade(self, query: str, k: int, depth: int) -> List[Dict]:
+        return self._build_citations(self._search_cascade_batch([query], k, depth)[0])
+
+    def _search_cascade_batch(
+        self, queries: List[str], k: int, depth: int
+    ) -> List[List[tuple[int, float]]]:
+        """
+        BM25 picks up to ``depth`` matching rows per query; only those rows of
+        the embedding matrix are gathered and ranked by the query embedding, so
+        at most ``depth`` results come back. Queries without a BM25 match
+        return nothing.
+        """
+        shortlists = [
+            np.sort(np.asarray([idx for idx, _ in _matches(ranked)], dtype=np.int64))
+            for ranked in self._search_bm25_batch(queries, depth)
+        ]
+        if self.embeddings.size == 0 or not any(len(ids) for ids in shortlists):
+            return [[] for _ in queries]
+        model = self._get_dense_model()
+        if model is None:
+            return [[] for _ in queries]
+        query_embs = self._embed_queries(model, queries)
+        results: List[List[tuple[int, float]]] = []
+        for ids, query_emb in zip(shortlists, query_embs):
+            if not len(ids):
+                results.append([])
+                continue
+            # Rows are gathered in ascending order, so ties rank by index.
+            scores = self.embeddings[ids] @ query_emb
+            results.append([(int(ids[pos]), score) for pos, score in rank_top_k(scores, k)])
+        return results
+
+    def _run_legs(self, **legs: Callable[[], list]) -> List[list]:
+        """
+        Run retrieval legs concurrently and return the results of those that
+        finished within ``hybrid_leg_timeout_seconds``. When none did, the
+        first to finish is used. Skipped legs keep running on the pool; their
+        results are discarded.
+        """
+        if self._hybrid_executor is None:
+            with self._lazy_lock:
+                if self._hybrid_executor is None:
+                    self._hybrid_executor = ThreadPoolExecutor(
+                        max_workers=max(2, self.hybrid_threads),
+                        thread_name_prefix="hybrid-leg",
+                    )
+        futures = {name: self._hybrid_executor.submit(leg) for name, leg in legs.items()}
+        budget = self.hybrid_leg_timeout_seconds
+        done, _ = wait(futures.values(), timeout=budget if budget > 0 else None)
+        if not done:
+            done, _ = wait(futures.values(), return_when=FIRST_COMPLETED)
+        results = []
+        for name, future in futures.items():
+            if future in done:
+                results.append(future.result())
+            else:
+                HYBRID_LEGS_SKIPPED.labels(leg=name).inc()
+        return results
+
+    def _embed_query(self, model, query: str) -> np.ndarray:
+        return self._embed_queries(model, [query])
+
+    def _embed_queries(self, model, queries: List[str]) -> np.ndarray:
+        keys = [(self.embed_model_name, normalize_query(query)) for query in queries]
+        vectors: Dict[tuple[str, str], np.ndarray] = {}
+        missing: List[tuple[str, str]] = []
+        for key in dict.fromkeys(keys):
+            cached = self.query_cache.get(key)
+            if cached is None:
+                missing.append(key)
+            else:
+                vectors[key] = cached
+        QUERY_EMBEDDING_CACHE_HITS.inc(len(keys) - len(missing))
+        if missing:
+            QUERY_EMBEDDING_CACHE_MISSES.inc(len(missing))
+            encoded = model.encode(
+                [key[1] for key in missing],
+                normalize_embeddings=True,
+                show_progress_bar=False,
+            )
+            encoded = np.asarray(encoded, dtype=np.float32)
+            for key, row in zip(missing, encoded):
+                query_emb = row.reshape(1, -1).copy()
+                # Shared across requests and threads, so never mutated in place.
+                query_emb.flags.writeable = False
+                self.query_cache.put(key, query_emb)
+                vectors[key] = query_emb
+        query_embs = np.vstack([vectors[key] for key in keys])
+        if self.pca is not None:
+            query_embs = self.pca.project(query_embs)
+        return query_embs
 
     def _get_dense_model(self):
         if self._dense_model is None:
-            from sentence_transformers import SentenceTransformer
-
-            self._dense_model = SentenceTransformer(self.embed_model_name)
+            with self._lazy_lock:
+                if self._dense_model is None:
+                    self._dense_model = self._load_dense_model()
         return self._dense_model
 
-    def _build_citations(self, ranked: List[tuple[int, float]]) -> List[Dict]:
-        citations: List[Dict] = []
-        for idx, score in ranked:
-            chunk = self.chunks[idx]
-            snippet = " ".join(chunk["text"].split())[: self.snippet_chars]
-            citations.append(
-                {
-                    "doc_id": chunk["doc_id"],
-                    "chunk_id": chunk["chunk_id"],
-                    "score": float(score),
-                    "snippet": snippet,
-                    "start_offset": chunk["start_offset"],
-                    "end_offset": chunk["end_offset"],
-                }
+    def _load_dense_model(self):
+        if self.encoder_workers > 0:
+            # Encode in worker processes, off this process's GIL.
+            return EncoderPool(
+                self.embed_model_name,
+                workers=self.encoder_workers,
+                threads_per_worker=self.encoder_threads,
             )
-        return citations
+        from sentence_transformers import SentenceTransformer
+
+        return SentenceTransformer(self.embed_model_name)
+
+    def adopt_warm_state(self, previous: RetrievalService) -> None:
+        """
+        Take over the loaded encoder and query-embedding cache of the service
+        this one replaces, when both use the same embedding model.
+        """
+        if previous.embed_model_name != self.embed_model_name:
+            return
+        self.query_cache = previous.query_cache
+        if previous._dense_model is not None and self._dense_model is None:
+            self._dense_model = previous._dense_model
+            previous._owns_dense_model = False
+
+    def close(self) -> None:
+        if self._owns_dense_model and isinstance(self._dense_model, EncoderPool):
+            self._dense_model.close()
+            self._dense_model = None
+        if self._hybrid_executor is not None:
+            self._hybrid_executor.shutdown(wait=False)
+            self._hybrid_executor = None
+        close_searcher = getattr(self.dense_searcher, "close", None)
+        if close_searcher is not None:
+            close_searcher()
+
+    def _build_citations(self, ranked: List[tuple[int, float]]) -> List[Dict]:
+        return self._build_citations_batch([ranked])[0]
+
+    def _build_citations_batch(
+        self, ranked_lists: List[List[tuple[int, float]]]
+    ) -> List[List[Dict]]:
+        store = self.chunks
+        ids = sorted({idx for ranked in ranked_lists for idx, _ in ranked})
+        spans = np.asarray(store.spans[ids]).tolist() if ids else []
+        fields = {
+            idx: (store.doc_id(idx), store.chunk_id(idx), store.snippet(idx), start, end)
+            for idx, (start, end) in zip(ids, spans)
+        }
+        batch: List[List[Dict]] = []
+        for ranked in ranked_lists:
+            citations: List[Dict] = []
+            for idx, score in ranked:
+                doc_id, chunk_id, snippet, start, end = fields[idx]
+                citations.append(
+                    {
+                        "doc_id": doc_id,
+                        "chunk_id": chunk_id,
+                        "score": float(score),
+                        "snippet": snippet,
+                        "start_offset": int(start),
+                        "end_offset": int(end),
+                    }
+                )
+            batch.append(citations)
+        return batch
+
+
+def _matches(ranked: List[tuple[int, float]]) -> List[tuple[int, float]]:
+    # BM25 pads short rankings with zero-score rows; they are not matches.
+    return [(idx, score) for idx, score in ranked if score > 0]
@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import os
+import time
+from typing import Callable, Dict, Optional, Sequence
+
+from src.app.metrics import AUTO_MODE_ROUTED, MODE_LATENCY_ESTIMATE
+
+DEFAULT_AUTO_MODES = ("hybrid", "dense", "cascade", "bm25")
+
+
+class ModeRouter:
+    """
+    Picks a retrieval mode for ``"auto"`` requests from live latency estimates.
+
+    Each mode keeps an exponentially weighted moving average of its observed
+    retrieval latency. A mode's predicted latency is that average scaled by the
+    current load (retrievals in flight per unit of ``concurrency``). ``choose``
+    returns the first mode of ``modes`` (ordered by preference, best quality
+    first) whose prediction fits the budget, or the mode with the lowest
+    prediction when none fits. Modes without observations predict zero, so they
+    get measured.
+
+    Estimates fade toward unknown with ``half_life_seconds`` since the last
+    observation: the prediction halves every half-life, and a stale average
+    counts for correspondingly less when the next observation arrives. A mode
+    demoted by a latency spike is therefore tried again once its estimate has
+    decayed under the budget, instead of never being re-measured. Used from the
+    event loop only.
+    """
+
+    def __init__(
+        self,
+        modes: Sequence[str] = DEFAULT_AUTO_MODES,
+        *,
+        alpha: float = 0.2,
+        concurrency: Optional[int] = None,
+        half_life_seconds: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        if not modes:
+            raise ValueError("modes must not be empty")
+        self.modes = list(modes)
+        self.alpha = alpha
+        self.concurrency = max(1, concurrency or os.cpu_count() or 1)
+        self.half_life_seconds = half_life_seconds
+        self._clock = clock
+        self.estimates: Dict[str, float] = {}
+        self._observed_at: Dict[str, float] = {}
+        self.in_flight = 0
+
+    def set_modes(self, modes: Sequence[str]) -> None:
+        """Replace the candidate modes, e.g. after an index reload; estimates are kept."""
+        if not modes:
+            raise ValueError("modes must not be empty")
+        self.modes = list(modes)
+
+    def _freshness(self, mode: str) -> float:
+        """1.0 right after an observation, halving every ``half_life_seconds``."""
+        observed_at = self._observed_at.get(mode)
+        if observed_at is None or self.half_life_seconds <= 0:
+            return 1.0
+        return 0.5 ** ((self._clock() - observed_at) / self.half_life_seconds)
+
+    def predict(self, mode: str) -> float:
+        load = 1.0 + self.in_flight / self.concurrency
+        return self.estimates.get(mode, 0.0) * self._freshness(mode) * load
+
+    def choose(self, budget_seconds: Optional[float]) -> str:
+        chosen = None
+        if budget_seconds is None:
+            chosen = self.modes[0]
+        else:
+            for mode in self.modes:
+                if self.predict(mode) <= budget_seconds:
+                    chosen = mode
+                    break
+        if chosen is None:
+            chosen = min(self.modes, key=self.predict)
+        AUTO_MODE_ROUTED.labels(mode=chosen).inc()
+        return chosen
+
+    def observe(self, mode: str, seconds: float) -> None:
+        previous = self.estimates.get(mode)
+        if previous is None:
+            estimate = seconds
+        else:
+            weight = 1.0 - (1.0 - self.alpha) * self._freshness(mode)
+            estimate = previous + weight * (seconds - previous)
+        self.estimates[mode] = estimate
+        self._observed_at[mode] = self._clock()
+        MODE_LATENCY_ESTIMATE.labels(mode=mode).set(estimate)
@@ -3,7 +3,7 @@ from typing import Dict, List, Literal, Optional
 from pydantic import BaseModel, Field
 
 
-RetrievalMode = Literal["bm25", "dense"]
+RetrievalMode = Literal["bm25", "dense", "hybrid", "cascade", "auto"]
 
 
 class Citation(BaseModel):
@@ -19,12 +19,14 @@ class PredictRequest(BaseModel):
     query: str = Field(..., min_length=1)
     top_k: int = Field(5, gt=0)
     mode: Optional[RetrievalMode] = None
+    candidates: Optional[int] = Field(None, gt=0)
 
 
 class PredictBatchRequest(BaseModel):
     queries: List[str] = Field(..., min_length=1)
     top_k: int = Field(5, gt=0)
     mode: Optional[RetrievalMode] = None
+    candidates: Optional[int] = Field(None, gt=0)
 
 
 class PredictResponse(BaseModel):
@@ -13,5 +13,30 @@ class Settings(BaseSettings):
     max_query_chars: int = 2000
     max_top_k: int = 20
     max_batch_size: int = 20
+    dense_search: str = "exact"
+    rescore_candidates: int = 100
+    use_pca: bool = True
+    ivf_nprobe: int = 8
+    hnsw_ef_search: int = 64
+    dense_tile_rows: int = 65536
+    dense_threads: int = 4
+    query_cache_size: int = 1024
+    query_cache_ttl_seconds: float = 300.0
+    result_cache_size: int = 4096
+    dense_batch_max_size: int = 16
+    dense_batch_max_wait_ms: float = 2.0
+    encoder_workers: int = 0
+    encoder_threads_per_worker: int = 1
+    hybrid_candidates: int = 50
+    hybrid_rrf_k: int = 60
+    hybrid_leg_timeout_seconds: float = 1.0
+    hybrid_threads: int = 8
+    cascade_candidates: int = 200
+    max_cascade_candidates: int = 2000
+    auto_modes: list[str] = ["hybrid", "dense", "cascade", "bm25"]
+    auto_budget_fraction: float = 0.8
+    auto_estimate_half_life_seconds: float = 30.0
+    admin_reload_enabled: bool = False
+    reload_watch_seconds: float = 0.0
 
     model_config = SettingsConfigDict(env_prefix="RAG_")
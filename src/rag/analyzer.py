@@ -0,0 +1,93 @@
+# src/rag/analyzer.py
+
+"""Shared text analysis for BM25: tokenization and term-id interning."""
+
+from __future__ import annotations
+
+import re
+from typing import Iterable, Optional, Sequence
+
+import numpy as np
+
+# Word characters, keeping in-word apostrophes ("don't") together; every other
+# punctuation character separates tokens.
+DEFAULT_TOKEN_PATTERN = r"\w+(?:'\w+)*"
+
+
+class Analyzer:
+    """
+    Regex tokenizer used at both index and query time.
+
+    The configuration is persisted with index artifacts (``config``) so a loaded
+    index always analyzes queries exactly as its documents were analyzed.
+    """
+
+    def __init__(
+        self, *, pattern: str = DEFAULT_TOKEN_PATTERN, lowercase: bool = True
+    ) -> None:
+        self.pattern = pattern
+        self.lowercase = lowercase
+        self._findall = re.compile(pattern).findall
+
+    @classmethod
+    def from_config(cls, config: dict) -> Analyzer:
+        return cls(pattern=config["pattern"], lowercase=config["lowercase"])
+
+    def config(self) -> dict:
+        return {"pattern": self.pattern, "lowercase": self.lowercase}
+
+    def tokenize(self, text: str) -> list[str]:
+        if self.lowercase:
+            text = text.lower()
+        return self._findall(text)
+
+
+class Vocabulary:
+    """
+    Term to integer id mapping.
+
+    Ids are assigned in first-seen order while indexing; after ``freeze`` the
+    vocabulary is read-only and unknown query terms are simply dropped.
+    """
+
+    def __init__(self, terms: Sequence[str] = (), *, frozen: bool = False) -> None:
+        self.terms: list[str] = list(terms)
+        self._ids = {term: term_id for term_id, term in enumerate(self.terms)}
+        if len(self._ids) != len(self.terms):
+            raise ValueError("vocabulary terms must be unique")
+        self.frozen = frozen
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    def __contains__(self, term: str) -> bool:
+        return term in self._ids
+
+    def __getitem__(self, term: str) -> int:
+        return self._ids[term]
+
+    def get(self, term: str) -> Optional[int]:
+        return self._ids.get(term)
+
+    def freeze(self) -> Vocabulary:
+        self.frozen = True
+        return self
+
+    def add(self, term: str) -> int:
+        term_id = self._ids.get(term)
+        if term_id is None:
+            if self.frozen:
+                raise ValueError("vocabulary is frozen")
+            term_id = len(self.terms)
+            self._ids[term] = term_id
+            self.terms.append(term)
+        return term_id
+
+    def encode(self, tokens: Iterable[str], *, add: bool = False) -> np.ndarray:
+        """Map tokens to an int32 id array; unknown tokens are dropped unless ``add``."""
+        if add:
+            ids = [self.add(token) for token in tokens]
+        else:
+            lookup = self._ids.get
+            ids = [term_id for term_id in map(lookup, tokens) if term_id is not None]
+        return np.asarray(ids, dtype=np.int32)
@@ -0,0 +1,37 @@
+# src/rag/artifacts.py
+
+"""Atomic writes for index artifacts that readers memory-map."""
+
+from __future__ import annotations
+
+import os
+from pathlib import Path
+
+import numpy as np
+
+
+def temp_path(path: Path) -> Path:
+    """Sibling temp file that ``os.replace`` can later move over ``path``."""
+    path = Path(path)
+    return path.with_name(f".{path.name}.tmp")
+
+
+def save_array(path: Path, array: np.ndarray) -> None:
+    """
+    ``np.save`` to a temp file in the same directory, then rename it over
+    ``path``. A process that has the old file mapped keeps its (unlinked) inode
+    instead of seeing the file truncated under it, which would SIGBUS.
+    """
+    path = Path(path)
+    tmp_path = temp_path(path)
+    with tmp_path.open("wb") as handle:
+        np.save(handle, array)
+    os.replace(tmp_path, path)
+
+
+def write_bytes(path: Path, data: bytes) -> None:
+    """``Path.write_bytes`` with the same temp-file-and-rename guarantee as ``save_array``."""
+    path = Path(path)
+    tmp_path = temp_path(path)
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, path)
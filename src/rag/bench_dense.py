@@ -0,0 +1,143 @@
+"""Benchmark approximate dense search (quantized, HNSW, IVF) against the exact np.dot scan."""
+
+from __future__ import annotations
+
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+
+from src.rag.hnsw import DEFAULT_M, HNSWIndex
+from src.rag.ivf import IVFIndex
+from src.rag.pca import load_pca
+from src.rag.quantization import (
+    QUANTIZATION_MODES,
+    QuantizedSearcher,
+    quantize_binary,
+    quantize_int8,
+)
+from src.rag.ranking import top_k_indices
+
+
+def _load_search_embeddings(index_dir: Path) -> np.ndarray:
+    embeddings = np.load(index_dir / "embeddings.npy", mmap_mode="r")
+    loaded = load_pca(index_dir, embeddings.shape[0])
+    if loaded is not None:
+        # Same matrix the API searches when the index has a PCA stage.
+        embeddings = loaded[1]
+    return np.asarray(embeddings, dtype=np.float32)
+
+
+def _sample_queries(embeddings: np.ndarray, count: int, noise: float, seed: int) -> np.ndarray:
+    """Stored vectors plus Gaussian noise, re-normalized (no model needed)."""
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(len(embeddings), size=min(count, len(embeddings)), replace=False)
+    queries = embeddings[np.sort(rows)] + noise * rng.standard_normal(
+        (len(rows), embeddings.shape[1])
+    ).astype(np.float32)
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+
+def _exact_top_k(embeddings: np.ndarray, query: np.ndarray, k: int) -> list[int]:
+    scores = np.dot(query, embeddings.T)
+    return top_k_indices(scores, k).tolist()
+
+
+def _quantized_searcher(index_dir: Path, mode: str, embeddings: np.ndarray) -> QuantizedSearcher:
+    searcher = QuantizedSearcher.load(index_dir, mode, embeddings)
+    if searcher is not None:
+        return searcher
+    print(f"No {mode} artifacts; quantizing in memory")
+    if mode == "int8":
+        codes, scales = quantize_int8(embeddings)
+        return QuantizedSearcher(mode, embeddings, int8_codes=codes, int8_scales=scales)
+    return QuantizedSearcher(mode, embeddings, binary_codes=quantize_binary(embeddings))
+
+
+def _run(label: str, search_fn, queries: np.ndarray, exact: list[list[int]], k: int) -> None:
+    latencies = []
+    recall = 0.0
+    for query, expected in zip(queries, exact):
+        start = time.perf_counter()
+        found = search_fn(query)
+        latencies.append((time.perf_counter() - start) * 1000)
+        recall += len(set(found) & set(expected)) / max(len(expected), 1)
+    p50, p95 = np.percentile(latencies, [50, 95])
+    print(
+        f"{label:<24} Recall@{k}={recall / len(queries):.3f} "
+        f"p50_ms={p50:.4f} p95_ms={p95:.4f}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark dense ANN search vs exact scan.")
+    parser.add_argument("--index", required=True, help="Index directory path.")
+    parser.add_argument("--queries", type=int, default=200, help="Number of probe queries.")
+    parser.add_argument("--noise", type=float, default=0.05, help="Query perturbation.")
+    parser.add_argument("--k", type=int, default=10, help="Results per query.")
+    parser.add_argument(
+        "--ef-search", nargs="*", type=int, default=[16, 32, 64, 128], help="HNSW beams."
+    )
+    parser.add_argument(
+        "--nprobe", nargs="*", type=int, default=[1, 4, 8, 16], help="IVF lists probed."
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Query sampling seed.")
+    args = parser.parse_args()
+
+    index_dir = Path(args.index)
+    embeddings = _load_search_embeddings(index_dir)
+    if embeddings.size == 0:
+        print(f"No embeddings in {index_dir}")
+        return
+    queries = _sample_queries(embeddings, args.queries, args.noise, args.seed)
+    exact = [_exact_top_k(embeddings, query, args.k) for query in queries]
+    print(f"Loaded {embeddings.shape[0]} x {embeddings.shape[1]} embeddings from {index_dir}")
+
+    _run("exact np.dot", lambda q: _exact_top_k(embeddings, q, args.k), queries, exact, args.k)
+
+    for mode in QUANTIZATION_MODES:
+        quantized = _quantized_searcher(index_dir, mode, embeddings)
+        # The first pass alone, which has to beat the exact scan to be worth having.
+        _run(
+            f"{mode} first pass",
+            lambda q, s=quantized: top_k_indices(s.first_pass(q), args.k).tolist(),
+            queries,
+            exact,
+            args.k,
+        )
+        _run(
+            f"{mode} + rescore",
+            lambda q, s=quantized: [idx for idx, _ in s.search(q, args.k)],
+            queries,
+            exact,
+            args.k,
+        )
+
+    hnsw = HNSWIndex.load(index_dir, embeddings)
+    if hnsw is None:
+        print(f"No HNSW artifacts; building in memory (m={DEFAULT_M}, seed=0)")
+        hnsw = HNSWIndex.build(embeddings)
+    for ef in args.ef_search:
+        _run(
+            f"hnsw ef_search={ef}",
+            lambda q, ef=ef: [idx for idx, _ in hnsw.search(q, args.k, ef_search=ef)],
+            queries,
+            exact,
+            args.k,
+        )
+
+    ivf = IVFIndex.load(index_dir, embeddings)
+    if ivf is not None:
+        for nprobe in args.nprobe:
+            _run(
+                f"ivf nprobe={nprobe}",
+                lambda q, nprobe=nprobe: [idx for idx, _ in ivf.search(q, args.k, nprobe=nprobe)],
+                queries,
+                exact,
+                args.k,
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,20 @@
 # src/rag/bm25.py
 
 from typing import List, Dict
-from rank_bm25 import BM25Okapi
+
+import numpy as np
+
+from src.rag.analyzer import Analyzer, Vocabulary
+from src.rag.bm25_index import BM25Index
 
 
 class BM25Retriever:
     def __init__(self, chunks: List[Dict], *, strict: bool = True):
         self.strict = strict
+        self.analyzer = Analyzer()
+        self.vocab = Vocabulary()
         self.chunks: List[Dict] = []
-        self.tokenized_corpus: List[List[str]] = []
+        self.tokenized_corpus: List[np.ndarray] = []
         self.bm25 = None
 
         if strict:
@@ -32,12 +38,14 @@ class BM25Retriever:
                 raise ValueError(f"chunk at index {idx} text must be non-empty")
 
         self.chunks = chunks
-        self.tokenized_corpus = [c["text"].lower().split() for c in chunks]
-        self.bm25 = BM25Okapi(self.tokenized_corpus)
+        self.tokenized_corpus = [self._encode(c["text"]) for c in chunks]
+        self.bm25 = BM25Index.from_term_ids(
+            self.tokenized_corpus, self.vocab, analyzer=self.analyzer
+        )
 
     def _init_permissive(self, chunks: List[Dict]) -> None:
         valid_chunks: List[Dict] = []
-        tokenized: List[List[str]] = []
+        tokenized: List[np.ndarray] = []
 
         for chunk in chunks or []:
             if not isinstance(chunk, dict):
@@ -48,12 +56,17 @@ class BM25Retriever:
             if not text.strip():
                 continue
             valid_chunks.append(chunk)
-            tokenized.append(text.lower().split())
+            tokenized.append(self._encode(text))
 
         self.chunks = valid_chunks
         self.tokenized_corpus = tokenized
         if tokenized:
-            self.bm25 = BM25Okapi(tokenized)
+            self.bm25 = BM25Index.from_term_ids(
+                tokenized, self.vocab, analyzer=self.analyzer
+            )
+
+    def _encode(self, text: str) -> np.ndarray:
+        return self.vocab.encode(self.analyzer.tokenize(text), add=True)
 
     def search(self, query: str, top_k: int = 5) -> List[Dict]:
         if top_k <= 0:
@@ -71,17 +84,14 @@ class BM25Retriever:
         if self.bm25 is None:
             return []
 
-        tokenized_query = query.lower().split()
+        tokenized_query = self.analyzer.tokenize(query)
         if not tokenized_query:
             return []
-        scores = self.bm25.get_scores(tokenized_query)
-
-        scored = list(zip(self.chunks, scores))
-        scored.sort(key=lambda x: x[1], reverse=True)
+        ranked = self.bm25.top_k(tokenized_query, top_k)
 
         results = []
-        for chunk, score in scored[:top_k]:
-            result = dict(chunk)
+        for idx, score in ranked:
+            result = dict(self.chunks[idx])
             result["score"] = float(score)
             results.append(result)
 
@@ -0,0 +1,584 @@
+# src/rag/bm25_index.py
+
+"""Inverted-index BM25 (Okapi) scoring over NumPy postings lists."""
+
+from __future__ import annotations
+
+import json
+import math
+from array import array
+from collections import Counter
+from pathlib import Path
+from typing import Iterable, Optional, Sequence
+
+import numpy as np
+
+from src.rag.analyzer import Analyzer, Vocabulary
+from src.rag.ranking import top_k as rank_top_k
+
+DEFAULT_K1 = 1.5
+DEFAULT_B = 0.75
+DEFAULT_EPSILON = 0.25
+
+# Bump whenever the on-disk layout or the tokenization it was built with changes.
+BM25_INDEX_VERSION = 2
+BM25_INDEX_DIRNAME = "bm25"
+_ARRAY_NAMES = ("idf", "offsets", "postings_docs", "postings_tfs", "doc_len")
+
+# Relative slack applied to MaxScore upper bounds so that float rounding in
+# partial sums can never prune a document that exhaustive scoring would keep.
+_PRUNE_SLACK = 1e-9
+# A binary-search probe costs about this many sequential postings reads.
+_PROBE_COST = 8
+# Postings sampled per term for the running MaxScore threshold.
+_THRESHOLD_SAMPLE = 4096
+# Postings ``BM25Builder`` buffers before spilling a sorted run to disk.
+_SPILL_POSTINGS = 1 << 22
+
+
+class BM25Index:
+    """
+    BM25Okapi-compatible index that only touches documents matching a query term.
+
+    Terms are interned through a frozen ``Vocabulary``; postings are stored
+    term-major in flat arrays: the postings of term id ``t`` are
+    ``postings_docs[offsets[t]:offsets[t + 1]]`` (ascending doc ids) with matching
+    ``postings_tfs``. IDF, per-document length norms and per-posting weights are
+    precomputed, so scoring a term is a single scatter-add into the score vector.
+    Scores are bit-identical to ``rank_bm25.BM25Okapi.get_scores`` for the same
+    tokens.
+
+    ``top_k`` additionally uses per-term max weights as MaxScore upper bounds to
+    skip documents that cannot reach the current top-k.
+    """
+
+    def __init__(
+        self,
+        vocab: Vocabulary,
+        idf: np.ndarray,
+        offsets: np.ndarray,
+        postings_docs: np.ndarray,
+        postings_tfs: np.ndarray,
+        doc_len: np.ndarray,
+        *,
+        analyzer: Optional[Analyzer] = None,
+        k1: float = DEFAULT_K1,
+        b: float = DEFAULT_B,
+        epsilon: float = DEFAULT_EPSILON,
+    ) -> None:
+        self.vocab = vocab.freeze()
+        self.analyzer = analyzer or Analyzer()
+        self.idf = np.asarray(idf, dtype=np.float64)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.postings_docs = np.asarray(postings_docs, dtype=np.int32)
+        self.postings_tfs = np.asarray(postings_tfs, dtype=np.int32)
+        self.doc_len = np.asarray(doc_len, dtype=np.int32)
+        self.k1 = k1
+        self.b = b
+        self.epsilon = epsilon
+
+        self.num_docs = int(self.doc_len.shape[0])
+        total_len = int(self.doc_len.sum())
+        self.avgdl = total_len / self.num_docs if self.num_docs else 0.0
+        if self.avgdl:
+            self.norms = self.k1 * (1 - self.b + self.b * self.doc_len / self.avgdl)
+        else:
+            self.norms = np.zeros(self.num_docs, dtype=np.float64)
+
+        df = np.diff(self.offsets)
+        term_of_posting = np.repeat(np.arange(len(self.idf), dtype=np.int64), df)
+        tfs = self.postings_tfs
+        self.postings_weights = self.idf[term_of_posting] * (
+            tfs * (self.k1 + 1) / (tfs + self.norms[self.postings_docs])
+        )
+        self.max_weights = np.zeros(len(self.idf), dtype=np.float64)
+        nonempty = df > 0
+        if self.postings_weights.size:
+            self.max_weights[nonempty] = np.maximum.reduceat(
+                self.postings_weights, self.offsets[:-1][nonempty]
+            )
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: Iterable[str],
+        *,
+        analyzer: Optional[Analyzer] = None,
+        k1: float = DEFAULT_K1,
+        b: float = DEFAULT_B,
+        epsilon: float = DEFAULT_EPSILON,
+    ) -> BM25Index:
+        analyzer = analyzer or Analyzer()
+        vocab = Vocabulary()
+        docs = [vocab.encode(analyzer.tokenize(text), add=True) for text in texts]
+        return cls.from_term_ids(
+            docs, vocab, analyzer=analyzer, k1=k1, b=b, epsilon=epsilon
+        )
+
+    @classmethod
+    def from_corpus(
+        cls,
+        corpus: Sequence[Sequence[str]],
+        *,
+        k1: float = DEFAULT_K1,
+        b: float = DEFAULT_B,
+        epsilon: float = DEFAULT_EPSILON,
+    ) -> BM25Index:
+        """Build from pre-tokenized documents (the ``BM25Okapi`` input format)."""
+        vocab = Vocabulary()
+        docs = [vocab.encode(tokens, add=True) for tokens in corpus]
+        return cls.from_term_ids(docs, vocab, k1=k1, b=b, epsilon=epsilon)
+
+    @classmethod
+    def from_term_ids(
+        cls,
+        docs: Sequence[np.ndarray],
+        vocab: Vocabulary,
+        *,
+        analyzer: Optional[Analyzer] = None,
+        k1: float = DEFAULT_K1,
+        b: float = DEFAULT_B,
+        epsilon: float = DEFAULT_EPSILON,
+    ) -> BM25Index:
+        """
+        Build from int32 term-id documents.
+
+        IDFs are summed in term-id order; with ids assigned in first-seen order
+        (``Vocabulary.encode(..., add=True)``) that is also BM25Okapi's order,
+        which keeps the epsilon floor exact.
+        """
+        if not docs:
+            raise ValueError("corpus must be non-empty")
+
+        doc_len = np.fromiter((len(doc) for doc in docs), dtype=np.int32, count=len(docs))
+        uniques = [np.unique(doc, return_counts=True) for doc in docs]
+        term_arr = np.concatenate(
+            [terms for terms, _ in uniques] + [np.empty(0, dtype=np.int32)]
+        ).astype(np.int64)
+        tf_arr = np.concatenate(
+            [counts for _, counts in uniques] + [np.empty(0, dtype=np.int64)]
+        )
+        doc_arr = np.repeat(
+            np.arange(len(docs), dtype=np.int32), [len(terms) for terms, _ in uniques]
+        )
+
+        order = np.argsort(term_arr, kind="stable")
+        df = np.bincount(term_arr, minlength=len(vocab))
+        offsets = np.zeros(len(vocab) + 1, dtype=np.int64)
+        np.cumsum(df, out=offsets[1:])
+
+        idf = _okapi_idf(df.tolist(), len(docs), epsilon)
+        return cls(
+            vocab,
+            idf,
+            offsets,
+            doc_arr[order],
+            tf_arr[order].astype(np.int32),
+            doc_len,
+            analyzer=analyzer,
+            k1=k1,
+            b=b,
+            epsilon=epsilon,
+        )
+
+    def save(self, path: Path, *, corpus_fingerprint: Optional[str] = None) -> None:
+        """
+        Write the index as ``meta.json``, ``vocab.json`` and one ``.npy`` per
+        array. ``corpus_fingerprint`` identifies the documents it was built
+        from (``build_index`` uses the SHA-256 of ``metadata.jsonl``).
+        """
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        for name in _ARRAY_NAMES:
+            np.save(path / f"{name}.npy", getattr(self, name))
+        with (path / "vocab.json").open("w", encoding="utf-8") as handle:
+            json.dump(self.vocab.terms, handle, ensure_ascii=True)
+        meta = {
+            "version": BM25_INDEX_VERSION,
+            "analyzer": self.analyzer.config(),
+            "num_docs": self.num_docs,
+            "k1": self.k1,
+            "b": self.b,
+            "epsilon": self.epsilon,
+            "corpus_fingerprint": corpus_fingerprint,
+        }
+        with (path / "meta.json").open("w", encoding="utf-8") as handle:
+            json.dump(meta, handle, indent=2, sort_keys=True)
+
+    @classmethod
+    def load(cls, path: Path) -> BM25Index:
+        path = Path(path)
+        with (path / "meta.json").open("r", encoding="utf-8") as handle:
+            meta = json.load(handle)
+        if meta.get("version") != BM25_INDEX_VERSION:
+            raise ValueError(
+                f"unsupported BM25 index version {meta.get('version')!r}"
+            )
+        with (path / "vocab.json").open("r", encoding="utf-8") as handle:
+            vocab = Vocabulary(json.load(handle), frozen=True)
+        arrays = {name: np.load(path / f"{name}.npy") for name in _ARRAY_NAMES}
+        return cls(
+            vocab,
+            arrays["idf"],
+            arrays["offsets"],
+            arrays["postings_docs"],
+            arrays["postings_tfs"],
+            arrays["doc_len"],
+            analyzer=Analyzer.from_config(meta["analyzer"]),
+            k1=meta["k1"],
+            b=meta["b"],
+            epsilon=meta["epsilon"],
+        )
+
+    def search(self, query: str, k: int) -> list[tuple[int, float]]:
+        """Analyze ``query`` with the index's own analyzer and return its top k."""
+        return self.top_k(self.analyzer.tokenize(query), k)
+
+    def search_batch(self, queries: Sequence[str], k: int) -> list[list[tuple[int, float]]]:
+        """``search`` for several queries, sharing postings work across them."""
+        return self.top_k_batch([self.analyzer.tokenize(query) for query in queries], k)
+
+    def postings(self, term_id: int) -> tuple[np.ndarray, np.ndarray]:
+        """Return (doc ids, weights) for a term id."""
+        start = self.offsets[term_id]
+        end = self.offsets[term_id + 1]
+        return self.postings_docs[start:end], self.postings_weights[start:end]
+
+    def get_scores(self, query_tokens: Sequence[str]) -> np.ndarray:
+        """Score every document; only postings of query terms are visited."""
+        scores = np.zeros(self.num_docs, dtype=np.float64)
+        for term_id in self.vocab.encode(query_tokens).tolist():
+            docs, weights = self.postings(term_id)
+            scores[docs] += weights
+        return scores
+
+    def top_k(
+        self,
+        query_tokens: Sequence[str],
+        k: int,
+        *,
+        stats: Optional[dict] = None,
+    ) -> list[tuple[int, float]]:
+        """
+        Return the k best (doc index, score) pairs ordered by (-score, index).
+
+        The ranking is identical to sorting ``get_scores`` exhaustively. Query
+        terms are scatter-added into one dense score vector in decreasing order
+        of their max-score upper bound, while a running k-th best score is
+        kept as threshold; once the bounds of the remaining terms cannot lift
+        an unseen document over it, those terms are only probed for the
+        surviving candidates (MaxScore). Queries with fewer than two distinct
+        terms, where nothing can be skipped, are scored exhaustively, and so
+        are the remaining terms once tracking the candidates would cost more
+        than reading their postings. When
+        ``stats`` is given it is filled with ``postings_total`` (what
+        exhaustive scoring visits) and ``postings_evaluated`` (postings read
+        plus candidate probes, never more than ``postings_total``).
+        """
+        term_ids = self.vocab.encode(query_tokens).tolist()
+        counts = Counter(term_ids)
+        lengths = {t: int(self.offsets[t + 1] - self.offsets[t]) for t in counts}
+        postings_total = sum(lengths[t] for t in term_ids)
+        if stats is not None:
+            stats["postings_total"] = postings_total
+            stats["postings_evaluated"] = 0
+        k = min(k, self.num_docs)
+        if k <= 0:
+            return []
+        if len(counts) < 2 or (self.idf[term_ids] < 0).any():
+            # Nothing to skip, or negative contributions break the upper-bound argument.
+            if stats is not None:
+                stats["postings_evaluated"] = postings_total
+            return rank_top_k(self.get_scores(query_tokens), k)
+
+        bounds = {t: counts[t] * float(self.max_weights[t]) for t in counts}
+        order = sorted(counts, key=lambda t: (-bounds[t], t))
+        remaining = [0.0] * (len(order) + 1)
+        for pos in range(len(order) - 1, -1, -1):
+            remaining[pos] = remaining[pos + 1] + bounds[order[pos]]
+
+        # Essential terms: partial scores only grow, so the k-th best partial
+        # score of any document set is a valid lower bound on the final k-th.
+        acc = np.zeros(self.num_docs, dtype=np.float64)
+        threshold = float("-inf")
+        evaluated = 0
+        pos = 0
+        while pos < len(order) and not _below(remaining[pos], threshold):
+            docs, weights = self.postings(order[pos])
+            acc[docs] += counts[order[pos]] * weights
+            evaluated += len(docs)
+            pos += 1
+            # No partial score exceeds the bounds added so far; only pay for
+            # the k-th largest once it could drop the remaining terms, and take
+            # it over an evenly strided sample of long lists (any subset gives
+            # a valid, if looser, bound).
+            if remaining[0] - remaining[pos] > remaining[pos]:
+                sample = docs[:: max(1, len(docs) // _THRESHOLD_SAMPLE)]
+                threshold = max(threshold, _kth_largest(acc[sample], k))
+        cand_docs = None
+        if pos < len(order):
+            # ``acc + remaining[pos]`` not below the threshold, in one pass over ``acc``.
+            cutoff = threshold - abs(threshold) * _PRUNE_SLACK - remaining[pos]
+            cand_docs = np.flatnonzero(acc >= cutoff)
+            if len(cand_docs) * (len(order) - pos) >= sum(lengths[t] for t in order[pos:]):
+                # Pruning cannot pay off: tracking the candidates would cost
+                # more than scoring the remaining postings exhaustively.
+                for term_id in order[pos:]:
+                    docs, weights = self.postings(term_id)
+                    acc[docs] += counts[term_id] * weights
+                    evaluated += len(docs)
+                pos = len(order)
+                cand_docs = None
+        if cand_docs is None:
+            # Every posting was scattered, so ``acc`` holds all partial scores.
+            cand_docs = np.flatnonzero(acc > 0)
+
+        # Non-essential terms: unseen documents can no longer qualify, so only
+        # the candidates whose upper bound still reaches the threshold are
+        # scored, by probing the postings for them or, when there are too many
+        # to probe cheaply, by scattering the whole list.
+        while pos < len(order):
+            cand_scores = acc[cand_docs]
+            threshold = max(threshold, _kth_largest(cand_scores, k))
+            cand_docs = cand_docs[~_below(cand_scores + remaining[pos], threshold)]
+            term_id = order[pos]
+            if len(cand_docs) * _PROBE_COST < lengths[term_id]:
+                evaluated += len(cand_docs)
+                idx, found = self._lookup(term_id, cand_docs)
+                acc[cand_docs[found]] += counts[term_id] * self.postings_weights[idx[found]]
+            else:
+                evaluated += lengths[term_id]
+                docs, weights = self.postings(term_id)
+                acc[docs] += counts[term_id] * weights
+            pos += 1
+        cand_scores = acc[cand_docs]
+        del acc
+        threshold = max(threshold, _kth_largest(cand_scores, k))
+        cand_docs = cand_docs[~_below(cand_scores, threshold)]
+
+        # Rescore the few survivors in query order so scores are bit-identical
+        # to get_scores and ties resolve exactly as in exhaustive ranking. These
+        # probes re-read postings already counted above.
+        found_weights = {}
+        for term_id in counts:
+            idx, found = self._lookup(term_id, cand_docs)
+            found_weights[term_id] = (found, self.postings_weights[idx[found]])
+        exact = np.zeros(len(cand_docs), dtype=np.float64)
+        for term_id in term_ids:
+            found, weights = found_weights[term_id]
+            exact[found] += weights
+        if stats is not None:
+            stats["postings_evaluated"] = evaluated
+
+        positive = exact > 0
+        ranked = rank_top_k(exact[positive], k)
+        docs = cand_docs[positive]
+        results = [(int(docs[i]), score) for i, score in ranked]
+        if len(results) < k:
+            # Fewer than k documents score above zero: exhaustive ranking fills
+            # the rest with zero-score documents in index order.
+            taken = {doc for doc, _ in results}
+            for doc in range(self.num_docs):
+                if len(results) == k:
+                    break
+                if doc not in taken:
+                    results.append((doc, 0.0))
+        return results
+
+    def top_k_batch(
+        self, queries_tokens: Sequence[Sequence[str]], k: int
+    ) -> list[list[tuple[int, float]]]:
+        """
+        ``top_k`` for several queries at once, with identical results.
+
+        Each distinct query is ranked once with ``top_k``, so repeated queries
+        in a batch share their work. A shared (queries x matching docs) score
+        matrix was measured slower than this loop: it cannot skip postings the
+        way MaxScore does and grows with the batch.
+        """
+        ranked: dict[tuple[str, ...], list[tuple[int, float]]] = {}
+        results = []
+        for tokens in queries_tokens:
+            key = tuple(tokens)
+            if key not in ranked:
+                ranked[key] = self.top_k(tokens, k)
+            results.append(list(ranked[key]))
+        return results
+
+    def _lookup(self, term_id: int, docs: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        start = int(self.offsets[term_id])
+        end = int(self.offsets[term_id + 1])
+        postings = self.postings_docs[start:end]
+        pos = np.searchsorted(postings, docs)
+        found = pos < len(postings)
+        found[found] = postings[pos[found]] == docs[found]
+        return pos + start, found
+
+
+class BM25Builder:
+    """
+    Builds a ``BM25Index`` from texts streamed one at a time.
+
+    Each text is tokenized and interned as it arrives, and only its distinct
+    (term, tf) pairs are buffered. Every ``spill_postings`` postings the
+    buffer is sorted by term and written to ``spill_dir`` as one run; ``build``
+    merges the runs, which already hold ascending doc ids, straight into the
+    term-major postings arrays. Apart from the result, only the vocabulary,
+    document lengths and one run are held in memory. The index is identical to
+    ``BM25Index.from_texts`` over the same texts.
+    """
+
+    def __init__(
+        self,
+        spill_dir: Path,
+        *,
+        analyzer: Optional[Analyzer] = None,
+        k1: float = DEFAULT_K1,
+        b: float = DEFAULT_B,
+        epsilon: float = DEFAULT_EPSILON,
+        spill_postings: int = _SPILL_POSTINGS,
+    ) -> None:
+        self.spill_dir = Path(spill_dir)
+        self.spill_dir.mkdir(parents=True, exist_ok=True)
+        self.analyzer = analyzer or Analyzer()
+        self.vocab = Vocabulary()
+        self.k1 = k1
+        self.b = b
+        self.epsilon = epsilon
+        self.spill_postings = spill_postings
+        self._doc_len = array("i")
+        self._terms: list[np.ndarray] = []
+        self._tfs: list[np.ndarray] = []
+        self._buffered = 0
+        self._runs: list[Path] = []
+
+    def __len__(self) -> int:
+        return len(self._doc_len)
+
+    def add(self, text: str) -> None:
+        term_ids = self.vocab.encode(self.analyzer.tokenize(text), add=True)
+        terms, tfs = np.unique(term_ids, return_counts=True)
+        self._doc_len.append(len(term_ids))
+        self._terms.append(terms)
+        self._tfs.append(tfs)
+        self._buffered += len(terms)
+        if self._buffered >= self.spill_postings:
+            self._spill()
+
+    def _spill(self) -> None:
+        if not self._terms:
+            return
+        first = len(self._doc_len) - len(self._terms)
+        terms = np.concatenate(self._terms).astype(np.int32)
+        docs = np.repeat(
+            np.arange(first, len(self._doc_len), dtype=np.int32),
+            [len(doc_terms) for doc_terms in self._terms],
+        )
+        tfs = np.concatenate(self._tfs).astype(np.int32)
+        order = np.argsort(terms, kind="stable")
+        path = self.spill_dir / f"run-{len(self._runs):05d}.npy"
+        np.save(path, np.stack([terms[order], docs[order], tfs[order]]))
+        self._runs.append(path)
+        self._terms, self._tfs, self._buffered = [], [], 0
+
+    def build(self) -> BM25Index:
+        """Merge the spilled runs into a ``BM25Index`` and delete them."""
+        self._spill()
+        if not self._doc_len:
+            raise ValueError("corpus must be non-empty")
+        num_terms = len(self.vocab)
+        df = np.zeros(num_terms, dtype=np.int64)
+        for path in self._runs:
+            df += np.bincount(np.load(path, mmap_mode="r")[0], minlength=num_terms)
+        offsets = np.zeros(num_terms + 1, dtype=np.int64)
+        np.cumsum(df, out=offsets[1:])
+        postings_docs = np.empty(offsets[-1], dtype=np.int32)
+        postings_tfs = np.empty(offsets[-1], dtype=np.int32)
+        # Runs cover increasing doc ranges, so appending each run's slice of a
+        # term after the previous runs' keeps every postings list ascending.
+        cursor = offsets[:-1].copy()
+        for path in self._runs:
+            terms, docs, tfs = np.load(path)
+            run_df = np.bincount(terms, minlength=num_terms)
+            run_start = np.cumsum(run_df) - run_df
+            dest = cursor[terms] + np.arange(len(terms)) - run_start[terms]
+            postings_docs[dest] = docs
+            postings_tfs[dest] = tfs
+            cursor += run_df
+            path.unlink()
+        self._runs = []
+        return BM25Index(
+            self.vocab,
+            _okapi_idf(df.tolist(), len(self._doc_len), self.epsilon),
+            offsets,
+            postings_docs,
+            postings_tfs,
+            np.asarray(self._doc_len, dtype=np.int32),
+            analyzer=self.analyzer,
+            k1=self.k1,
+            b=self.b,
+            epsilon=self.epsilon,
+        )
+
+
+def load_bm25_index(index_dir: Path, num_docs: int) -> Optional[BM25Index]:
+    """
+    Load the prebuilt BM25 artifact from an index directory.
+
+    Returns None when the artifact is missing or stale (format version or
+    corpus fingerprint not the one recorded in ``params.json``, or a different
+    document count), in which case callers rebuild it. The fingerprint catches
+    a rebuild with the same chunk count, and an interrupted build that left
+    the artifact next to rows it was not built from. The loaded index carries
+    the analyzer it was built with, so queries are always tokenized like the
+    indexed documents.
+    """
+    index_dir = Path(index_dir)
+    path = index_dir / BM25_INDEX_DIRNAME
+    meta_path = path / "meta.json"
+    params_path = index_dir / "params.json"
+    if not meta_path.exists() or not params_path.exists():
+        return None
+    with params_path.open("r", encoding="utf-8") as handle:
+        params = json.load(handle)
+    if params.get("bm25_index_version") != BM25_INDEX_VERSION:
+        return None
+    with meta_path.open("r", encoding="utf-8") as handle:
+        meta = json.load(handle)
+    if (
+        meta.get("version") != BM25_INDEX_VERSION
+        or meta.get("num_docs") != num_docs
+        or meta.get("corpus_fingerprint") != params.get("corpus_fingerprint")
+    ):
+        return None
+    try:
+        return BM25Index.load(path)
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def _kth_largest(scores: np.ndarray, k: int) -> float:
+    if len(scores) < k:
+        return float("-inf")
+    return float(np.partition(scores, len(scores) - k)[len(scores) - k])
+
+
+def _below(bound, threshold: float):
+    """True where an upper bound cannot reach the threshold, with rounding slack."""
+    return bound < threshold - abs(threshold) * _PRUNE_SLACK
+
+
+def _okapi_idf(df: Sequence[int], num_docs: int, epsilon: float) -> np.ndarray:
+    idf = np.empty(len(df), dtype=np.float64)
+    idf_sum = 0.0
+    negative: list[int] = []
+    for term_id, freq in enumerate(df):
+        value = math.log(num_docs - freq + 0.5) - math.log(freq + 0.5)
+        idf[term_id] = value
+        idf_sum += value
+        if value < 0:
+            negative.append(term_id)
+    average_idf = idf_sum / len(df) if len(df) else 0.0
+    if negative:
+        idf[negative] = epsilon * average_idf
+    return idf
@@ -4,15 +4,34 @@ from __future__ import annotations
 
 import argparse
 import json
+import multiprocessing
+import os
+import shutil
+from array import array
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Iterable
+from typing import Any, Callable, Iterable, Optional, Sequence
 
 import numpy as np
-from sentence_transformers import SentenceTransformer
 
+from src.rag.artifacts import save_array
+from src.rag.bm25_index import BM25_INDEX_DIRNAME, BM25_INDEX_VERSION, BM25Builder
+from src.rag.chunk_store import CHUNK_STORE_DIRNAME, ChunkStore, ChunkStoreWriter
 from src.rag.chunking import chunk_text
+from src.rag.embedding_cache import CachedEncoder, EmbeddingCache, format_report
+from src.rag.hnsw import DEFAULT_EF_CONSTRUCTION, HNSWIndex
+from src.rag.ivf import IVFIndex
+from src.rag.manifest import BuildManifest, content_hash, file_hash
+from src.rag.pca import write_pca
+from src.rag.quantization import QUANTIZATION_MODES, write_quantized
 
 DEFAULT_MODEL_NAME = "all-MiniLM-L6-v2"
+DEFAULT_BATCH_SIZE = 64
+PARTIAL_EMBEDDINGS_FILE = "embeddings.npy.partial"
+PROGRESS_FILE = "embeddings.progress.json"
+# Every artifact of a build is written here first and moved into place by ``_publish``.
+STAGING_DIRNAME = "staging.partial"
 
 
 def _iter_input_files(input_dir: Path) -> Iterable[Path]:
@@ -23,77 +42,560 @@ def _iter_input_files(input_dir: Path) -> Iterable[Path]:
     return sorted(files, key=lambda path: str(path))
 
 
-def _write_metadata(metadata_path: Path, chunks: list[dict]) -> None:
-    with metadata_path.open("w", encoding="utf-8") as handle:
-        for chunk in chunks:
-            record = {
-                "doc_id": chunk["doc_id"],
-                "chunk_id": chunk["chunk_id"],
-                "text": chunk["text"],
-                "start_offset": chunk["start_offset"],
-                "end_offset": chunk["end_offset"],
-            }
-            json.dump(record, handle, ensure_ascii=True)
-            handle.write("\n")
+def _metadata_line(chunk: dict) -> str:
+    record = {
+        "doc_id": chunk["doc_id"],
+        "chunk_id": chunk["chunk_id"],
+        "text": chunk["text"],
+        "start_offset": chunk["start_offset"],
+        "end_offset": chunk["end_offset"],
+    }
+    return json.dumps(record, ensure_ascii=True) + "\n"
 
 
-def main() -> None:
-    parser = argparse.ArgumentParser(description="Build offline retrieval index.")
-    parser.add_argument("--input", required=True, help="Input directory of raw files.")
-    parser.add_argument(
-        "--output", required=True, help="Output directory for index artifacts."
-    )
-    parser.add_argument(
-        "--chunk-size", type=int, default=500, help="Chunk size in characters."
-    )
-    parser.add_argument("--overlap", type=int, default=0, help="Chunk overlap.")
-    parser.add_argument(
-        "--model", default=DEFAULT_MODEL_NAME, help="SentenceTransformer model name."
+class _MetadataReader:
+    """
+    Reads row ranges of a previous ``metadata.jsonl`` without loading it.
+
+    Reused ranges arrive in ascending order (files are visited sorted), so the
+    reader only moves forward; an earlier range reopens the file.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._handle = None
+        self._row = 0
+
+    def read(self, start: int, stop: int) -> list[str]:
+        if self._handle is None or start < self._row:
+            self.close()
+            self._handle = self.path.open("r", encoding="utf-8")
+            self._row = 0
+        for _ in range(start - self._row):
+            self._handle.readline()
+        lines = [self._handle.readline() for _ in range(stop - start)]
+        self._row = stop
+        if lines and not lines[-1].endswith("\n"):
+            raise ValueError(f"{self.path} ended before row {stop}")
+        return lines
+
+    def close(self) -> None:
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+
+
+def _publish(staging_dir: Path, output_dir: Path) -> None:
+    """
+    Move a finished build from ``staging_dir`` into ``output_dir``.
+
+    Derived indexes (BM25, PCA, quantized codes, IVF, HNSW) go first, then the
+    row artifacts: ``embeddings.npy``, ``metadata.jsonl`` and the chunk store.
+    Everything is computed before the first rename, so the window in which
+    old and new files sit side by side is a handful of renames; the BM25
+    artifact also records the corpus it was built from (see
+    ``load_bm25_index``). ``params.json`` is written after this returns.
+    """
+    rows = {"metadata.jsonl", CHUNK_STORE_DIRNAME}
+    staged = sorted(path for path in staging_dir.rglob("*") if path.is_file())
+    derived = [path for path in staged if path.relative_to(staging_dir).parts[0] not in rows]
+    row_files = [path for path in staged if path not in derived]
+    for path in derived:
+        _move(path, output_dir / path.relative_to(staging_dir))
+    os.replace(output_dir / PARTIAL_EMBEDDINGS_FILE, output_dir / "embeddings.npy")
+    (output_dir / PROGRESS_FILE).unlink(missing_ok=True)
+    for path in row_files:
+        _move(path, output_dir / path.relative_to(staging_dir))
+    shutil.rmtree(staging_dir)
+
+
+def _move(source: Path, target: Path) -> None:
+    target.parent.mkdir(parents=True, exist_ok=True)
+    os.replace(source, target)
+
+
+def _load_model(model_name: str) -> Any:
+    from sentence_transformers import SentenceTransformer
+
+    return SentenceTransformer(model_name)
+
+
+def _reusable_manifest(
+    previous_dir: Path, settings: dict
+) -> Optional[tuple[BuildManifest, np.ndarray]]:
+    """Load the previous build's manifest and embeddings if its rows can be reused."""
+    manifest = BuildManifest.load(previous_dir)
+    if manifest is None or manifest.settings != settings:
+        return None
+    if not manifest.matches_artifacts(previous_dir):
+        # The rows on disk are not the ones the manifest describes, e.g. a
+        # build died after replacing embeddings.npy but before the manifest.
+        return None
+    try:
+        embeddings = np.load(previous_dir / "embeddings.npy", mmap_mode="r")
+    except (OSError, ValueError):
+        return None
+    if embeddings.shape[0] != manifest.num_chunks:
+        return None
+    return manifest, embeddings
+
+
+def _chunk_file(
+    path: str, doc_id: str, old_digest: Optional[str], chunk_size: int, overlap: int
+) -> tuple[str, Optional[list[dict]]]:
+    """Hash one input file and chunk it, unless its hash equals ``old_digest``."""
+    digest = content_hash(Path(path).read_bytes())
+    if digest == old_digest:
+        return digest, None
+    text = Path(path).read_text(encoding="utf-8")
+    return digest, chunk_text(text, doc_id, chunk_size=chunk_size, overlap=overlap)
+
+
+def _chunk_files(jobs: list[tuple], workers: int) -> Iterable[tuple[str, Optional[list[dict]]]]:
+    """
+    Run ``_chunk_file`` over ``jobs`` in order, on a process pool when
+    ``workers > 1``. At most ``4 * workers`` files are in flight, so chunks
+    the consumer has not reached yet do not pile up in memory.
+    """
+    if workers <= 1 or len(jobs) <= 1:
+        for job in jobs:
+            yield _chunk_file(*job)
+        return
+    # Spawned, not forked: the parent may already run BLAS or encoder threads.
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        pending: deque = deque()
+        for job in jobs:
+            pending.append(pool.submit(_chunk_file, *job))
+            if len(pending) >= 4 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def length_buckets(lengths: Sequence[int], batch_size: int) -> list[np.ndarray]:
+    """Group text indices into batches of similar length, so little of each batch is padding."""
+    order = np.argsort(np.asarray(lengths, dtype=np.int64), kind="stable")
+    return [order[start : start + batch_size] for start in range(0, len(order), batch_size)]
+
+
+def _save_progress(path: Path, fingerprint: str, batches_done: int) -> None:
+    tmp_path = path.with_name(path.name + ".tmp")
+    tmp_path.write_text(
+        json.dumps({"fingerprint": fingerprint, "batches_done": batches_done}),
+        encoding="utf-8",
     )
-    args = parser.parse_args()
+    os.replace(tmp_path, path)
 
-    input_dir = Path(args.input)
-    output_dir = Path(args.output)
+
+def _load_progress(path: Path, fingerprint: str) -> int:
+    try:
+        progress = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return 0
+    if progress.get("fingerprint") != fingerprint:
+        return 0
+    return int(progress.get("batches_done", 0))
+
+
+def _write_embeddings(
+    output_dir: Path,
+    num_rows: int,
+    reused: list[tuple[int, int, int]],
+    old_embeddings: Optional[np.ndarray],
+    new_rows: np.ndarray,
+    new_lengths: np.ndarray,
+    read_text: Callable[[int], str],
+    encode: Callable[[list[str]], np.ndarray],
+    batch_size: int,
+    fingerprint: str,
+) -> None:
+    """
+    Stream all embedding rows into ``embeddings.npy.partial``.
+
+    Rows are written into a preallocated ``embeddings.npy.partial`` memmap:
+    ``reused`` copies ``(dest_start, src_start, src_stop)`` row ranges from
+    ``old_embeddings``, then the texts of ``new_rows`` (fetched one batch at a
+    time with ``read_text``) are encoded in buckets of similar
+    ``new_lengths``. After each batch the memmap is flushed and the
+    batch count recorded in ``embeddings.progress.json``; a later run with the
+    same ``fingerprint`` resumes after the last recorded batch. ``_publish``
+    later renames the finished file over ``embeddings.npy``, so a server still
+    mapping the old file keeps reading consistent data.
+    """
+    partial_path = output_dir / PARTIAL_EMBEDDINGS_FILE
+    progress_path = output_dir / PROGRESS_FILE
+    if num_rows == 0:
+        save_array(partial_path, np.empty((0, 0), dtype=np.float32))
+        return
+    batches = length_buckets(new_lengths, batch_size)
+
+    def batch_texts(batch: np.ndarray) -> list[str]:
+        return [read_text(row) for row in new_rows[batch].tolist()]
+
+    done = _load_progress(progress_path, fingerprint) if partial_path.exists() else 0
+    if done:
+        array = np.lib.format.open_memmap(partial_path, mode="r+")
+    else:
+        first = None
+        if reused:
+            dim = old_embeddings.shape[1]
+        else:
+            first = encode(batch_texts(batches[0]))
+            dim = first.shape[1]
+        array = np.lib.format.open_memmap(
+            partial_path, mode="w+", dtype=np.float32, shape=(num_rows, dim)
+        )
+        for dest, start, stop in reused:
+            array[dest : dest + stop - start] = old_embeddings[start:stop]
+        if first is not None:
+            array[new_rows[batches[0]]] = first
+            done = 1
+        array.flush()
+        _save_progress(progress_path, fingerprint, done)
+
+    for number in range(done, len(batches)):
+        batch = batches[number]
+        array[new_rows[batch]] = encode(batch_texts(batch))
+        array.flush()
+        _save_progress(progress_path, fingerprint, number + 1)
+
+
+def build_index(
+    input_dir: Path,
+    output_dir: Path,
+    *,
+    chunk_size: int = 500,
+    overlap: int = 0,
+    model_name: str = DEFAULT_MODEL_NAME,
+    snippet_chars: int = 220,
+    quantize: Sequence[str] = (),
+    pca_dim: Optional[int] = None,
+    ivf_lists: Optional[int] = None,
+    hnsw_m: Optional[int] = None,
+    hnsw_ef_construction: int = DEFAULT_EF_CONSTRUCTION,
+    seed: int = 0,
+    previous_dir: Optional[Path] = None,
+    full: bool = False,
+    workers: int = 1,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    embedding_cache: Optional[EmbeddingCache] = None,
+    model_factory: Callable[[str], Any] = _load_model,
+) -> dict:
+    """
+    Build all index artifacts in ``output_dir`` and return the build stats.
+
+    Unless ``full`` is set, the manifest of ``previous_dir`` (default:
+    ``output_dir``) is consulted: files whose content hash is unchanged keep
+    their chunks and embedding rows, and only added or changed files are
+    chunked and embedded. The corpus-wide artifacts (BM25, chunk store, PCA,
+    quantization, IVF, HNSW) are always rebuilt from the spliced rows, so the
+    chunks and metadata are identical to a full rebuild's. Embedding rows are
+    too as long as the model encodes a text the same way in any batch, and
+    the derived indexes then follow.
+
+    Files are hashed and chunked on ``workers`` processes and their chunks
+    streamed straight into a staging directory, published with the derived
+    indexes once everything is built (see ``_publish``). Embedding and BM25
+    read chunk texts back from the staged store, and embeddings are streamed
+    to disk in resumable, length-bucketed batches of ``batch_size`` (see
+    ``_write_embeddings``), so an interrupted build picks up where it
+    stopped. With an ``embedding_cache``, chunk texts embedded by any earlier
+    build with the same model are read from it instead of being encoded.
+    """
+    input_dir = Path(input_dir)
+    output_dir = Path(output_dir)
     output_dir.mkdir(parents=True, exist_ok=True)
+    settings = {
+        "chunk_size": chunk_size,
+        "embed_model_name": model_name,
+        "overlap": overlap,
+    }
+    previous = None
+    if not full:
+        previous = _reusable_manifest(Path(previous_dir or output_dir), settings)
+    old_ranges = previous[0].row_ranges() if previous else {}
 
     files = _iter_input_files(input_dir) if input_dir.exists() else []
-    chunks: list[dict] = []
-    chunk_texts: list[str] = []
+    relatives = [path.relative_to(input_dir).as_posix() for path in files]
+    jobs = [
+        (str(path), path.stem, old_ranges.get(relative, (None,))[0], chunk_size, overlap)
+        for path, relative in zip(files, relatives)
+    ]
+
+    # Metadata lines and chunk-store pools are streamed to staging files as
+    # files are chunked, so no chunk text is kept in memory. Reused files map
+    # ``(dest_start, src_start, src_stop)`` rows of the previous embeddings;
+    # new chunks record only their destination row and text length, in compact
+    # int64 arrays. BM25 tokenizes every chunk as it streams past and spills
+    # its postings to disk in sorted runs.
+    reused_rows: list[tuple[int, int, int]] = []
+    new_rows = array("q")
+    new_lengths = array("q")
+    manifest_files: list[dict] = []
     doc_ids: set[str] = set()
+    reused = 0
+
+    staging_dir = output_dir / STAGING_DIRNAME
+    # Left over from an interrupted build; only the embeddings checkpoint is resumable.
+    shutil.rmtree(staging_dir, ignore_errors=True)
+    writer = ChunkStoreWriter(staging_dir / CHUNK_STORE_DIRNAME, snippet_chars=snippet_chars)
+    bm25 = BM25Builder(staging_dir / "bm25.runs")
+    old_metadata = _MetadataReader(Path(previous_dir or output_dir) / "metadata.jsonl")
+    try:
+        with (staging_dir / "metadata.jsonl").open("w", encoding="utf-8") as metadata:
+            chunked = _chunk_files(jobs, workers)
+            for path, relative, (digest, doc_chunks) in zip(files, relatives, chunked):
+                doc_ids.add(path.stem)
+                row = len(writer)
+                if doc_chunks is None:
+                    _, start, stop = old_ranges[relative]
+                    reused_rows.append((row, start, stop))
+                    lines = old_metadata.read(start, stop)
+                    metadata.writelines(lines)
+                    for line in lines:
+                        chunk = json.loads(line)
+                        writer.add(chunk)
+                        bm25.add(chunk["text"])
+                    num_chunks = stop - start
+                    reused += 1
+                else:
+                    for chunk in doc_chunks:
+                        new_rows.append(len(writer))
+                        new_lengths.append(len(chunk["text"]))
+                        metadata.write(_metadata_line(chunk))
+                        writer.add(chunk)
+                        bm25.add(chunk["text"])
+                    num_chunks = len(doc_chunks)
+                manifest_files.append(
+                    {"path": relative, "sha256": digest, "num_chunks": num_chunks}
+                )
+    finally:
+        old_metadata.close()
+    writer.close()
+    store = ChunkStore.open(staging_dir / CHUNK_STORE_DIRNAME)
+    num_rows = len(store)
 
-    for path in files:
-        doc_id = path.stem
-        doc_ids.add(doc_id)
-        text = path.read_text(encoding="utf-8")
-        doc_chunks = chunk_text(
-            text, doc_id, chunk_size=args.chunk_size, overlap=args.overlap
+    model = None
+
+    def encode(texts: list[str]) -> np.ndarray:
+        nonlocal model
+        if model is None and embedding_cache is not None:
+            model = CachedEncoder(embedding_cache, model_name, lambda: model_factory(model_name))
+        elif model is None:
+            model = model_factory(model_name)
+        vectors = model.encode(
+            texts, batch_size=len(texts), normalize_embeddings=True, show_progress_bar=False
         )
-        chunks.extend(doc_chunks)
-        chunk_texts.extend(chunk["text"] for chunk in doc_chunks)
+        return np.asarray(vectors, dtype=np.float32)
 
-    if chunk_texts:
-        model = SentenceTransformer(args.model)
-        embeddings = model.encode(
-            chunk_texts, normalize_embeddings=True, show_progress_bar=False
+    fingerprint = content_hash(
+        json.dumps(
+            {
+                "settings": settings,
+                "batch_size": batch_size,
+                "files": manifest_files,
+                "reused_rows": reused_rows,
+            },
+            sort_keys=True,
+        ).encode("utf-8")
+    )
+    try:
+        _write_embeddings(
+            output_dir,
+            num_rows,
+            reused_rows,
+            previous[1] if previous else None,
+            np.frombuffer(new_rows, dtype=np.int64),
+            np.frombuffer(new_lengths, dtype=np.int64),
+            store.text,
+            encode,
+            batch_size,
+            fingerprint,
         )
-        embeddings = np.asarray(embeddings, dtype=np.float32)
-    else:
-        embeddings = np.empty((0, 0), dtype=np.float32)
+    finally:
+        if embedding_cache is not None:
+            embedding_cache.save()
+    previous = None
 
-    _write_metadata(output_dir / "metadata.jsonl", chunks)
-    np.save(output_dir / "embeddings.npy", embeddings)
+    # Derived indexes are built into the staging directory from the staged rows.
+    corpus_fingerprint = file_hash(staging_dir / "metadata.jsonl")
+    embeddings = np.load(output_dir / PARTIAL_EMBEDDINGS_FILE, mmap_mode="r")
+    if num_rows:
+        bm25.build().save(staging_dir / BM25_INDEX_DIRNAME, corpus_fingerprint=corpus_fingerprint)
+        search_embeddings = embeddings
+        if pca_dim:
+            search_embeddings = write_pca(staging_dir, embeddings, pca_dim)
+        write_quantized(staging_dir, search_embeddings, list(quantize))
+        if ivf_lists:
+            IVFIndex.build(search_embeddings, ivf_lists, seed=seed).save(staging_dir)
+        if hnsw_m:
+            HNSWIndex.build(
+                search_embeddings,
+                m=hnsw_m,
+                ef_construction=hnsw_ef_construction,
+                seed=seed,
+            ).save(staging_dir)
+    _publish(staging_dir, output_dir)
 
     params = {
-        "embed_model_name": args.model,
-        "chunk_size": args.chunk_size,
-        "overlap": args.overlap,
+        "embed_model_name": model_name,
+        "chunk_size": chunk_size,
+        "overlap": overlap,
         "num_docs": len(doc_ids),
-        "num_chunks": len(chunks),
+        "num_chunks": num_rows,
+        "bm25_index_version": BM25_INDEX_VERSION,
+        # SHA-256 of metadata.jsonl; the BM25 artifact must record the same value.
+        "corpus_fingerprint": corpus_fingerprint,
+        "snippet_chars": snippet_chars,
+        "quantization": sorted(quantize) if num_rows else [],
+        "pca_dim": pca_dim if num_rows else None,
+        # Width of the matrix the quantized codes and IVF/HNSW indexes were built on.
+        "search_dim": int(search_embeddings.shape[1]) if num_rows else None,
+        "ivf_lists": ivf_lists if num_rows else None,
+        "hnsw_m": hnsw_m if num_rows else None,
+        "hnsw_ef_construction": hnsw_ef_construction,
+        "seed": seed,
     }
+    BuildManifest.for_build(output_dir, settings, manifest_files).save(output_dir)
     with (output_dir / "params.json").open("w", encoding="utf-8") as handle:
         json.dump(params, handle, indent=2, sort_keys=True)
 
-    print(f"Indexed {len(doc_ids)} docs and {len(chunks)} chunks.")
+    stats = {
+        "num_docs": len(doc_ids),
+        "num_chunks": num_rows,
+        "reused_files": reused,
+        "embedded_files": len(files) - reused,
+        "removed_files": len(set(old_ranges) - {entry["path"] for entry in manifest_files}),
+        "embedded_chunks": len(new_rows),
+    }
+    if embedding_cache is not None:
+        stats["embedding_cache"] = embedding_cache.report()
+    return stats
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build offline retrieval index.")
+    parser.add_argument("--input", required=True, help="Input directory of raw files.")
+    parser.add_argument(
+        "--output", required=True, help="Output directory for index artifacts."
+    )
+    parser.add_argument(
+        "--chunk-size", type=int, default=500, help="Chunk size in characters."
+    )
+    parser.add_argument("--overlap", type=int, default=0, help="Chunk overlap.")
+    parser.add_argument(
+        "--model", default=DEFAULT_MODEL_NAME, help="SentenceTransformer model name."
+    )
+    parser.add_argument(
+        "--snippet-chars",
+        type=int,
+        default=220,
+        help="Citation snippet length to precompute (match RAG_SNIPPET_CHARS).",
+    )
+    parser.add_argument(
+        "--quantize",
+        nargs="*",
+        choices=QUANTIZATION_MODES,
+        default=[],
+        help="Also write quantized embeddings (int8 scalar and/or binary sign).",
+    )
+    parser.add_argument(
+        "--pca-dim",
+        type=int,
+        default=None,
+        help="Also store PCA-reduced embeddings of this dimension for dense search.",
+    )
+    parser.add_argument(
+        "--ivf-lists",
+        type=int,
+        default=None,
+        help="Also build an IVF index with this many k-means lists for dense search.",
+    )
+    parser.add_argument(
+        "--hnsw-m",
+        type=int,
+        default=None,
+        help="Also build an HNSW graph with this many links per node (2x on layer 0).",
+    )
+    parser.add_argument(
+        "--hnsw-ef-construction",
+        type=int,
+        default=DEFAULT_EF_CONSTRUCTION,
+        help="Beam width used while inserting nodes into the HNSW graph.",
+    )
+    parser.add_argument(
+        "--seed", type=int, default=0, help="Seed for IVF k-means and HNSW level sampling."
+    )
+    parser.add_argument(
+        "--previous",
+        default=None,
+        help="Index directory whose manifest and embeddings to reuse (default: --output).",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Processes used to read and chunk input files.",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=DEFAULT_BATCH_SIZE,
+        help="Chunks per embedding batch (batches group chunks of similar length).",
+    )
+    parser.add_argument(
+        "--embedding-cache",
+        default=None,
+        help="Directory of an embedding cache shared across builds (disabled by default).",
+    )
+    parser.add_argument(
+        "--embedding-cache-max-mb",
+        type=int,
+        default=1024,
+        help="Size cap of the embedding cache (least recently used vectors are evicted).",
+    )
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Ignore any previous build and re-embed every file.",
+    )
+    args = parser.parse_args()
+
+    output_dir = Path(args.output)
+    cache = None
+    if args.embedding_cache:
+        cache = EmbeddingCache(
+            Path(args.embedding_cache), max_bytes=args.embedding_cache_max_mb << 20
+        )
+    stats = build_index(
+        Path(args.input),
+        output_dir,
+        chunk_size=args.chunk_size,
+        overlap=args.overlap,
+        model_name=args.model,
+        snippet_chars=args.snippet_chars,
+        quantize=args.quantize,
+        pca_dim=args.pca_dim,
+        ivf_lists=args.ivf_lists,
+        hnsw_m=args.hnsw_m,
+        hnsw_ef_construction=args.hnsw_ef_construction,
+        seed=args.seed,
+        previous_dir=Path(args.previous) if args.previous else None,
+        full=args.full,
+        workers=args.workers,
+        batch_size=args.batch_size,
+        embedding_cache=cache,
+    )
+
+    print(f"Indexed {stats['num_docs']} docs and {stats['num_chunks']} chunks.")
+    print(
+        f"Reused {stats['reused_files']} unchanged files, embedded "
+        f"{stats['embedded_files']} added/changed files ({stats['embedded_chunks']} chunks), "
+        f"dropped {stats['removed_files']} removed files."
+    )
+    if cache is not None:
+        print(format_report(stats["embedding_cache"]))
     print(f"Wrote artifacts to {output_dir}")
 
 
@@ -0,0 +1,317 @@
+# src/rag/chunk_store.py
+
+"""Columnar, memory-mapped storage for chunk metadata."""
+
+from __future__ import annotations
+
+import gc
+import json
+import os
+from array import array
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+from src.rag.artifacts import save_array, temp_path, write_bytes
+
+CHUNK_STORE_VERSION = 2
+CHUNK_STORE_DIRNAME = "chunks"
+
+
+class ChunkStore:
+    """
+    Chunk fields stored as flat columns instead of one dict per chunk.
+
+    Texts, chunk ids and citation snippets live in UTF-8 string pools addressed
+    by int64 offset arrays, doc ids are interned into a small table plus an
+    int32 index column, and character spans are an (N, 2) int64 array. ``open``
+    memory-maps every column, so opening is O(1) in corpus size, the pages are
+    shared between worker processes through the OS page cache, and a row is
+    only decoded when it is accessed (e.g. when it becomes a citation).
+
+    Snippets are the whitespace-normalized text prefix for a given
+    ``snippet_chars``; they are written at build time and recomputed once at
+    load time only when the requested length differs.
+    """
+
+    def __init__(
+        self,
+        text_pool: np.ndarray,
+        text_offsets: np.ndarray,
+        chunk_id_pool: np.ndarray,
+        chunk_id_offsets: np.ndarray,
+        doc_table: Sequence[str],
+        doc_index: np.ndarray,
+        spans: np.ndarray,
+        *,
+        snippet_chars: Optional[int] = None,
+        snippet_pool: Optional[np.ndarray] = None,
+        snippet_offsets: Optional[np.ndarray] = None,
+    ) -> None:
+        self.text_pool = text_pool
+        self.text_offsets = text_offsets
+        self.chunk_id_pool = chunk_id_pool
+        self.chunk_id_offsets = chunk_id_offsets
+        self.doc_table = list(doc_table)
+        self.doc_index = doc_index
+        self.spans = spans
+        self.snippet_chars = snippet_chars
+        self.snippet_pool = snippet_pool
+        self.snippet_offsets = snippet_offsets
+
+    @classmethod
+    def from_chunks(
+        cls, chunks: Sequence[Dict], *, snippet_chars: Optional[int] = None
+    ) -> ChunkStore:
+        doc_table: List[str] = []
+        doc_lookup: Dict[str, int] = {}
+        doc_index = np.zeros(len(chunks), dtype=np.int32)
+        spans = np.zeros((len(chunks), 2), dtype=np.int64)
+        for idx, chunk in enumerate(chunks):
+            doc_id = chunk["doc_id"]
+            if doc_id not in doc_lookup:
+                doc_lookup[doc_id] = len(doc_table)
+                doc_table.append(doc_id)
+            doc_index[idx] = doc_lookup[doc_id]
+            spans[idx] = (chunk["start_offset"], chunk["end_offset"])
+
+        texts = [chunk["text"] for chunk in chunks]
+        text_pool, text_offsets = _build_pool(texts)
+        chunk_id_pool, chunk_id_offsets = _build_pool(
+            [chunk["chunk_id"] for chunk in chunks]
+        )
+        store = cls(
+            text_pool,
+            text_offsets,
+            chunk_id_pool,
+            chunk_id_offsets,
+            doc_table,
+            doc_index,
+            spans,
+        )
+        if snippet_chars is not None:
+            store._set_snippets(texts, snippet_chars)
+        return store
+
+    @staticmethod
+    def write(
+        path: Path, chunks: Iterable[Dict], *, snippet_chars: Optional[int] = None
+    ) -> None:
+        writer = ChunkStoreWriter(path, snippet_chars=snippet_chars)
+        for chunk in chunks:
+            writer.add(chunk)
+        writer.close()
+
+    def save(self, path: Path) -> None:
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        _write_pool(path, "text", self.text_pool, self.text_offsets)
+        _write_pool(path, "chunk_id", self.chunk_id_pool, self.chunk_id_offsets)
+        if self.snippet_chars is not None:
+            _write_pool(path, "snippet", self.snippet_pool, self.snippet_offsets)
+        save_array(path / "doc_index.npy", self.doc_index)
+        save_array(path / "spans.npy", self.spans)
+        with (path / "doc_table.json").open("w", encoding="utf-8") as handle:
+            json.dump(self.doc_table, handle, ensure_ascii=True)
+        meta = {
+            "version": CHUNK_STORE_VERSION,
+            "num_chunks": len(self),
+            "snippet_chars": self.snippet_chars,
+        }
+        with (path / "meta.json").open("w", encoding="utf-8") as handle:
+            json.dump(meta, handle, indent=2, sort_keys=True)
+
+    @classmethod
+    def open(cls, path: Path) -> ChunkStore:
+        path = Path(path)
+        with (path / "meta.json").open("r", encoding="utf-8") as handle:
+            meta = json.load(handle)
+        with (path / "doc_table.json").open("r", encoding="utf-8") as handle:
+            doc_table = json.load(handle)
+        text_pool, text_offsets = _open_pool(path, "text")
+        chunk_id_pool, chunk_id_offsets = _open_pool(path, "chunk_id")
+        snippet_chars = meta.get("snippet_chars")
+        snippet_pool = snippet_offsets = None
+        if snippet_chars is not None:
+            snippet_pool, snippet_offsets = _open_pool(path, "snippet")
+        return cls(
+            text_pool,
+            text_offsets,
+            chunk_id_pool,
+            chunk_id_offsets,
+            doc_table,
+            np.load(path / "doc_index.npy", mmap_mode="r"),
+            np.load(path / "spans.npy", mmap_mode="r"),
+            snippet_chars=snippet_chars,
+            snippet_pool=snippet_pool,
+            snippet_offsets=snippet_offsets,
+        )
+
+    def with_snippets(self, snippet_chars: int) -> ChunkStore:
+        """Ensure snippets exist for ``snippet_chars``, computing them once if needed."""
+        if self.snippet_chars != snippet_chars:
+            self._set_snippets(
+                [self.text(idx) for idx in range(len(self))], snippet_chars
+            )
+        return self
+
+    def __len__(self) -> int:
+        return int(self.doc_index.shape[0])
+
+    def __getitem__(self, idx: int) -> Dict:
+        start, end = self.spans[idx]
+        return {
+            "doc_id": self.doc_id(idx),
+            "chunk_id": self.chunk_id(idx),
+            "text": self.text(idx),
+            "start_offset": int(start),
+            "end_offset": int(end),
+        }
+
+    def __iter__(self) -> Iterator[Dict]:
+        for idx in range(len(self)):
+            yield self[idx]
+
+    def text(self, idx: int) -> str:
+        return _decode(self.text_pool, self.text_offsets, idx)
+
+    def chunk_id(self, idx: int) -> str:
+        return _decode(self.chunk_id_pool, self.chunk_id_offsets, idx)
+
+    def doc_id(self, idx: int) -> str:
+        return self.doc_table[int(self.doc_index[idx])]
+
+    def snippet(self, idx: int) -> str:
+        if self.snippet_chars is None:
+            raise ValueError("snippets were not computed for this store")
+        return _decode(self.snippet_pool, self.snippet_offsets, idx)
+
+    def _set_snippets(self, texts: Sequence[str], snippet_chars: int) -> None:
+        snippets = [" ".join(text.split())[:snippet_chars] for text in texts]
+        self.snippet_pool, self.snippet_offsets = _build_pool(snippets)
+        self.snippet_chars = snippet_chars
+
+
+class ChunkStoreWriter:
+    """
+    Streams chunks into a chunk store directory without holding their text.
+
+    String pools are appended to temp files as chunks arrive; only the offset,
+    doc index and span columns (a few integers per chunk) stay in memory.
+    ``close`` writes those columns and renames every file into place, giving
+    the same files as ``ChunkStore.save``.
+    """
+
+    _POOLS = ("text", "chunk_id", "snippet")
+
+    def __init__(self, path: Path, *, snippet_chars: Optional[int] = None) -> None:
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.snippet_chars = snippet_chars
+        pools = self._POOLS if snippet_chars is not None else self._POOLS[:2]
+        self._pools = {
+            name: temp_path(self.path / f"{name}_pool.bin").open("wb") for name in pools
+        }
+        self._offsets = {name: array("q", [0]) for name in pools}
+        self._doc_table: List[str] = []
+        self._doc_lookup: Dict[str, int] = {}
+        self._doc_index = array("i")
+        self._spans = array("q")
+
+    def __len__(self) -> int:
+        return len(self._doc_index)
+
+    def add(self, chunk: Dict) -> None:
+        doc_id = chunk["doc_id"]
+        if doc_id not in self._doc_lookup:
+            self._doc_lookup[doc_id] = len(self._doc_table)
+            self._doc_table.append(doc_id)
+        self._doc_index.append(self._doc_lookup[doc_id])
+        self._spans.extend((chunk["start_offset"], chunk["end_offset"]))
+        values = {"text": chunk["text"], "chunk_id": chunk["chunk_id"]}
+        if self.snippet_chars is not None:
+            values["snippet"] = " ".join(chunk["text"].split())[: self.snippet_chars]
+        for name, value in values.items():
+            encoded = value.encode("utf-8")
+            self._pools[name].write(encoded)
+            self._offsets[name].append(self._offsets[name][-1] + len(encoded))
+
+    def close(self) -> None:
+        for name, handle in self._pools.items():
+            handle.close()
+            pool_path = self.path / f"{name}_pool.bin"
+            os.replace(temp_path(pool_path), pool_path)
+            offsets = np.asarray(self._offsets[name], dtype=np.int64)
+            save_array(self.path / f"{name}_offsets.npy", offsets)
+        save_array(self.path / "doc_index.npy", np.asarray(self._doc_index, dtype=np.int32))
+        save_array(
+            self.path / "spans.npy", np.asarray(self._spans, dtype=np.int64).reshape(-1, 2)
+        )
+        with (self.path / "doc_table.json").open("w", encoding="utf-8") as handle:
+            json.dump(self._doc_table, handle, ensure_ascii=True)
+        meta = {
+            "version": CHUNK_STORE_VERSION,
+            "num_chunks": len(self),
+            "snippet_chars": self.snippet_chars,
+        }
+        with (self.path / "meta.json").open("w", encoding="utf-8") as handle:
+            json.dump(meta, handle, indent=2, sort_keys=True)
+
+
+def load_chunk_store(
+    index_dir: Path, *, snippet_chars: Optional[int] = None
+) -> Optional[ChunkStore]:
+    """Open the columnar chunk store of an index, or None if missing/unsupported."""
+    path = Path(index_dir) / CHUNK_STORE_DIRNAME
+    meta_path = path / "meta.json"
+    if not meta_path.exists():
+        return None
+    with meta_path.open("r", encoding="utf-8") as handle:
+        meta = json.load(handle)
+    if meta.get("version") != CHUNK_STORE_VERSION:
+        return None
+    store = ChunkStore.open(path)
+    if len(store) != meta.get("num_chunks"):
+        return None
+    if snippet_chars is not None:
+        store.with_snippets(snippet_chars)
+    return store
+
+
+def freeze_heap() -> None:
+    """
+    Move everything allocated so far into the GC's permanent generation.
+
+    Called once the long-lived index structures are loaded so cyclic GC passes
+    stop re-scanning them on every collection.
+    """
+    gc.collect()
+    gc.freeze()
+
+
+def _build_pool(values: Sequence[str]) -> tuple[np.ndarray, np.ndarray]:
+    encoded = [value.encode("utf-8") for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(item) for item in encoded], out=offsets[1:])
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+
+def _write_pool(path: Path, name: str, pool: np.ndarray, offsets: np.ndarray) -> None:
+    write_bytes(path / f"{name}_pool.bin", pool.tobytes())
+    save_array(path / f"{name}_offsets.npy", offsets)
+
+
+def _open_pool(path: Path, name: str) -> tuple[np.ndarray, np.ndarray]:
+    pool_path = path / f"{name}_pool.bin"
+    offsets = np.load(path / f"{name}_offsets.npy", mmap_mode="r")
+    # np.memmap cannot map an empty file.
+    if pool_path.stat().st_size:
+        pool = np.memmap(pool_path, dtype=np.uint8, mode="r")
+    else:
+        pool = np.empty(0, dtype=np.uint8)
+    return pool, offsets
+
+
+def _decode(pool: np.ndarray, offsets: np.ndarray, idx: int) -> str:
+    return pool[offsets[idx] : offsets[idx + 1]].tobytes().decode("utf-8")
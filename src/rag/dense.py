@@ -5,6 +5,8 @@ from typing import List, Dict
 import numpy as np
 from sentence_transformers import SentenceTransformer
 
+from src.rag import ranking
+
 
 class DenseRetriever:
     def __init__(
@@ -84,12 +86,10 @@ class DenseRetriever:
         )
 
         scores = np.dot(query_emb, self.embeddings.T)[0]
-        scored = list(zip(self.chunks, scores))
-        scored.sort(key=lambda x: x[1], reverse=True)
 
         results = []
-        for chunk, score in scored[:top_k]:
-            result = dict(chunk)
+        for idx, score in ranking.top_k(scores, top_k):
+            result = dict(self.chunks[idx])
             result["score"] = float(score)
             results.append(result)
 
@@ -0,0 +1,98 @@
+# src/rag/dense_search.py
+
+"""Exact dense search over row tiles on a bounded thread pool."""
+
+from __future__ import annotations
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import numpy as np
+
+from src.rag.ranking import top_k, top_k_indices
+
+DEFAULT_TILE_ROWS = 65536
+DEFAULT_MAX_WORKERS = min(4, os.cpu_count() or 1)
+# BLAS rounds a row's dot product according to its position within the kernel's
+# row blocking. Tiles start on multiples of this so every row keeps the position
+# (and therefore the bit-exact score) it has in the full-matrix product.
+_ROW_ALIGN = 256
+
+
+class ExactDenseSearcher:
+    """
+    Brute-force dot-product search, equivalent to ranking
+    ``np.dot(query, embeddings.T)`` by (-score, index).
+
+    The matrix is scored ``tile_rows`` rows (rounded up to a multiple of 256) at
+    a time; NumPy releases the GIL, so tiles run in parallel on the pool. Each
+    tile keeps only its own top-k and the per-tile winners are merged. Peak
+    extra memory is one score vector per in-flight tile instead of one for the
+    whole corpus, and no per-row Python objects are created.
+    """
+
+    def __init__(
+        self,
+        embeddings: np.ndarray,
+        *,
+        tile_rows: int = DEFAULT_TILE_ROWS,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+    ) -> None:
+        if tile_rows <= 0:
+            raise ValueError("tile_rows must be > 0")
+        self.embeddings = embeddings
+        self.tile_rows = -(-tile_rows // _ROW_ALIGN) * _ROW_ALIGN
+        self.max_workers = max(1, max_workers)
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def search(self, query: np.ndarray, k: int) -> list[tuple[int, float]]:
+        return self.search_batch(np.asarray(query).reshape(1, -1), k)[0]
+
+    def search_batch(self, queries: np.ndarray, k: int) -> list[list[tuple[int, float]]]:
+        """
+        ``search`` for a (queries x dim) matrix; each tile is scored for the
+        whole batch with one matrix product. BLAS may round a batched score
+        differently in the last bit than a single-query product.
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        n = self.embeddings.shape[0]
+        if n == 0 or k <= 0 or len(queries) == 0:
+            return [[] for _ in range(len(queries))]
+        starts = range(0, n, self.tile_rows)
+        if len(starts) == 1 or self.max_workers == 1:
+            parts = [self._score_tile(queries, start, k) for start in starts]
+        else:
+            parts = list(
+                self._pool().map(lambda start: self._score_tile(queries, start, k), starts)
+            )
+        results = []
+        for row in range(len(queries)):
+            # Tile winners come back in ascending row order, so ranking by
+            # position breaks ties by row index.
+            ids = np.concatenate([part[row][0] for part in parts])
+            scores = np.concatenate([part[row][1] for part in parts])
+            results.append([(int(ids[pos]), score) for pos, score in top_k(scores, k)])
+        return results
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def _pool(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="dense-scan"
+            )
+        return self._executor
+
+    def _score_tile(
+        self, queries: np.ndarray, start: int, k: int
+    ) -> list[tuple[np.ndarray, np.ndarray]]:
+        scores = np.dot(queries, self.embeddings[start : start + self.tile_rows].T)
+        parts = []
+        for row in scores:
+            ids = np.sort(top_k_indices(row, k))
+            parts.append((ids + start, row[ids]))
+        return parts
@@ -0,0 +1,277 @@
+# src/rag/embedding_cache.py
+
+"""Content-addressed on-disk cache of chunk and query embeddings."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Optional, Sequence
+
+import numpy as np
+
+CACHE_INDEX_FILE = "index.json"
+CACHE_INDEX_VERSION = 2
+DEFAULT_MAX_BYTES = 1 << 30
+# Unreferenced shards younger than this may belong to another process's unsaved index.
+ORPHAN_GRACE_SECONDS = 3600.0
+
+
+def embedding_key(model_name: str, text: str, normalize: bool = True) -> str:
+    payload = f"{model_name}\0{int(normalize)}\0{text}".encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Float32 vectors keyed by ``embedding_key`` (model name + text hash).
+
+    Each ``put`` appends one packed ``shard-<uuid>.npy``; ``index.json`` maps
+    keys to ``(shard, row, last_used)`` and keeps running hit/miss/encode-time
+    stats. When stored vectors exceed ``max_bytes`` the least recently used
+    entries are dropped, and shards that are mostly dead are rewritten under a
+    new name. The index is only persisted by ``save``, and shard files are
+    never modified or deleted before then: superseded shards are removed only
+    after the new ``index.json`` is in place, so the index on disk always
+    points at the rows it was written for.
+
+    Several processes may share one directory: shard names are unique, and
+    on open only unreferenced shards older than both ``index.json`` and
+    ``orphan_grace_seconds`` (e.g. from a crashed run) are deleted, so another
+    process's unsaved shards survive. The last ``save`` wins, and rows whose
+    shard has since disappeared or is unreadable count as misses.
+    """
+
+    def __init__(
+        self,
+        root: Path,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        orphan_grace_seconds: float = ORPHAN_GRACE_SECONDS,
+    ) -> None:
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.orphan_grace_seconds = orphan_grace_seconds
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.entries: dict[str, list] = {}
+        self.shards: dict[str, int] = {}
+        self.stats = {"hits": 0, "misses": 0, "encoded": 0, "encode_seconds": 0.0}
+        self._tick = 0
+        self._superseded: list[str] = []
+        self._load()
+
+    def _load(self) -> None:
+        index_path = self.root / CACHE_INDEX_FILE
+        try:
+            payload = json.loads(index_path.read_text(encoding="utf-8"))
+            saved_at = index_path.stat().st_mtime
+        except (OSError, ValueError):
+            payload, saved_at = {}, None
+        if payload.get("version") == CACHE_INDEX_VERSION:
+            self.entries = payload["entries"]
+            self.shards = payload["shards"]
+            self.stats.update(payload["stats"])
+            self._tick = payload["tick"]
+        self._baseline = dict(self.stats)
+        self._bytes = sum(entry[3] for entry in self.entries.values())
+        if saved_at is None:
+            return
+        cutoff = min(saved_at, time.time() - self.orphan_grace_seconds)
+        for path in self.root.glob("shard-*.npy"):
+            if path.name in self.shards:
+                continue
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+            except FileNotFoundError:
+                pass
+
+    def save(self) -> None:
+        payload = {
+            "version": CACHE_INDEX_VERSION,
+            "tick": self._tick,
+            "stats": self.stats,
+            "shards": self.shards,
+            "entries": self.entries,
+        }
+        tmp_path = self.root / (CACHE_INDEX_FILE + ".tmp")
+        tmp_path.write_text(json.dumps(payload), encoding="utf-8")
+        os.replace(tmp_path, self.root / CACHE_INDEX_FILE)
+        for shard in self._superseded:
+            (self.root / shard).unlink(missing_ok=True)
+        self._superseded = []
+
+    @property
+    def nbytes(self) -> int:
+        return self._bytes
+
+    def get(self, keys: Sequence[str]) -> list[Optional[np.ndarray]]:
+        """Return the cached vector for each key (None on a miss)."""
+        self._tick += 1
+        found: list[Optional[np.ndarray]] = [None] * len(keys)
+        by_shard: dict[str, list[tuple[int, int]]] = {}
+        for position, key in enumerate(keys):
+            entry = self.entries.get(key)
+            if entry is None:
+                continue
+            entry[2] = self._tick
+            by_shard.setdefault(entry[0], []).append((position, entry[1]))
+        hits = 0
+        for shard, pairs in by_shard.items():
+            rows = self._read_rows(shard, [row for _, row in pairs])
+            if rows is None:
+                continue
+            for (position, _), vector in zip(pairs, rows):
+                found[position] = vector
+            hits += len(pairs)
+        self.stats["hits"] += hits
+        self.stats["misses"] += len(keys) - hits
+        return found
+
+    def put(self, keys: Sequence[str], vectors: np.ndarray) -> None:
+        """Store ``vectors`` (one row per key) as a new shard, then enforce the size cap."""
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        fresh = {}
+        for row, key in enumerate(keys):
+            if key not in self.entries:
+                fresh.setdefault(key, row)
+        if not fresh:
+            return
+        self._tick += 1
+        shard = self._write_shard(vectors[list(fresh.values())])
+        row_bytes = int(vectors.shape[1]) * vectors.itemsize
+        for row, key in enumerate(fresh):
+            self.entries[key] = [shard, row, self._tick, row_bytes]
+        self._bytes += row_bytes * len(fresh)
+        self._evict()
+
+    def _write_shard(self, vectors: np.ndarray) -> str:
+        shard = f"shard-{uuid.uuid4().hex}.npy"
+        np.save(self.root / shard, vectors)
+        self.shards[shard] = len(vectors)
+        return shard
+
+    def _read_rows(self, shard: str, rows: list[int]) -> Optional[np.ndarray]:
+        """
+        Read ``rows`` of ``shard``, or forget the shard and return None if it
+        is missing or corrupt (e.g. deleted by another process sharing the
+        directory), so its entries become misses.
+        """
+        try:
+            array = np.load(self.root / shard, mmap_mode="r")
+            if array.ndim != 2 or array.shape[0] < self.shards.get(shard, 0):
+                raise ValueError(f"{shard} is truncated")
+            return np.asarray(array[rows], dtype=np.float32)
+        except (OSError, ValueError, IndexError):
+            self._drop_shard(shard)
+            return None
+
+    def _drop_shard(self, shard: str) -> None:
+        for key in [key for key, entry in self.entries.items() if entry[0] == shard]:
+            self._bytes -= self.entries.pop(key)[3]
+        self.shards.pop(shard, None)
+
+    def record_encode(self, count: int, seconds: float) -> None:
+        self.stats["encoded"] += count
+        self.stats["encode_seconds"] += seconds
+
+    def report(self, cumulative: bool = False) -> dict:
+        """
+        Hit rate and encode time saved since this cache was opened (or over its
+        whole lifetime with ``cumulative``). Time saved is estimated from the
+        measured per-text cost of all encodes so far.
+        """
+        stats = self.stats
+        if not cumulative:
+            stats = {name: value - self._baseline[name] for name, value in stats.items()}
+        hits, misses = stats["hits"], stats["misses"]
+        encoded = self.stats["encoded"]
+        per_text = self.stats["encode_seconds"] / encoded if encoded else 0.0
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+            "time_saved_seconds": hits * per_text,
+            "entries": len(self.entries),
+            "bytes": self.nbytes,
+        }
+
+    def _evict(self) -> None:
+        if self._bytes <= self.max_bytes:
+            return
+        for key in sorted(self.entries, key=lambda key: self.entries[key][2]):
+            if self._bytes <= self.max_bytes:
+                break
+            self._bytes -= self.entries.pop(key)[3]
+        live: dict[str, list[str]] = {shard: [] for shard in self.shards}
+        for key, entry in self.entries.items():
+            live[entry[0]].append(key)
+        for shard, keys in live.items():
+            if len(keys) * 2 > self.shards[shard]:
+                continue
+            if keys:
+                # Mostly dead: copy the live rows into a new compact shard.
+                rows = self._read_rows(shard, [self.entries[key][1] for key in keys])
+                if rows is None:
+                    continue
+                compact = self._write_shard(rows)
+                for row, key in enumerate(keys):
+                    self.entries[key][0] = compact
+                    self.entries[key][1] = row
+            del self.shards[shard]
+            self._superseded.append(shard)
+
+
+class CachedEncoder:
+    """
+    Wraps a SentenceTransformer-like ``encode`` with an ``EmbeddingCache``.
+
+    Only misses reach the model, which ``load_model`` creates on the first
+    miss, so a fully cached run never loads it.
+    """
+
+    def __init__(
+        self, cache: EmbeddingCache, model_name: str, load_model: Callable[[], Any]
+    ) -> None:
+        self.cache = cache
+        self.model_name = model_name
+        self._load_model = load_model
+        self._model = None
+
+    def encode(self, texts: Sequence[str], normalize_embeddings: bool = False, **kwargs) -> np.ndarray:
+        texts = list(texts)
+        keys = [embedding_key(self.model_name, text, normalize_embeddings) for text in texts]
+        found = self.cache.get(keys)
+        missing = [index for index, vector in enumerate(found) if vector is None]
+        if missing:
+            if self._model is None:
+                self._model = self._load_model()
+            if "batch_size" in kwargs:
+                kwargs["batch_size"] = len(missing)
+            started = time.perf_counter()
+            vectors = np.asarray(
+                self._model.encode(
+                    [texts[index] for index in missing],
+                    normalize_embeddings=normalize_embeddings,
+                    **kwargs,
+                ),
+                dtype=np.float32,
+            )
+            self.cache.record_encode(len(missing), time.perf_counter() - started)
+            self.cache.put([keys[index] for index in missing], vectors)
+            for index, vector in zip(missing, vectors):
+                found[index] = vector
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        return np.stack(found).astype(np.float32, copy=False)
+
+
+def format_report(report: dict) -> str:
+    return (
+        f"Embedding cache: {report['hits']} hits, {report['misses']} misses "
+        f"(hit rate {report['hit_rate']:.1%}), ~{report['time_saved_seconds']:.1f}s of encoding "
+        f"saved; {report['entries']} entries, {report['bytes'] / 2**20:.1f} MiB"
+    )
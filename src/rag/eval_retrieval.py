@@ -1,16 +1,29 @@
-"""Evaluate BM25 and dense retrieval on a small synthetic set."""
+"""Evaluate BM25, dense and hybrid retrieval on a small synthetic set."""
 
 from __future__ import annotations
 
 import argparse
 import json
 import math
+import time
 from pathlib import Path
 
 import numpy as np
-from rank_bm25 import BM25Okapi
 from sentence_transformers import SentenceTransformer
 
+from src.rag.bm25_index import BM25Index, load_bm25_index
+from src.rag.embedding_cache import CachedEncoder, EmbeddingCache, format_report
+from src.rag.fusion import DEFAULT_RRF_K, reciprocal_rank_fusion
+from src.rag.pca import PCAProjection
+from src.rag.quantization import (
+    QUANTIZATION_MODES,
+    QuantizedSearcher,
+    quantize_binary,
+    quantize_int8,
+    recall_vs_exact,
+)
+from src.rag.ranking import top_k, top_k_indices
+
 DEFAULT_MODEL_NAME = "all-MiniLM-L6-v2"
 EVAL_SET = [
     {"query": "get my money back", "expected_doc_id": "refund_policy"},
@@ -77,6 +90,44 @@ def _evaluate(
 def main() -> None:
     parser = argparse.ArgumentParser(description="Evaluate retrieval on a small set.")
     parser.add_argument("--index", required=True, help="Index directory path.")
+    parser.add_argument(
+        "--quantization-report",
+        action="store_true",
+        help="Report recall of int8/binary quantized search vs exact float32.",
+    )
+    parser.add_argument(
+        "--rescore-candidates",
+        type=int,
+        default=100,
+        help="Candidates rescored in float32 for the quantization report.",
+    )
+    parser.add_argument(
+        "--pca-dims",
+        nargs="*",
+        type=int,
+        default=[],
+        help="Report dense quality/latency after PCA reduction to these dimensions.",
+    )
+    parser.add_argument(
+        "--hybrid-candidates",
+        type=int,
+        default=50,
+        help="Per-leg candidate depth fused by reciprocal rank for hybrid.",
+    )
+    parser.add_argument(
+        "--rrf-k", type=int, default=DEFAULT_RRF_K, help="Reciprocal rank fusion constant."
+    )
+    parser.add_argument(
+        "--embedding-cache",
+        default=None,
+        help="Directory of an embedding cache to reuse query vectors from.",
+    )
+    parser.add_argument(
+        "--embedding-cache-max-mb",
+        type=int,
+        default=1024,
+        help="Size cap of the embedding cache (least recently used vectors are evicted).",
+    )
     args = parser.parse_args()
 
     index_dir = Path(args.index)
@@ -105,16 +156,23 @@ def main() -> None:
 
     print(f"Loaded {len(texts)} chunks from {index_dir}")
 
-    bm25 = BM25Okapi([text.lower().split() for text in texts]) if texts else None
+    bm25 = load_bm25_index(index_dir, len(texts))
+    if bm25 is None and texts:
+        bm25 = BM25Index.from_texts(texts)
 
     def bm25_retrieve(query: str, k: int) -> list[int]:
         if not bm25 or not query.strip():
             return []
-        scores = bm25.get_scores(query.lower().split())
-        order = np.argsort(scores)[::-1]
-        return order[:k].tolist()
+        scores = bm25.get_scores(bm25.analyzer.tokenize(query))
+        return top_k_indices(scores, k).tolist()
 
-    if embeddings.size:
+    cache = None
+    if embeddings.size and args.embedding_cache:
+        cache = EmbeddingCache(
+            Path(args.embedding_cache), max_bytes=args.embedding_cache_max_mb << 20
+        )
+        model = CachedEncoder(cache, model_name, lambda: SentenceTransformer(model_name))
+    elif embeddings.size:
         model = SentenceTransformer(model_name)
     else:
         model = None
@@ -124,11 +182,27 @@ def main() -> None:
             return []
         query_emb = model.encode([query], normalize_embeddings=True, show_progress_bar=False)
         scores = np.dot(query_emb, embeddings.T)[0]
-        order = np.argsort(scores)[::-1]
-        return order[:k].tolist()
+        return top_k_indices(scores, k).tolist()
+
+    def hybrid_retrieve(query: str, k: int) -> list[int]:
+        if not query.strip():
+            return []
+        depth = max(k, args.hybrid_candidates)
+        legs = []
+        if bm25:
+            scores = bm25.get_scores(bm25.analyzer.tokenize(query))
+            legs.append([pair for pair in top_k(scores, depth) if pair[1] > 0])
+        if model is not None:
+            query_emb = model.encode(
+                [query], normalize_embeddings=True, show_progress_bar=False
+            )
+            legs.append(top_k(np.dot(query_emb, embeddings.T)[0], depth))
+        fused = reciprocal_rank_fusion(legs, k, rrf_k=args.rrf_k)
+        return [idx for idx, _ in fused]
 
     bm25_metrics = _evaluate(EVAL_SET, bm25_retrieve, doc_ids, k=10)
     dense_metrics = _evaluate(EVAL_SET, dense_retrieve, doc_ids, k=10)
+    hybrid_metrics = _evaluate(EVAL_SET, hybrid_retrieve, doc_ids, k=10)
 
     print(
         "BM25 Recall@10={:.3f} MRR@10={:.3f} nDCG@10={:.3f}".format(
@@ -140,6 +214,98 @@ def main() -> None:
             *dense_metrics
         )
     )
+    print(
+        "Hybrid Recall@10={:.3f} MRR@10={:.3f} nDCG@10={:.3f}".format(
+            *hybrid_metrics
+        )
+    )
+
+    if args.pca_dims and model is not None:
+        _print_pca_report(embeddings, model, args.pca_dims, doc_ids, k=10)
+
+    if args.quantization_report and model is not None:
+        _print_quantization_report(
+            embeddings, model, k=10, rescore_candidates=args.rescore_candidates
+        )
+
+    if cache is not None:
+        cache.save()
+        print(format_report(cache.report()))
+
+
+def _print_pca_report(
+    embeddings: np.ndarray, model, dims: list[int], doc_ids: list[str], *, k: int
+) -> None:
+    queries = [example["query"] for example in EVAL_SET]
+    query_embs = model.encode(queries, normalize_embeddings=True, show_progress_bar=False)
+    full = np.asarray(embeddings, dtype=np.float32)
+    exact = {
+        query: top_k_indices(full @ emb, k).tolist()
+        for query, emb in zip(queries, query_embs)
+    }
+    repeats = 20
+
+    for dim in [full.shape[1], *dims]:
+        if dim == full.shape[1]:
+            matrix, projected = full, query_embs
+        else:
+            projection = PCAProjection.fit(full, dim)
+            matrix, projected = projection.project(full), projection.project(query_embs)
+        vectors = dict(zip(queries, projected))
+
+        def pca_retrieve(query: str, k: int) -> list[int]:
+            return top_k_indices(matrix @ vectors[query], k).tolist()
+
+        recall, mrr, ndcg = _evaluate(EVAL_SET, pca_retrieve, doc_ids, k=k)
+        overlap = np.mean(
+            [
+                len(set(pca_retrieve(query, k)) & set(exact[query])) / len(exact[query])
+                for query in queries
+            ]
+        )
+        start = time.perf_counter()
+        for _ in range(repeats):
+            for query in queries:
+                pca_retrieve(query, k)
+        latency_ms = (time.perf_counter() - start) * 1000 / (repeats * len(queries))
+        print(
+            f"PCA dim={dim} Recall@{k}={recall:.3f} MRR@{k}={mrr:.3f} "
+            f"nDCG@{k}={ndcg:.3f} Overlap@{k}={overlap:.3f} "
+            f"score_latency_ms={latency_ms:.4f}"
+        )
+
+
+def _print_quantization_report(
+    embeddings: np.ndarray, model, *, k: int, rescore_candidates: int
+) -> None:
+    # Eval queries plus a fixed sample of stored chunk vectors as extra probes.
+    query_embs = model.encode(
+        [example["query"] for example in EVAL_SET],
+        normalize_embeddings=True,
+        show_progress_bar=False,
+    )
+    rng = np.random.default_rng(0)
+    sample = rng.choice(len(embeddings), size=min(256, len(embeddings)), replace=False)
+    queries = np.vstack([query_embs, embeddings[np.sort(sample)]]).astype(np.float32)
+
+    int8_codes, int8_scales = quantize_int8(embeddings)
+    arrays = {
+        "int8": {"int8_codes": int8_codes, "int8_scales": int8_scales},
+        "binary": {"binary_codes": quantize_binary(embeddings)},
+    }
+    for mode in QUANTIZATION_MODES:
+        searcher = QuantizedSearcher(
+            mode,
+            np.asarray(embeddings, dtype=np.float32),
+            rescore_candidates=rescore_candidates,
+            **arrays[mode],
+        )
+        first, rescored = recall_vs_exact(searcher, queries, k)
+        print(
+            "Quantized {} first-pass Recall@{k}={:.3f} rescored({}) Recall@{k}={:.3f}".format(
+                mode, first, rescore_candidates, rescored, k=k
+            )
+        )
 
 
 if __name__ == "__main__":
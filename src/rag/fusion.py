@@ -0,0 +1,38 @@
+# src/rag/fusion.py
+
+"""Rank fusion of several retrievers' rankings."""
+
+from __future__ import annotations
+
+from typing import Sequence
+
+import numpy as np
+
+from src.rag.ranking import top_k
+
+DEFAULT_RRF_K = 60
+
+
+def reciprocal_rank_fusion(
+    rankings: Sequence[Sequence[tuple[int, float]]],
+    k: int,
+    *,
+    rrf_k: int = DEFAULT_RRF_K,
+) -> list[tuple[int, float]]:
+    """
+    Fuse ranked (index, score) lists by reciprocal rank.
+
+    A document scores ``sum(1 / (rrf_k + rank))`` over the lists it appears in
+    (ranks start at 1); the raw retriever scores are ignored, so BM25 and cosine
+    scales never need calibrating. Returns the ``k`` best fused (index, score)
+    pairs ordered by (-score, index).
+    """
+    ids = [idx for ranked in rankings for idx, _ in ranked]
+    if not ids or k <= 0:
+        return []
+    contributions = [
+        1.0 / (rrf_k + rank) for ranked in rankings for rank in range(1, len(ranked) + 1)
+    ]
+    docs, inverse = np.unique(np.asarray(ids, dtype=np.int64), return_inverse=True)
+    scores = np.bincount(inverse, weights=contributions, minlength=len(docs))
+    return [(int(docs[pos]), score) for pos, score in top_k(scores, k)]
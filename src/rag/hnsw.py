@@ -0,0 +1,254 @@
+# src/rag/hnsw.py
+
+"""Hierarchical navigable small-world (HNSW) graph for low-latency dense search."""
+
+from __future__ import annotations
+
+import heapq
+import json
+import math
+from pathlib import Path
+from typing import Callable, Optional, Sequence
+
+import numpy as np
+
+from src.rag.artifacts import save_array
+
+HNSW_LEVELS_FILE = "hnsw_levels.npy"
+HNSW_GRAPH0_FILE = "hnsw_graph0.npy"
+HNSW_UPPER_FILE = "hnsw_upper.npy"
+HNSW_UPPER_OFFSETS_FILE = "hnsw_upper_offsets.npy"
+_FILES = (HNSW_LEVELS_FILE, HNSW_GRAPH0_FILE, HNSW_UPPER_FILE, HNSW_UPPER_OFFSETS_FILE)
+
+DEFAULT_M = 16
+DEFAULT_EF_CONSTRUCTION = 100
+DEFAULT_EF_SEARCH = 64
+
+
+class HNSWIndex:
+    """
+    HNSW graph over dot-product similarity, stored as flat neighbour arrays.
+
+    ``levels[i]`` is the top layer of node ``i``. Layer-0 links are the rows of
+    ``graph0`` (N, 2M); links of node ``i`` on layer ``l >= 1`` are
+    ``upper[upper_offsets[i] + (l - 1) * M:][:M]``. Unused slots hold -1. The
+    entry point is the first node with the highest level, so nothing else
+    needs to be persisted and every array can be memory-mapped.
+
+    Nodes are inserted in row order with levels drawn from a seeded RNG and all
+    ties broken by row index, so a build is reproducible for a given seed.
+    """
+
+    def __init__(
+        self,
+        levels: np.ndarray,
+        graph0: np.ndarray,
+        upper: np.ndarray,
+        upper_offsets: np.ndarray,
+        embeddings: np.ndarray,
+        *,
+        ef_search: int = DEFAULT_EF_SEARCH,
+    ) -> None:
+        self.levels = levels
+        self.graph0 = graph0
+        self.upper = upper
+        self.upper_offsets = upper_offsets
+        self.embeddings = embeddings
+        self.ef_search = ef_search
+        self.m = int(graph0.shape[1]) // 2
+        self.entry_point = int(np.argmax(levels)) if len(levels) else -1
+        self.max_level = int(levels[self.entry_point]) if len(levels) else -1
+
+    @classmethod
+    def build(
+        cls,
+        embeddings: np.ndarray,
+        *,
+        m: int = DEFAULT_M,
+        ef_construction: int = DEFAULT_EF_CONSTRUCTION,
+        seed: int = 0,
+        ef_search: int = DEFAULT_EF_SEARCH,
+    ) -> HNSWIndex:
+        if m < 2:
+            raise ValueError("m must be >= 2")
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        n = vectors.shape[0]
+        rng = np.random.default_rng(seed)
+        levels = np.floor(-np.log(1.0 - rng.random(n)) / math.log(m)).astype(np.int8)
+        # links[i][l] is the neighbour list of node i on layer l.
+        links: list[list[list[int]]] = [[[] for _ in range(level + 1)] for level in levels]
+        entry, max_level = -1, -1
+        for node in range(n):
+            level = int(levels[node])
+            if entry < 0:
+                entry, max_level = node, level
+                continue
+            query = vectors[node]
+            entries = [entry]
+            for layer in range(max_level, level, -1):
+                entries = [_search_layer(vectors, query, entries, 1, _list_links(links, layer))[0][1]]
+            for layer in range(min(level, max_level), -1, -1):
+                found = _search_layer(
+                    vectors, query, entries, ef_construction, _list_links(links, layer)
+                )
+                capacity = 2 * m if layer == 0 else m
+                selected = _select_neighbours(vectors, found, m)
+                links[node][layer] = selected
+                for other in selected:
+                    neighbours = links[other][layer]
+                    neighbours.append(node)
+                    if len(neighbours) > capacity:
+                        links[other][layer] = _prune(vectors, other, neighbours, capacity)
+                entries = [idx for _, idx in found]
+            if level > max_level:
+                entry, max_level = node, level
+
+        graph0 = np.full((n, 2 * m), -1, dtype=np.int32)
+        upper_offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(levels.astype(np.int64) * m, out=upper_offsets[1:])
+        upper = np.full(int(upper_offsets[-1]), -1, dtype=np.int32)
+        for node, node_links in enumerate(links):
+            graph0[node, : len(node_links[0])] = node_links[0]
+            for layer in range(1, len(node_links)):
+                start = int(upper_offsets[node]) + (layer - 1) * m
+                upper[start : start + len(node_links[layer])] = node_links[layer]
+        return cls(levels, graph0, upper, upper_offsets, embeddings, ef_search=ef_search)
+
+    def save(self, output_dir: Path) -> None:
+        output_dir = Path(output_dir)
+        for name, array in zip(_FILES, (self.levels, self.graph0, self.upper, self.upper_offsets)):
+            save_array(output_dir / name, array)
+
+    @classmethod
+    def load(
+        cls, index_dir: Path, embeddings: np.ndarray, *, ef_search: int = DEFAULT_EF_SEARCH
+    ) -> Optional[HNSWIndex]:
+        """
+        Open the graph (memory-mapped), or None when the index was not built
+        with ``--hnsw-m`` (per ``params.json``), the files are stale, or the
+        graph was built in another space than ``embeddings`` (``search_dim``,
+        e.g. PCA-reduced vectors with PCA disabled at serving time).
+        """
+        index_dir = Path(index_dir)
+        params_path = index_dir / "params.json"
+        if not params_path.exists():
+            return None
+        with params_path.open("r", encoding="utf-8") as handle:
+            params = json.load(handle)
+        hnsw_m = params.get("hnsw_m")
+        if not hnsw_m or params.get("search_dim", embeddings.shape[1]) != embeddings.shape[1]:
+            return None
+        paths = [index_dir / name for name in _FILES]
+        if not all(path.exists() for path in paths):
+            return None
+        levels, graph0, upper, upper_offsets = (np.load(path, mmap_mode="r") for path in paths)
+        if graph0.shape != (embeddings.shape[0], 2 * hnsw_m) or len(levels) != len(graph0):
+            return None
+        return cls(levels, graph0, upper, upper_offsets, embeddings, ef_search=ef_search)
+
+    def neighbours(self, node: int, layer: int) -> list[int]:
+        if layer == 0:
+            row = self.graph0[node]
+        else:
+            start = int(self.upper_offsets[node]) + (layer - 1) * self.m
+            row = self.upper[start : start + self.m]
+        return row[row >= 0].tolist()
+
+    def search(
+        self, query: np.ndarray, k: int, *, ef_search: Optional[int] = None
+    ) -> list[tuple[int, float]]:
+        if self.entry_point < 0:
+            return []
+        query = np.asarray(query, dtype=np.float32).reshape(-1)
+        entries = [self.entry_point]
+        for layer in range(self.max_level, 0, -1):
+            entries = [
+                _search_layer(self.embeddings, query, entries, 1, self._layer(layer))[0][1]
+            ]
+        ef = max(ef_search or self.ef_search, k)
+        found = _search_layer(self.embeddings, query, entries, ef, self._layer(0))
+        return [(idx, score) for score, idx in found[:k]]
+
+    def _layer(self, layer: int) -> Callable[[int], list[int]]:
+        return lambda node: self.neighbours(node, layer)
+
+
+def _list_links(links: list[list[list[int]]], layer: int) -> Callable[[int], list[int]]:
+    return lambda node: links[node][layer]
+
+
+def _search_layer(
+    vectors: np.ndarray,
+    query: np.ndarray,
+    entries: Sequence[int],
+    ef: int,
+    neighbours: Callable[[int], list[int]],
+) -> list[tuple[float, int]]:
+    """Best-first beam search; returns up to ``ef`` (score, idx) by (-score, idx)."""
+    visited = set(entries)
+    scores = (vectors[list(entries)] @ query).tolist()
+    candidates = [(-score, idx) for score, idx in zip(scores, entries)]
+    heapq.heapify(candidates)
+    # Min-heap on (score, -idx): the root is the worst kept result.
+    results = [(score, -idx) for score, idx in zip(scores, entries)]
+    heapq.heapify(results)
+    while len(results) > ef:
+        heapq.heappop(results)
+    while candidates:
+        neg_score, node = heapq.heappop(candidates)
+        if len(results) >= ef and -neg_score < results[0][0]:
+            break
+        fresh = [other for other in neighbours(node) if other not in visited]
+        if not fresh:
+            continue
+        visited.update(fresh)
+        scores = vectors[fresh] @ query
+        if len(results) >= ef:
+            # Only neighbours at least as good as the worst kept result can enter.
+            keep = np.flatnonzero(scores >= results[0][0])
+            if not len(keep):
+                continue
+            fresh = [fresh[position] for position in keep.tolist()]
+            scores = scores[keep]
+        for score, other in zip(scores.tolist(), fresh):
+            if len(results) < ef or (score, -other) > results[0]:
+                heapq.heappush(candidates, (-score, other))
+                heapq.heappush(results, (score, -other))
+                if len(results) > ef:
+                    heapq.heappop(results)
+    return sorted(((score, -neg_idx) for score, neg_idx in results), key=lambda p: (-p[0], p[1]))
+
+
+def _select_neighbours(
+    vectors: np.ndarray, found: list[tuple[float, int]], m: int
+) -> list[int]:
+    """
+    Neighbour-selection heuristic: skip a candidate that is closer to an already
+    selected neighbour than to the query (keeps links spread across clusters),
+    then top up with the skipped ones.
+    """
+    if not found:
+        return []
+    scores = [score for score, _ in found]
+    ids = [idx for _, idx in found]
+    candidates = vectors[ids]
+    # Best similarity of each candidate to any selected neighbour so far,
+    # updated with one vectorized row per selection.
+    closest = np.full(len(ids), -np.inf, dtype=np.float32)
+    selected: list[int] = []
+    skipped: list[int] = []
+    for position, (score, idx) in enumerate(zip(scores, ids)):
+        if len(selected) >= m:
+            break
+        if selected and closest[position] >= score:
+            skipped.append(idx)
+        else:
+            selected.append(idx)
+            np.maximum(closest, candidates @ candidates[position], out=closest)
+    return selected + skipped[: m - len(selected)]
+
+
+def _prune(vectors: np.ndarray, node: int, neighbours: list[int], capacity: int) -> list[int]:
+    scores = (vectors[neighbours] @ vectors[node]).tolist()
+    ranked = sorted(zip(scores, neighbours), key=lambda p: (-p[0], p[1]))
+    return _select_neighbours(vectors, ranked, capacity)
@@ -0,0 +1,181 @@
+# src/rag/ivf.py
+
+"""Inverted-file (IVF) approximate nearest-neighbour index for dense search."""
+
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from src.rag.artifacts import save_array
+from src.rag.ranking import top_k
+
+IVF_CENTROIDS_FILE = "ivf_centroids.npy"
+IVF_OFFSETS_FILE = "ivf_offsets.npy"
+IVF_IDS_FILE = "ivf_ids.npy"
+
+# Rows scored against the centroids per step; bounds the (rows x lists) temporary.
+_ASSIGN_TILE_ROWS = 65536
+# k-means is trained on at most this many points per list.
+_TRAIN_POINTS_PER_LIST = 256
+
+
+def train_kmeans(
+    vectors: np.ndarray, n_clusters: int, *, iterations: int = 20, seed: int = 0
+) -> np.ndarray:
+    """
+    Spherical k-means (dot-product assignment, L2-normalized centroids).
+
+    Deterministic for a given seed: initial centroids are a seeded sample of the
+    rows and empty clusters are re-seeded with the worst-fitting points.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim != 2 or vectors.shape[0] == 0:
+        raise ValueError("vectors must be a non-empty 2-D array")
+    if n_clusters <= 0:
+        raise ValueError("n_clusters must be > 0")
+    rng = np.random.default_rng(seed)
+    n_clusters = min(n_clusters, vectors.shape[0])
+    max_train = n_clusters * _TRAIN_POINTS_PER_LIST
+    if vectors.shape[0] > max_train:
+        vectors = vectors[np.sort(rng.choice(vectors.shape[0], max_train, replace=False))]
+
+    init = np.sort(rng.choice(vectors.shape[0], n_clusters, replace=False))
+    centroids = vectors[init].copy()
+    assign = None
+    for _ in range(iterations):
+        new_assign, similarity = _assign(vectors, centroids)
+        if assign is not None and np.array_equal(new_assign, assign):
+            break
+        assign = new_assign
+        counts = np.bincount(assign, minlength=n_clusters)
+        order = np.argsort(assign, kind="stable")
+        starts = np.zeros(n_clusters, dtype=np.int64)
+        np.cumsum(counts[:-1], out=starts[1:])
+        sums = np.zeros_like(centroids)
+        nonempty = counts > 0
+        sums[nonempty] = np.add.reduceat(vectors[order], starts[nonempty], axis=0)
+        empty = np.flatnonzero(~nonempty)
+        if len(empty):
+            worst = np.argsort(similarity, kind="stable")[: len(empty)]
+            sums[empty] = vectors[worst]
+        centroids = _normalize(sums)
+    return centroids
+
+
+class IVFIndex:
+    """
+    Coarse k-means centroids plus one inverted list of row ids per centroid.
+
+    Lists are stored contiguously: the ids of list ``l`` are
+    ``list_ids[list_offsets[l]:list_offsets[l + 1]]`` (ascending). A query scores
+    the centroids, probes the ``nprobe`` closest lists and ranks only their rows
+    exactly against the embedding matrix, ordered by (-score, index).
+    """
+
+    def __init__(
+        self,
+        centroids: np.ndarray,
+        list_offsets: np.ndarray,
+        list_ids: np.ndarray,
+        embeddings: np.ndarray,
+        *,
+        nprobe: int = 8,
+    ) -> None:
+        self.centroids = centroids
+        self.list_offsets = list_offsets
+        self.list_ids = list_ids
+        self.embeddings = embeddings
+        self.nprobe = nprobe
+
+    @property
+    def n_lists(self) -> int:
+        return int(self.centroids.shape[0])
+
+    @classmethod
+    def build(
+        cls,
+        embeddings: np.ndarray,
+        n_lists: int,
+        *,
+        seed: int = 0,
+        iterations: int = 20,
+        nprobe: int = 8,
+    ) -> IVFIndex:
+        centroids = train_kmeans(embeddings, n_lists, iterations=iterations, seed=seed)
+        assign, _ = _assign(np.asarray(embeddings, dtype=np.float32), centroids)
+        list_ids = np.argsort(assign, kind="stable").astype(np.int64)
+        list_offsets = np.zeros(len(centroids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assign, minlength=len(centroids)), out=list_offsets[1:])
+        return cls(centroids, list_offsets, list_ids, embeddings, nprobe=nprobe)
+
+    def save(self, output_dir: Path) -> None:
+        output_dir = Path(output_dir)
+        save_array(output_dir / IVF_CENTROIDS_FILE, self.centroids)
+        save_array(output_dir / IVF_OFFSETS_FILE, self.list_offsets)
+        save_array(output_dir / IVF_IDS_FILE, self.list_ids)
+
+    @classmethod
+    def load(
+        cls, index_dir: Path, embeddings: np.ndarray, *, nprobe: int = 8
+    ) -> Optional[IVFIndex]:
+        """
+        Open the IVF artifacts (memory-mapped), or None when the index was not
+        built with ``--ivf-lists`` (per ``params.json``) or the files are stale.
+        """
+        index_dir = Path(index_dir)
+        params_path = index_dir / "params.json"
+        if not params_path.exists():
+            return None
+        with params_path.open("r", encoding="utf-8") as handle:
+            if not json.load(handle).get("ivf_lists"):
+                return None
+        paths = [index_dir / name for name in (IVF_CENTROIDS_FILE, IVF_OFFSETS_FILE, IVF_IDS_FILE)]
+        if not all(path.exists() for path in paths):
+            return None
+        centroids, list_offsets, list_ids = (np.load(path, mmap_mode="r") for path in paths)
+        if (
+            list_ids.shape[0] != embeddings.shape[0]
+            or centroids.shape[1] != embeddings.shape[1]
+        ):
+            return None
+        return cls(centroids, list_offsets, list_ids, embeddings, nprobe=nprobe)
+
+    def candidates(self, query: np.ndarray, nprobe: Optional[int] = None) -> np.ndarray:
+        nprobe = min(nprobe or self.nprobe, self.n_lists)
+        centroid_scores = self.centroids @ query
+        if nprobe < self.n_lists:
+            probe = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+        else:
+            probe = np.arange(self.n_lists)
+        return np.concatenate(
+            [self.list_ids[self.list_offsets[lst] : self.list_offsets[lst + 1]] for lst in probe]
+        )
+
+    def search(
+        self, query: np.ndarray, k: int, *, nprobe: Optional[int] = None
+    ) -> list[tuple[int, float]]:
+        query = np.asarray(query, dtype=np.float32).reshape(-1)
+        # Sorted ids make positional tie-breaks in top_k match row order.
+        ids = np.sort(self.candidates(query, nprobe))
+        scores = self.embeddings[ids] @ query
+        return [(int(ids[pos]), score) for pos, score in top_k(scores, k)]
+
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    assign = np.empty(vectors.shape[0], dtype=np.int64)
+    similarity = np.empty(vectors.shape[0], dtype=np.float32)
+    for start in range(0, vectors.shape[0], _ASSIGN_TILE_ROWS):
+        scores = vectors[start : start + _ASSIGN_TILE_ROWS] @ centroids.T
+        best = scores.argmax(axis=1)
+        assign[start : start + len(best)] = best
+        similarity[start : start + len(best)] = scores[np.arange(len(best)), best]
+    return assign, similarity
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
@@ -0,0 +1,99 @@
+# src/rag/manifest.py
+
+"""Per-file content-hash manifest used for incremental index builds."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+from pathlib import Path
+from typing import Optional
+
+MANIFEST_FILE = "manifest.json"
+MANIFEST_VERSION = 2
+# Row-aligned artifacts whose digests must match before their rows are reused.
+ROW_ARTIFACTS = ("metadata.jsonl", "embeddings.npy")
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def file_hash(path: Path, block_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with Path(path).open("rb") as handle:
+        for block in iter(lambda: handle.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class BuildManifest:
+    """
+    The input files of a build, in index order, with their content hash and
+    chunk count. Chunks of one file occupy consecutive rows of
+    ``metadata.jsonl``/``embeddings.npy``, so the counts give each file's row
+    range. ``settings`` holds everything that changes chunking or embeddings
+    (model, chunk size, overlap); a manifest built with other settings cannot
+    be reused. ``artifacts`` holds the SHA-256 of each ``ROW_ARTIFACTS`` file
+    as written by the same build, so rows are only reused from the exact
+    files this manifest describes, not from a build that died half-way.
+    """
+
+    def __init__(self, settings: dict, files: list[dict], artifacts: Optional[dict] = None) -> None:
+        self.settings = dict(settings)
+        self.files = list(files)
+        self.artifacts = dict(artifacts or {})
+
+    @classmethod
+    def for_build(cls, index_dir: Path, settings: dict, files: list[dict]) -> BuildManifest:
+        """Describe a finished build, hashing its row artifacts."""
+        artifacts = {name: file_hash(Path(index_dir) / name) for name in ROW_ARTIFACTS}
+        return cls(settings, files, artifacts)
+
+    def matches_artifacts(self, index_dir: Path) -> bool:
+        """True if the row artifacts in ``index_dir`` are the ones this manifest was written for."""
+        for name in ROW_ARTIFACTS:
+            try:
+                if file_hash(Path(index_dir) / name) != self.artifacts.get(name):
+                    return False
+            except OSError:
+                return False
+        return True
+
+    @property
+    def num_chunks(self) -> int:
+        return sum(entry["num_chunks"] for entry in self.files)
+
+    def row_ranges(self) -> dict[str, tuple[str, int, int]]:
+        """Map each path to ``(sha256, start_row, stop_row)``."""
+        ranges: dict[str, tuple[str, int, int]] = {}
+        start = 0
+        for entry in self.files:
+            stop = start + entry["num_chunks"]
+            ranges[entry["path"]] = (entry["sha256"], start, stop)
+            start = stop
+        return ranges
+
+    def save(self, index_dir: Path) -> None:
+        payload = {
+            "version": MANIFEST_VERSION,
+            "settings": self.settings,
+            "files": self.files,
+            "artifacts": self.artifacts,
+        }
+        with (Path(index_dir) / MANIFEST_FILE).open("w", encoding="utf-8") as handle:
+            json.dump(payload, handle, indent=2, sort_keys=True)
+
+    @classmethod
+    def load(cls, index_dir: Path) -> Optional[BuildManifest]:
+        """Return the manifest in ``index_dir``, or None if absent, unreadable or outdated."""
+        path = Path(index_dir) / MANIFEST_FILE
+        try:
+            payload = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        if not isinstance(payload, dict) or payload.get("version") != MANIFEST_VERSION:
+            return None
+        return cls(
+            payload.get("settings", {}), payload.get("files", []), payload.get("artifacts", {})
+        )
@@ -0,0 +1,97 @@
+# src/rag/pca.py
+
+"""PCA dimensionality reduction for stored and query embeddings."""
+
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from src.rag.artifacts import save_array
+
+PCA_MEAN_FILE = "pca_mean.npy"
+PCA_COMPONENTS_FILE = "pca_components.npy"
+PCA_EMBEDDINGS_FILE = "embeddings_pca.npy"
+
+
+class PCAProjection:
+    """
+    Linear projection ``(x - mean) @ components`` followed by L2 re-normalization,
+    so reduced vectors can still be compared with a plain dot product.
+    """
+
+    def __init__(self, mean: np.ndarray, components: np.ndarray) -> None:
+        self.mean = np.asarray(mean, dtype=np.float32)
+        self.components = np.asarray(components, dtype=np.float32)
+
+    @property
+    def dim(self) -> int:
+        return int(self.components.shape[1])
+
+    @classmethod
+    def fit(cls, embeddings: np.ndarray, dim: int) -> PCAProjection:
+        """Fit the top ``dim`` principal components with an SVD of the centered matrix."""
+        embeddings = np.asarray(embeddings, dtype=np.float64)
+        if embeddings.ndim != 2 or embeddings.shape[0] == 0:
+            raise ValueError("embeddings must be a non-empty 2-D array")
+        if not 0 < dim <= embeddings.shape[1]:
+            raise ValueError(f"dim must be in [1, {embeddings.shape[1]}]")
+        mean = embeddings.mean(axis=0)
+        _, _, vt = np.linalg.svd(embeddings - mean, full_matrices=False)
+        components = vt[:dim].T
+        if components.shape[1] < dim:
+            # Fewer rows than dims: pad with zero directions to keep the shape.
+            pad = np.zeros((components.shape[0], dim - components.shape[1]))
+            components = np.hstack([components, pad])
+        # SVD signs are arbitrary; fix them so artifacts are reproducible.
+        signs = np.sign(components[np.abs(components).argmax(axis=0), np.arange(dim)])
+        signs[signs == 0] = 1.0
+        return cls(mean, components * signs)
+
+    def project(self, vectors: np.ndarray) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        reduced = (vectors - self.mean) @ self.components
+        norms = np.linalg.norm(reduced, axis=-1, keepdims=True)
+        return np.divide(reduced, norms, out=np.zeros_like(reduced), where=norms > 0)
+
+    def save(self, output_dir: Path) -> None:
+        output_dir = Path(output_dir)
+        save_array(output_dir / PCA_MEAN_FILE, self.mean)
+        save_array(output_dir / PCA_COMPONENTS_FILE, self.components)
+
+
+def write_pca(output_dir: Path, embeddings: np.ndarray, dim: int) -> np.ndarray:
+    """Fit and save the projection plus the reduced matrix; returns the reduced matrix."""
+    projection = PCAProjection.fit(embeddings, dim)
+    reduced = projection.project(embeddings)
+    projection.save(output_dir)
+    save_array(Path(output_dir) / PCA_EMBEDDINGS_FILE, reduced)
+    return reduced
+
+
+def load_pca(
+    index_dir: Path, num_rows: int
+) -> Optional[tuple[PCAProjection, np.ndarray]]:
+    """
+    Load the projection and memory-mapped reduced matrix, or None when the index
+    was not built with ``--pca-dim`` (per ``params.json``) or the files are stale.
+    """
+    index_dir = Path(index_dir)
+    params_path = index_dir / "params.json"
+    if not params_path.exists():
+        return None
+    with params_path.open("r", encoding="utf-8") as handle:
+        pca_dim = json.load(handle).get("pca_dim")
+    if not pca_dim:
+        return None
+    paths = [index_dir / name for name in (PCA_MEAN_FILE, PCA_COMPONENTS_FILE, PCA_EMBEDDINGS_FILE)]
+    if not all(path.exists() for path in paths):
+        return None
+    projection = PCAProjection(np.load(paths[0]), np.load(paths[1]))
+    reduced = np.load(paths[2], mmap_mode="r")
+    if projection.dim != pca_dim or reduced.shape != (num_rows, pca_dim):
+        return None
+    return projection, reduced
@@ -0,0 +1,206 @@
+# src/rag/quantization.py
+
+"""Scalar (int8) and sign (1-bit) quantized embeddings with exact rescoring."""
+
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from src.rag.artifacts import save_array
+from src.rag.ranking import top_k, top_k_indices
+
+QUANTIZATION_MODES = ("int8", "binary")
+INT8_CODES_FILE = "embeddings_int8.npy"
+INT8_SCALES_FILE = "embeddings_int8_scales.npy"
+BINARY_CODES_FILE = "embeddings_binary.npy"
+
+# Size of the float32 tile the int8 first pass upcasts codes into. NumPy has
+# no BLAS int8 matmul, so codes are widened tile by tile; a tile this small
+# stays in cache, so the scan costs one read of the int8 codes instead of
+# writing and re-reading a float32 copy (which made it slower than the exact
+# float32 scan).
+_INT8_TILE_BYTES = 1 << 20
+
+if hasattr(np, "bitwise_count"):
+    _popcount = np.bitwise_count
+else:  # NumPy < 2.0
+    _POPCOUNT_TABLE = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+    def _popcount(values: np.ndarray) -> np.ndarray:
+        return _POPCOUNT_TABLE[values]
+
+
+def quantize_int8(embeddings: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Symmetric per-dimension scalar quantization.
+
+    Returns int8 codes and float32 scales such that ``codes * scales``
+    approximates ``embeddings``.
+    """
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    if embeddings.shape[0]:
+        max_abs = np.abs(embeddings).max(axis=0)
+    else:
+        max_abs = np.zeros(embeddings.shape[1], dtype=np.float32)
+    scales = np.where(max_abs > 0, max_abs / 127.0, 1.0).astype(np.float32)
+    codes = np.clip(np.rint(embeddings / scales), -127, 127).astype(np.int8)
+    return codes, scales
+
+
+def quantize_binary(embeddings: np.ndarray) -> np.ndarray:
+    """Pack the sign of every dimension into bits (``ceil(D / 8)`` bytes per row)."""
+    return np.packbits(np.asarray(embeddings) > 0, axis=1)
+
+
+def write_quantized(output_dir: Path, embeddings: np.ndarray, modes: list[str]) -> None:
+    output_dir = Path(output_dir)
+    if "int8" in modes:
+        codes, scales = quantize_int8(embeddings)
+        save_array(output_dir / INT8_CODES_FILE, codes)
+        save_array(output_dir / INT8_SCALES_FILE, scales)
+    if "binary" in modes:
+        save_array(output_dir / BINARY_CODES_FILE, quantize_binary(embeddings))
+
+
+class QuantizedSearcher:
+    """
+    Two-pass dense search: a cheap scan over quantized codes selects
+    ``rescore_candidates`` rows, which are then rescored exactly against the
+    float32 embeddings and ranked by (-score, index).
+    """
+
+    def __init__(
+        self,
+        mode: str,
+        embeddings: np.ndarray,
+        *,
+        int8_codes: Optional[np.ndarray] = None,
+        int8_scales: Optional[np.ndarray] = None,
+        binary_codes: Optional[np.ndarray] = None,
+        rescore_candidates: int = 100,
+    ) -> None:
+        if mode not in QUANTIZATION_MODES:
+            raise ValueError(f"unknown quantization mode: {mode}")
+        if mode == "int8" and (int8_codes is None or int8_scales is None):
+            raise ValueError("int8 search requires codes and scales")
+        if mode == "binary" and binary_codes is None:
+            raise ValueError("binary search requires codes")
+        self.mode = mode
+        self.embeddings = embeddings
+        self.int8_codes = int8_codes
+        self.int8_scales = int8_scales
+        self.binary_codes = binary_codes
+        self.rescore_candidates = rescore_candidates
+
+    @classmethod
+    def load(
+        cls,
+        index_dir: Path,
+        mode: str,
+        embeddings: np.ndarray,
+        *,
+        rescore_candidates: int = 100,
+    ) -> Optional[QuantizedSearcher]:
+        """
+        Open the quantized artifacts for ``mode``, or None when the index was not
+        built with that mode (per ``params.json``) or the files are stale or were
+        quantized in another space than ``embeddings`` (e.g. PCA-reduced codes
+        with PCA disabled at serving time).
+        """
+        index_dir = Path(index_dir)
+        params_path = index_dir / "params.json"
+        if not params_path.exists():
+            return None
+        with params_path.open("r", encoding="utf-8") as handle:
+            params = json.load(handle)
+        if mode not in params.get("quantization", []):
+            return None
+        dim = embeddings.shape[1]
+        if params.get("search_dim", dim) != dim:
+            return None
+        arrays = {}
+        if mode == "int8":
+            names = {"int8_codes": INT8_CODES_FILE, "int8_scales": INT8_SCALES_FILE}
+        elif mode == "binary":
+            names = {"binary_codes": BINARY_CODES_FILE}
+        else:
+            raise ValueError(f"unknown quantization mode: {mode}")
+        for key, name in names.items():
+            path = index_dir / name
+            if not path.exists():
+                return None
+            arrays[key] = np.load(path, mmap_mode="r")
+        codes = arrays.get("int8_codes", arrays.get("binary_codes"))
+        if codes.shape[0] != embeddings.shape[0]:
+            return None
+        if mode == "int8":
+            if codes.shape[1] != dim or arrays["int8_scales"].shape[0] != dim:
+                return None
+        elif codes.shape[1] != (dim + 7) // 8:
+            return None
+        return cls(mode, embeddings, rescore_candidates=rescore_candidates, **arrays)
+
+    def first_pass(self, query: np.ndarray) -> np.ndarray:
+        """Approximate scores for every row (higher is better)."""
+        if self.mode == "int8":
+            weighted = (query * self.int8_scales).astype(np.float32)
+            rows, dim = self.int8_codes.shape
+            tile_rows = max(1, _INT8_TILE_BYTES // (4 * max(dim, 1)))
+            buffer = np.empty((min(tile_rows, rows), dim), dtype=np.float32)
+            scores = np.empty(rows, dtype=np.float32)
+            for start in range(0, rows, tile_rows):
+                codes = self.int8_codes[start : start + tile_rows]
+                tile = buffer[: len(codes)]
+                np.copyto(tile, codes, casting="unsafe")
+                np.dot(tile, weighted, out=scores[start : start + len(codes)])
+            return scores
+        query_bits = np.packbits(query > 0)
+        distances = _popcount(np.bitwise_xor(self.binary_codes, query_bits)).sum(
+            axis=1, dtype=np.int32
+        )
+        return -distances
+
+    def candidates(self, query: np.ndarray, depth: int) -> np.ndarray:
+        scores = self.first_pass(query)
+        depth = min(depth, len(scores))
+        if depth <= 0:
+            return np.empty(0, dtype=np.int64)
+        if depth < len(scores):
+            cands = np.argpartition(-scores, depth - 1)[:depth]
+        else:
+            cands = np.arange(len(scores))
+        return np.sort(cands)
+
+    def search(self, query: np.ndarray, k: int) -> list[tuple[int, float]]:
+        query = np.asarray(query, dtype=np.float32).reshape(-1)
+        cands = self.candidates(query, max(k, self.rescore_candidates))
+        exact = self.embeddings[cands] @ query
+        # Candidates are sorted, so ranking by position breaks ties by row index.
+        return [(int(cands[pos]), score) for pos, score in top_k(exact, k)]
+
+
+def recall_vs_exact(
+    searcher: QuantizedSearcher, queries: np.ndarray, k: int
+) -> tuple[float, float]:
+    """
+    Mean recall@k against the exact float32 top-k, for the quantized first pass
+    alone (top-k by approximate score) and after exact rescoring.
+    """
+    queries = np.asarray(queries, dtype=np.float32)
+    if queries.shape[0] == 0:
+        return 0.0, 0.0
+    first_total = 0.0
+    rescored_total = 0.0
+    for query in queries:
+        exact_scores = searcher.embeddings @ query
+        top = min(k, len(exact_scores))
+        exact = set(top_k_indices(exact_scores, top).tolist())
+        first = set(searcher.candidates(query, top).tolist())
+        rescored = {idx for idx, _ in searcher.search(query, top)}
+        first_total += len(first & exact) / top
+        rescored_total += len(rescored & exact) / top
+    return first_total / len(queries), rescored_total / len(queries)
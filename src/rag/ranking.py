@@ -0,0 +1,87 @@
+# src/rag/ranking.py
+
+"""Vectorized top-k selection shared by every retriever."""
+
+from __future__ import annotations
+
+from typing import Optional
+
+import numpy as np
+
+
+def top_k_indices(
+    scores: np.ndarray, k: int, *, min_score: Optional[float] = None
+) -> np.ndarray:
+    """
+    Indices of the ``k`` best scores ordered by (-score, index).
+
+    ``np.argpartition`` selects the candidates in O(N); only those (plus any
+    rows tied with the k-th score, so ties always resolve to the lowest index)
+    are sorted. With ``min_score``, scores below it are never returned.
+    """
+    scores = np.asarray(scores)
+    if scores.ndim != 1:
+        raise ValueError("scores must be 1-D; use top_k_batch for a score matrix")
+    ids = None
+    if min_score is not None:
+        ids = np.flatnonzero(scores >= min_score)
+        scores = scores[ids]
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    if k < len(scores):
+        cand = np.argpartition(-scores, k - 1)[:k]
+        kth = scores[cand].min()
+        if np.count_nonzero(scores >= kth) > k:
+            cand = np.flatnonzero(scores >= kth)
+    else:
+        cand = np.arange(len(scores))
+    cand = cand[np.lexsort((cand, -scores[cand]))[:k]]
+    return cand if ids is None else ids[cand]
+
+
+def top_k(
+    scores: np.ndarray, k: int, *, min_score: Optional[float] = None
+) -> list[tuple[int, float]]:
+    """(index, score) pairs of the ``k`` best scores, ordered by (-score, index)."""
+    scores = np.asarray(scores)
+    ids = top_k_indices(scores, k, min_score=min_score)
+    return list(zip(ids.tolist(), scores[ids].tolist()))
+
+
+def top_k_batch(
+    scores: np.ndarray, k: int, *, min_score: Optional[float] = None
+) -> list[list[tuple[int, float]]]:
+    """
+    ``top_k`` for every row of a (queries x docs) score matrix.
+
+    Selection and ordering run on the whole matrix at once; only rows with ties
+    straddling the k-th score (or a ``min_score`` cutoff) fall back to ``top_k``.
+    """
+    scores = np.asarray(scores)
+    if scores.ndim != 2:
+        raise ValueError("scores must be a 2-D (queries x docs) matrix")
+    num_rows, num_cols = scores.shape
+    k = min(k, num_cols)
+    if k <= 0:
+        return [[] for _ in range(num_rows)]
+    if min_score is not None:
+        return [top_k(row, k, min_score=min_score) for row in scores]
+    if k < num_cols:
+        cand = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        cand = np.broadcast_to(np.arange(num_cols), (num_rows, num_cols))
+    cand_scores = np.take_along_axis(scores, cand, axis=1)
+    kth = cand_scores.min(axis=1)
+    exact = np.count_nonzero(scores >= kth[:, None], axis=1) == k
+    rows = np.repeat(np.arange(num_rows), k)
+    order = np.lexsort((cand.ravel(), -cand_scores.ravel(), rows))
+    ids = cand.ravel()[order].reshape(num_rows, k)
+    ranked_scores = cand_scores.ravel()[order].reshape(num_rows, k)
+    results = []
+    for row in range(num_rows):
+        if exact[row]:
+            results.append(list(zip(ids[row].tolist(), ranked_scores[row].tolist())))
+        else:
+            results.append(top_k(scores[row], k))
+    return results
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from rag.analyzer import Analyzer, Vocabulary
+
+
+def test_tokenize_splits_on_punctuation() -> None:
+    analyzer = Analyzer()
+    tokens = analyzer.tokenize("Refunds: within 30 days (3-5 business days). Don't wait!")
+    assert tokens == ["refunds", "within", "30", "days", "3", "5", "business", "days", "don't", "wait"]
+
+
+def test_config_round_trip_preserves_tokenization() -> None:
+    analyzer = Analyzer(lowercase=False)
+    restored = Analyzer.from_config(analyzer.config())
+    text = "Shipping, Delivery & Returns"
+    assert restored.tokenize(text) == analyzer.tokenize(text) == ["Shipping", "Delivery", "Returns"]
+
+
+def test_vocabulary_assigns_first_seen_int32_ids() -> None:
+    vocab = Vocabulary()
+    ids = vocab.encode(["b", "a", "b", "c"], add=True)
+    assert ids.dtype == np.int32
+    assert ids.tolist() == [0, 1, 0, 2]
+    assert vocab.terms == ["b", "a", "c"]
+
+
+def test_frozen_vocabulary_drops_unknown_terms() -> None:
+    vocab = Vocabulary(["refund", "delivery"]).freeze()
+    assert vocab.encode(["delivery", "unknown", "refund"]).tolist() == [1, 0]
+    with pytest.raises(ValueError):
+        vocab.encode(["unknown"], add=True)
+
+
+def test_duplicate_terms_rejected() -> None:
+    with pytest.raises(ValueError):
+        Vocabulary(["a", "a"])
+
+
+def test_index_and_query_analysis_match() -> None:
+    analyzer = Analyzer()
+    vocab = Vocabulary()
+    text = "Refunds, refunds; REFUNDS."
+    doc = vocab.encode(analyzer.tokenize(text), add=True)
+    vocab.freeze()
+    assert np.array_equal(vocab.encode(analyzer.tokenize(text)), doc)
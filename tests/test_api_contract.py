@@ -1,10 +1,14 @@
+import asyncio
 import json
+import time
 from pathlib import Path
 
 import numpy as np
+import pytest
 from fastapi.testclient import TestClient
 
-from src.app.main import create_app
+from src.app.main import _timed, create_app
+from src.app.routing import ModeRouter
 from src.app.settings import Settings
 
 
@@ -133,3 +137,286 @@ def test_timeout_returns_504(tmp_path: Path, monkeypatch) -> None:
     assert response.status_code == 504
     payload = response.json()
     assert payload["error"]["code"] == "timeout"
+
+
+def test_repeated_query_served_from_result_cache(tmp_path: Path, monkeypatch) -> None:
+    _write_index(tmp_path)
+    settings = Settings(
+        index_dir=str(tmp_path),
+        rate_limit_rps=1000.0,
+        rate_limit_burst=1000,
+    )
+    app = create_app(settings)
+    client = TestClient(app)
+    service = app.state.retrieval_service
+    calls = []
+    original = service.retrieve
+
+    def counting_retrieve(query, mode, top_k, *args):
+        calls.append(query)
+        return original(query, mode, top_k, *args)
+
+    monkeypatch.setattr(service, "retrieve", counting_retrieve)
+
+    first = client.post("/predict", json={"query": "refund", "top_k": 2})
+    second = client.post("/predict", json={"query": "  refund ", "top_k": 2})
+    assert first.status_code == second.status_code == 200
+    assert first.json()["citations"] == second.json()["citations"]
+    assert calls == ["refund"]
+
+    monkeypatch.setattr(service, "index_version", "rebuilt")
+    client.post("/predict", json={"query": "refund", "top_k": 2})
+    assert len(calls) == 2
+
+
+def test_predict_batch_retrieves_misses_in_one_call(tmp_path: Path, monkeypatch) -> None:
+    _write_index(tmp_path)
+    settings = Settings(
+        index_dir=str(tmp_path),
+        rate_limit_rps=1000.0,
+        rate_limit_burst=1000,
+    )
+    app = create_app(settings)
+    client = TestClient(app)
+    service = app.state.retrieval_service
+    expected = [service.retrieve(query, "bm25", 1) for query in ("refund", "delivery time")]
+    batches = []
+    original = service.retrieve_batch
+
+    def counting_retrieve_batch(queries, mode, top_k, *args):
+        batches.append(list(queries))
+        return original(queries, mode, top_k, *args)
+
+    monkeypatch.setattr(service, "retrieve_batch", counting_retrieve_batch)
+
+    response = client.post(
+        "/predict_batch",
+        json={"queries": ["refund", "delivery time", " refund"], "top_k": 1},
+    )
+    assert response.status_code == 200
+    citations = [item["citations"] for item in response.json()]
+    assert citations == [expected[0], expected[1], expected[0]]
+    assert batches == [["refund", "delivery time"]]
+
+
+class _FakeEncoder:
+    def __init__(self) -> None:
+        self.calls = []
+
+    def encode(self, texts, normalize_embeddings=True, show_progress_bar=False):
+        self.calls.append(list(texts))
+        return np.array(
+            [[1.0, 0.0, 0.0, 0.0] if "refund" in text else [0.0, 1.0, 0.0, 0.0] for text in texts],
+            dtype=np.float32,
+        )
+
+
+def test_dense_predict_runs_through_micro_batcher(tmp_path: Path) -> None:
+    _write_index(tmp_path)
+    np.save(
+        tmp_path / "embeddings.npy",
+        np.array([[1.0, 0.0, 0.0, 0.0], [0.0, 1.0, 0.0, 0.0]], dtype=np.float32),
+    )
+    settings = Settings(
+        index_dir=str(tmp_path),
+        rate_limit_rps=1000.0,
+        rate_limit_burst=1000,
+        dense_batch_max_wait_ms=1.0,
+    )
+    app = create_app(settings)
+    encoder = _FakeEncoder()
+    app.state.retrieval_service._dense_model = encoder
+    client = TestClient(app)
+
+    refund = client.post("/predict", json={"query": "refund", "top_k": 1, "mode": "dense"})
+    shipping = client.post("/predict", json={"query": "shipping", "top_k": 2, "mode": "dense"})
+    assert refund.status_code == shipping.status_code == 200
+    assert [c["doc_id"] for c in refund.json()["citations"]] == ["refund_policy"]
+    assert [c["doc_id"] for c in shipping.json()["citations"]] == [
+        "shipping_policy",
+        "refund_policy",
+    ]
+    assert encoder.calls == [["refund"], ["shipping"]]
+
+
+def _hybrid_app(tmp_path: Path, **overrides):
+    _write_index(tmp_path)
+    # A third chunk gives BM25 terms a positive IDF.
+    with (tmp_path / "metadata.jsonl").open("a", encoding="utf-8") as handle:
+        json.dump(
+            {
+                "doc_id": "privacy_policy",
+                "chunk_id": "privacy_policy_0",
+                "text": "We retain personal data for 90 days.",
+                "start_offset": 0,
+                "end_offset": 36,
+            },
+            handle,
+        )
+        handle.write("\n")
+    np.save(
+        tmp_path / "embeddings.npy",
+        np.eye(3, 4, dtype=np.float32),
+    )
+    settings = Settings(
+        index_dir=str(tmp_path),
+        rate_limit_rps=1000.0,
+        rate_limit_burst=1000,
+        **overrides,
+    )
+    app = create_app(settings)
+    app.state.retrieval_service._dense_model = _FakeEncoder()
+    return app
+
+
+def test_hybrid_fuses_bm25_and_dense(tmp_path: Path) -> None:
+    app = _hybrid_app(tmp_path)
+    client = TestClient(app)
+
+    # BM25 only matches the refund chunk; dense ranks it first as well.
+    response = client.post("/predict", json={"query": "refunds", "top_k": 2, "mode": "hybrid"})
+    assert response.status_code == 200
+    citations = response.json()["citations"]
+    assert [c["doc_id"] for c in citations] == ["refund_policy", "shipping_policy"]
+    assert citations[0]["score"] == pytest.approx(2 / 61)
+    assert citations[1]["score"] == pytest.approx(1 / 62)
+
+    batch = client.post(
+        "/predict_batch", json={"queries": ["refunds", "shipping"], "top_k": 2, "mode": "hybrid"}
+    )
+    assert batch.status_code == 200
+    assert batch.json()[0]["citations"] == citations
+
+
+def test_hybrid_falls_back_to_bm25_when_dense_misses_budget(tmp_path: Path, monkeypatch) -> None:
+    app = _hybrid_app(tmp_path, hybrid_leg_timeout_seconds=0.05)
+    service = app.state.retrieval_service
+    client = TestClient(app)
+    original = service._search_dense
+
+    def slow_dense(query, k):
+        time.sleep(0.3)
+        return original(query, k)
+
+    monkeypatch.setattr(service, "_search_dense", slow_dense)
+
+    response = client.post("/predict", json={"query": "refunds", "top_k": 2, "mode": "hybrid"})
+    assert response.status_code == 200
+    citations = response.json()["citations"]
+    assert [c["doc_id"] for c in citations] == ["refund_policy"]
+    assert citations[0]["score"] == pytest.approx(1 / 61)
+
+
+def test_cascade_rescores_bm25_candidates_with_dense(tmp_path: Path) -> None:
+    app = _hybrid_app(tmp_path)
+    service = app.state.retrieval_service
+    encoder = service._dense_model
+    client = TestClient(app)
+
+    # BM25 shortlists the two chunks mentioning delivery; the privacy chunk
+    # never reaches the dense stage.
+    response = client.post(
+        "/predict",
+        json={"query": "delivery time", "top_k": 3, "mode": "cascade", "candidates": 5},
+    )
+    assert response.status_code == 200
+    citations = response.json()["citations"]
+    assert [c["doc_id"] for c in citations] == ["shipping_policy", "refund_policy"]
+    assert citations[0]["score"] == pytest.approx(1.0)
+
+    narrow = service.retrieve("delivery time", "cascade", 3, candidates=1)
+    assert [c["doc_id"] for c in narrow] == ["shipping_policy"]
+    assert service.retrieve("unknown words", "cascade", 2) == []
+    assert encoder.calls == [["delivery time"]]
+
+
+def test_cascade_candidates_limit_returns_422(tmp_path: Path) -> None:
+    _write_index(tmp_path)
+    settings = Settings(index_dir=str(tmp_path), max_cascade_candidates=10)
+    client = TestClient(create_app(settings))
+
+    response = client.post(
+        "/predict", json={"query": "refund", "mode": "cascade", "candidates": 11}
+    )
+    assert response.status_code == 422
+    assert response.json()["error"]["code"] == "validation_error"
+
+
+def test_auto_mode_routes_within_budget_and_reports_mode(tmp_path: Path) -> None:
+    app = _hybrid_app(tmp_path, request_timeout_seconds=1.0, auto_modes=["dense", "bm25"])
+    router = app.state.mode_router
+    client = TestClient(app)
+
+    router.observe("dense", 0.01)
+    first = client.post("/predict", json={"query": "refunds", "top_k": 1, "mode": "auto"})
+    assert first.status_code == 200
+    assert first.json()["versions"]["mode"] == "dense"
+
+    router.estimates["dense"] = 5.0
+    second = client.post("/predict", json={"query": "delivery", "top_k": 1, "mode": "auto"})
+    assert second.json()["versions"]["mode"] == "bm25"
+    assert "bm25" in router.estimates
+
+
+def test_admin_reload_is_disabled_by_default(tmp_path: Path) -> None:
+    _write_index(tmp_path)
+    client = TestClient(create_app(Settings(index_dir=str(tmp_path))))
+
+    response = client.post("/admin/reload")
+    assert response.status_code == 404
+
+
+def test_admin_reload_swaps_in_rebuilt_index(tmp_path: Path) -> None:
+    _write_index(tmp_path)
+    settings = Settings(index_dir=str(tmp_path), default_mode="bm25", admin_reload_enabled=True)
+    app = create_app(settings)
+    client = TestClient(app)
+    before = client.get("/health").json()["versions"]
+    old_service = app.state.retrieval_service
+
+    with (tmp_path / "metadata.jsonl").open("a", encoding="utf-8") as handle:
+        json.dump(
+            {
+                "doc_id": "warranty_policy",
+                "chunk_id": "warranty_policy_0",
+                "text": "Warranty claims are handled for two years.",
+                "start_offset": 0,
+                "end_offset": 42,
+            },
+            handle,
+        )
+        handle.write("\n")
+    np.save(tmp_path / "embeddings.npy", np.zeros((3, 4), dtype=np.float32))
+
+    response = client.post("/admin/reload")
+    assert response.status_code == 200
+    after = response.json()["versions"]
+    assert (before["index_generation"], after["index_generation"]) == ("0", "1")
+    assert after["index_version"] != before["index_version"]
+    assert app.state.retrieval_service is not old_service
+
+    payload = client.post("/predict", json={"query": "warranty", "top_k": 1}).json()
+    assert payload["citations"][0]["doc_id"] == "warranty_policy"
+    assert payload["versions"]["index_generation"] == after["index_generation"]
+
+
+def test_reload_refreshes_auto_modes(tmp_path: Path) -> None:
+    _write_index(tmp_path)
+    np.save(tmp_path / "embeddings.npy", np.zeros((0, 0), dtype=np.float32))
+    settings = Settings(
+        index_dir=str(tmp_path), auto_modes=["dense", "bm25"], admin_reload_enabled=True
+    )
+    app = create_app(settings)
+    client = TestClient(app)
+    assert app.state.mode_router.modes == ["bm25"]
+
+    np.save(tmp_path / "embeddings.npy", np.eye(2, 4, dtype=np.float32))
+    assert client.post("/admin/reload").status_code == 200
+    assert app.state.mode_router.modes == ["dense", "bm25"]
+
+
+def test_batched_retrieval_feeds_router_per_query_latency() -> None:
+    router = ModeRouter(["dense"], clock=lambda: 0.0)
+    asyncio.run(_timed(router, "dense", asyncio.sleep(0.05), queries=10))
+    assert router.in_flight == 0
+    assert router.estimates["dense"] < 0.05
@@ -0,0 +1,75 @@
+import asyncio
+
+import pytest
+
+from src.app.batching import MicroBatcher
+
+
+def test_concurrent_submissions_share_one_batch() -> None:
+    batches = []
+
+    def run_batch(items):
+        batches.append(list(items))
+        return [item * 2 for item in items]
+
+    async def main():
+        batcher = MicroBatcher(run_batch, max_batch_size=8, max_wait_seconds=0.01)
+        return await asyncio.gather(*(batcher.submit(n) for n in range(5)))
+
+    assert asyncio.run(main()) == [0, 2, 4, 6, 8]
+    assert batches == [[0, 1, 2, 3, 4]]
+
+
+def test_full_batches_dispatch_without_waiting() -> None:
+    batches = []
+
+    def run_batch(items):
+        batches.append(list(items))
+        return list(items)
+
+    async def main():
+        batcher = MicroBatcher(run_batch, max_batch_size=2, max_wait_seconds=10.0)
+        return await asyncio.wait_for(
+            asyncio.gather(*(batcher.submit(n) for n in range(4))), timeout=1.0
+        )
+
+    assert asyncio.run(main()) == [0, 1, 2, 3]
+    assert batches == [[0, 1], [2, 3]]
+
+
+def test_expired_items_are_dropped_and_errors_propagate() -> None:
+    batches = []
+
+    def run_batch(items):
+        batches.append(list(items))
+        raise ValueError("boom")
+
+    async def main():
+        batcher = MicroBatcher(run_batch, max_batch_size=8, max_wait_seconds=0.02)
+        return await asyncio.gather(
+            batcher.submit("late", timeout=0.0),
+            batcher.submit("ok", timeout=1.0),
+            return_exceptions=True,
+        )
+
+    late, ok = asyncio.run(main())
+    assert isinstance(late, TimeoutError)
+    assert isinstance(ok, ValueError)
+    assert batches == [["ok"]]
+
+
+def test_cancelled_waiter_is_skipped() -> None:
+    batches = []
+
+    def run_batch(items):
+        batches.append(list(items))
+        return list(items)
+
+    async def main():
+        batcher = MicroBatcher(run_batch, max_batch_size=8, max_wait_seconds=0.02)
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(batcher.submit("gone"), timeout=0.001)
+        return await batcher.submit("kept")
+
+    assert asyncio.run(main()) == "kept"
+    assert batches == [["kept"]]
@@ -0,0 +1,224 @@
+import json
+from pathlib import Path
+
+import numpy as np
+import pytest
+from rank_bm25 import BM25Okapi
+
+from rag.bm25_index import (
+    BM25_INDEX_DIRNAME,
+    BM25_INDEX_VERSION,
+    BM25Builder,
+    BM25Index,
+    load_bm25_index,
+)
+
+CORPUS = [
+    "refunds are available within 30 days of delivery".split(),
+    "delivery time is typically 3-5 business days".split(),
+    "we retain personal data for 90 days".split(),
+    "contact support to get your money back".split(),
+    "delivery delivery delivery".split(),
+    [],
+]
+
+
+def test_empty_corpus_rejected() -> None:
+    with pytest.raises(ValueError):
+        BM25Index.from_corpus([])
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        ["delivery"],
+        ["days", "delivery", "refunds"],
+        ["delivery", "delivery"],
+        ["unknown", "money"],
+        ["unknown"],
+    ],
+)
+def test_scores_match_rank_bm25(query) -> None:
+    expected = BM25Okapi(CORPUS).get_scores(query)
+    actual = BM25Index.from_corpus(CORPUS).get_scores(query)
+    assert actual.dtype == np.float64
+    assert np.array_equal(actual, expected)
+
+
+def test_scores_match_rank_bm25_with_epsilon_floor() -> None:
+    corpus = [["a", "b"], ["a", "c"], ["a", "b", "d"]]
+    for query in (["a"], ["b"], ["a", "d"]):
+        expected = BM25Okapi(corpus).get_scores(query)
+        actual = BM25Index.from_corpus(corpus).get_scores(query)
+        assert np.array_equal(actual, expected)
+
+
+def test_from_texts_matches_rank_bm25_on_analyzed_tokens() -> None:
+    texts = [
+        "Refunds are available within 30 days of delivery.",
+        "Delivery time is typically 3-5 business days.",
+        "Contact support to get your money back, refunds included.",
+    ]
+    index = BM25Index.from_texts(texts)
+    corpus = [index.analyzer.tokenize(text) for text in texts]
+    query = index.analyzer.tokenize("Refunds & delivery?")
+    assert np.array_equal(index.get_scores(query), BM25Okapi(corpus).get_scores(query))
+    assert index.search("Refunds & delivery?", 2) == index.top_k(query, 2)
+
+
+def test_builder_spills_runs_and_matches_from_texts(tmp_path: Path) -> None:
+    rng = np.random.default_rng(5)
+    texts = [
+        " ".join(f"w{term}" for term in rng.zipf(1.3, size=int(rng.integers(0, 30))))
+        for _ in range(300)
+    ]
+    builder = BM25Builder(tmp_path / "runs", spill_postings=50)
+    for text in texts:
+        builder.add(text)
+    assert len(list((tmp_path / "runs").iterdir())) > 1
+    index = builder.build()
+    assert not list((tmp_path / "runs").iterdir())
+
+    expected = BM25Index.from_texts(texts)
+    for name in ("idf", "offsets", "postings_docs", "postings_tfs", "doc_len"):
+        assert np.array_equal(getattr(index, name), getattr(expected, name)), name
+    assert index.search("w1 w7 w30", 10) == expected.search("w1 w7 w30", 10)
+
+
+def test_postings_only_cover_matching_documents() -> None:
+    index = BM25Index.from_corpus(CORPUS)
+    docs, weights = index.postings(index.vocab["delivery"])
+    assert docs.tolist() == [0, 1, 4]
+    assert weights.shape == docs.shape
+    assert index.doc_len.tolist() == [len(doc) for doc in CORPUS]
+
+
+def _exhaustive(index: BM25Index, query, k: int):
+    scores = index.get_scores(query)
+    ranked = sorted(enumerate(scores), key=lambda pair: (-pair[1], pair[0]))
+    return [(idx, float(score)) for idx, score in ranked[:k]]
+
+
+def test_top_k_matches_exhaustive_ranking() -> None:
+    rng = np.random.default_rng(7)
+    words = [f"w{i}" for i in range(40)]
+    weights = 1.0 / np.arange(1, len(words) + 1)
+    weights /= weights.sum()
+    corpus = [
+        list(rng.choice(words, size=int(rng.integers(3, 30)), p=weights))
+        for _ in range(300)
+    ]
+    index = BM25Index.from_corpus(corpus)
+    for _ in range(50):
+        query = list(rng.choice(words, size=int(rng.integers(1, 8))))
+        for k in (1, 5, 20):
+            assert index.top_k(query, k) == _exhaustive(index, query, k)
+
+
+def test_top_k_pads_with_zero_scores_in_index_order() -> None:
+    index = BM25Index.from_corpus(CORPUS)
+    expected = _exhaustive(index, ["money"], 4)
+    assert index.top_k(["money"], 4) == expected
+    assert [idx for idx, _ in expected] == [3, 0, 1, 2]
+    assert index.top_k(["unknown"], 2) == [(0, 0.0), (1, 0.0)]
+
+
+def test_top_k_breaks_ties_by_index() -> None:
+    corpus = [["a", "x"], ["b", "y"], ["a", "x"], ["a", "x"]]
+    corpus += [["c", f"f{i}"] for i in range(6)]
+    index = BM25Index.from_corpus(corpus)
+    assert [idx for idx, _ in index.top_k(["a"], 2)] == [0, 2]
+
+
+def test_top_k_with_epsilon_floor_falls_back_to_exhaustive() -> None:
+    corpus = [["a", "b"], ["a", "c"], ["a", "b", "d"]]
+    index = BM25Index.from_corpus(corpus)
+    stats: dict = {}
+    assert index.top_k(["a", "d"], 3, stats=stats) == _exhaustive(index, ["a", "d"], 3)
+    assert stats["postings_evaluated"] == stats["postings_total"]
+
+
+def test_top_k_prunes_postings_for_long_queries() -> None:
+    rare = [["rare", "common"] for _ in range(5)]
+    common = [["common", "filler", f"t{i}"] for i in range(2000)]
+    index = BM25Index.from_corpus(rare + common)
+    query = ["rare", "common", "filler"]
+    stats: dict = {}
+    ranked = index.top_k(query, 3, stats=stats)
+    assert ranked == _exhaustive(index, query, 3)
+    assert stats["postings_total"] == 5 + 2005 + 2000
+    assert stats["postings_evaluated"] < stats["postings_total"] / 10
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_top_k_never_evaluates_more_than_exhaustive(seed: int) -> None:
+    rng = np.random.default_rng(seed)
+    words = [f"w{i}" for i in range(int(rng.integers(5, 200)))]
+    weights = 1.0 / np.arange(1, len(words) + 1) ** rng.uniform(0.5, 1.5)
+    weights /= weights.sum()
+    corpus = [
+        list(rng.choice(words, size=int(rng.integers(1, 40)), p=weights))
+        for _ in range(int(rng.integers(50, 1500)))
+    ]
+    index = BM25Index.from_corpus(corpus)
+    for _ in range(30):
+        query = list(rng.choice(words, size=int(rng.integers(1, 10))))
+        for k in (1, 10, 100):
+            stats: dict = {}
+            assert index.top_k(query, k, stats=stats) == _exhaustive(index, query, k)
+            assert stats["postings_evaluated"] <= stats["postings_total"]
+
+
+def test_top_k_batch_matches_top_k() -> None:
+    rng = np.random.default_rng(11)
+    words = [f"w{i}" for i in range(30)]
+    corpus = [list(rng.choice(words, size=int(rng.integers(2, 20)))) for _ in range(200)]
+    corpus += [["a", "b"], ["a", "c"], ["a", "b", "d"]]
+    index = BM25Index.from_corpus(corpus)
+    queries = [list(rng.choice(words, size=int(rng.integers(1, 6)))) for _ in range(20)]
+    queries += [[], ["unknown"], ["w1", "w1", "w2"], ["a", "d"], queries[0]]
+    for k in (1, 5, 50):
+        assert index.top_k_batch(queries, k) == [index.top_k(query, k) for query in queries]
+
+
+def test_search_batch_pads_like_search() -> None:
+    index = BM25Index.from_corpus(CORPUS)
+    queries = ["money", "delivery days", "unknown"]
+    assert index.search_batch(queries, 4) == [index.search(query, 4) for query in queries]
+
+
+def _write_artifact(
+    tmp_path: Path,
+    index: BM25Index,
+    version: int = BM25_INDEX_VERSION,
+    fingerprint: str = "corpus-a",
+) -> None:
+    index.save(tmp_path / BM25_INDEX_DIRNAME, corpus_fingerprint="corpus-a")
+    (tmp_path / "params.json").write_text(
+        json.dumps({"bm25_index_version": version, "corpus_fingerprint": fingerprint}),
+        encoding="utf-8",
+    )
+
+
+def test_saved_index_round_trips(tmp_path: Path) -> None:
+    index = BM25Index.from_corpus(CORPUS, k1=1.2, b=0.5)
+    _write_artifact(tmp_path, index)
+    loaded = load_bm25_index(tmp_path, num_docs=len(CORPUS))
+    assert loaded is not None
+    assert (loaded.k1, loaded.b) == (1.2, 0.5)
+    assert loaded.analyzer.config() == index.analyzer.config()
+    assert loaded.vocab.terms == index.vocab.terms
+    query = ["days", "delivery", "refunds"]
+    assert np.array_equal(loaded.get_scores(query), index.get_scores(query))
+    assert loaded.top_k(query, 3) == index.top_k(query, 3)
+
+
+def test_missing_or_stale_artifact_is_ignored(tmp_path: Path) -> None:
+    assert load_bm25_index(tmp_path, num_docs=len(CORPUS)) is None
+    index = BM25Index.from_corpus(CORPUS)
+    _write_artifact(tmp_path, index)
+    assert load_bm25_index(tmp_path, num_docs=len(CORPUS) + 1) is None
+    _write_artifact(tmp_path, index, version=BM25_INDEX_VERSION + 1)
+    assert load_bm25_index(tmp_path, num_docs=len(CORPUS)) is None
+    _write_artifact(tmp_path, index, fingerprint="corpus-b")
+    assert load_bm25_index(tmp_path, num_docs=len(CORPUS)) is None
@@ -0,0 +1,228 @@
+import hashlib
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from src.rag.build_index import PROGRESS_FILE, build_index, length_buckets
+from src.rag.embedding_cache import EmbeddingCache
+from src.rag.manifest import BuildManifest
+
+
+class _FakeEncoder:
+    """Deterministic per-text vectors; records every text it encodes."""
+
+    def __init__(self) -> None:
+        self.texts: list[str] = []
+
+    def encode(self, texts, normalize_embeddings=True, show_progress_bar=False, **kwargs):
+        self.texts.extend(texts)
+        rows = []
+        for text in texts:
+            seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:4], "little")
+            vector = np.random.default_rng(seed).normal(size=8)
+            rows.append(vector / np.linalg.norm(vector))
+        return np.asarray(rows, dtype=np.float32)
+
+
+def _build(input_dir: Path, output_dir: Path, encoder: _FakeEncoder, **kwargs) -> dict:
+    return build_index(
+        input_dir,
+        output_dir,
+        chunk_size=40,
+        overlap=0,
+        quantize=["int8"],
+        ivf_lists=2,
+        model_factory=lambda name: encoder,
+        **kwargs,
+    )
+
+
+def _artifacts(index_dir: Path) -> dict[str, bytes]:
+    return {
+        str(path.relative_to(index_dir)): path.read_bytes()
+        for path in sorted(index_dir.rglob("*"))
+        if path.is_file()
+    }
+
+
+def test_incremental_build_matches_full_rebuild(tmp_path: Path) -> None:
+    corpus = tmp_path / "corpus"
+    (corpus / "policies").mkdir(parents=True)
+    (corpus / "refund.txt").write_text("Refunds are available within 30 days of delivery. " * 3)
+    (corpus / "shipping.md").write_text("Delivery time is typically 3-5 business days.")
+    (corpus / "policies" / "privacy.txt").write_text("We retain personal data for 90 days.")
+    index_dir = tmp_path / "index"
+    derived = {"pca_dim": 4, "hnsw_m": 4}
+    _build(corpus, index_dir, _FakeEncoder(), **derived)
+
+    (corpus / "shipping.md").write_text("Express delivery arrives the next business day.")
+    (corpus / "policies" / "privacy.txt").unlink()
+    (corpus / "warranty.txt").write_text("Warranty claims are handled for two years.")
+    encoder = _FakeEncoder()
+    stats = _build(corpus, index_dir, encoder, **derived)
+
+    assert stats["reused_files"] == 1
+    assert stats["embedded_files"] == 2
+    assert stats["removed_files"] == 1
+    assert all("Refunds" not in text for text in encoder.texts)
+    assert len(encoder.texts) == stats["embedded_chunks"]
+
+    full_dir = tmp_path / "full"
+    full_stats = _build(corpus, full_dir, _FakeEncoder(), full=True, **derived)
+    assert full_stats["reused_files"] == 0
+    incremental, full = _artifacts(index_dir), _artifacts(full_dir)
+    assert set(incremental) == set(full)
+    # Every artifact kind takes part in the comparison, file by file.
+    for kind in ("bm25/", "chunks/", "embeddings_int8", "hnsw_", "ivf_", "pca_", "params.json"):
+        assert any(name.startswith(kind) for name in full), kind
+    for name in full:
+        assert incremental[name] == full[name], name
+
+
+def test_changed_settings_force_full_rebuild(tmp_path: Path) -> None:
+    corpus = tmp_path / "corpus"
+    corpus.mkdir()
+    (corpus / "refund.txt").write_text("Refunds are available within 30 days of delivery.")
+    index_dir = tmp_path / "index"
+    _build(corpus, index_dir, _FakeEncoder())
+
+    encoder = _FakeEncoder()
+    stats = build_index(
+        corpus, index_dir, chunk_size=20, model_factory=lambda name: encoder
+    )
+    assert stats["reused_files"] == 0
+    assert encoder.texts
+    manifest = BuildManifest.load(index_dir)
+    assert manifest.settings["chunk_size"] == 20
+    assert manifest.num_chunks == stats["num_chunks"]
+
+
+def test_unchanged_corpus_does_not_load_model(tmp_path: Path) -> None:
+    corpus = tmp_path / "corpus"
+    corpus.mkdir()
+    (corpus / "refund.txt").write_text("Refunds are available within 30 days of delivery.")
+    first = tmp_path / "first"
+    _build(corpus, first, _FakeEncoder())
+
+    def fail(name):
+        raise AssertionError("model should not be loaded")
+
+    second = tmp_path / "second"
+    stats = build_index(
+        corpus,
+        second,
+        chunk_size=40,
+        overlap=0,
+        quantize=["int8"],
+        ivf_lists=2,
+        previous_dir=first,
+        model_factory=fail,
+    )
+    assert stats["embedded_files"] == 0
+    assert _artifacts(first) == _artifacts(second)
+
+
+def test_length_buckets_group_similar_lengths() -> None:
+    lengths = [4, 1, 3, 2, 1]
+    assert [batch.tolist() for batch in length_buckets(lengths, 2)] == [[1, 4], [3, 2], [0]]
+
+
+def test_interrupted_build_resumes_from_checkpoint(tmp_path: Path) -> None:
+    corpus = tmp_path / "corpus"
+    corpus.mkdir()
+    for number in range(6):
+        (corpus / f"doc{number}.txt").write_text(f"Document {number} body. " * (number + 1))
+
+    class _Crash(_FakeEncoder):
+        def encode(self, texts, **kwargs):
+            if len(self.texts) >= 4:
+                raise RuntimeError("killed")
+            return super().encode(texts, **kwargs)
+
+    index_dir = tmp_path / "index"
+    crashing = _Crash()
+    with pytest.raises(RuntimeError):
+        _build(corpus, index_dir, crashing, batch_size=2)
+    assert (index_dir / PROGRESS_FILE).exists()
+    assert not (index_dir / "embeddings.npy").exists()
+
+    encoder = _FakeEncoder()
+    stats = _build(corpus, index_dir, encoder, batch_size=2, workers=2)
+    assert len(encoder.texts) == stats["num_chunks"] - 4
+    assert not (index_dir / PROGRESS_FILE).exists()
+
+    full_dir = tmp_path / "full"
+    _build(corpus, full_dir, _FakeEncoder(), batch_size=2)
+    assert _artifacts(index_dir) == _artifacts(full_dir)
+
+
+def test_embedding_cache_is_shared_across_builds(tmp_path: Path) -> None:
+    corpus = tmp_path / "corpus"
+    corpus.mkdir()
+    (corpus / "refund.txt").write_text("Refunds are available within 30 days of delivery.")
+    (corpus / "shipping.md").write_text("Delivery time is typically 3-5 business days.")
+    cache = EmbeddingCache(tmp_path / "cache")
+    _build(corpus, tmp_path / "first", _FakeEncoder(), embedding_cache=cache)
+
+    def fail(name):
+        raise AssertionError("model should not be loaded")
+
+    stats = build_index(
+        corpus,
+        tmp_path / "second",
+        chunk_size=40,
+        quantize=["int8"],
+        ivf_lists=2,
+        full=True,
+        embedding_cache=EmbeddingCache(tmp_path / "cache"),
+        model_factory=fail,
+    )
+    assert stats["embedded_chunks"] == stats["num_chunks"]
+    assert stats["embedding_cache"]["hit_rate"] == 1.0
+    assert _artifacts(tmp_path / "first") == _artifacts(tmp_path / "second")
+
+
+def test_build_interrupted_after_embeddings_is_not_reused(tmp_path: Path, monkeypatch) -> None:
+    corpus = tmp_path / "corpus"
+    corpus.mkdir()
+    (corpus / "a.txt").write_text("Refunds within 30 days.")
+    (corpus / "b.txt").write_text("Delivery time is typically 3-5 business days in total.")
+    index_dir = tmp_path / "index"
+    _build(corpus, index_dir, _FakeEncoder())
+
+    (corpus / "a.txt").unlink()
+    (corpus / "c.txt").write_text("Warranty lasts two years.")
+
+    def crash(*args, **kwargs):
+        raise RuntimeError("killed")
+
+    monkeypatch.setattr("src.rag.build_index.BuildManifest.for_build", crash)
+    with pytest.raises(RuntimeError):
+        _build(corpus, index_dir, _FakeEncoder())
+    monkeypatch.undo()
+
+    stats = _build(corpus, index_dir, _FakeEncoder())
+    assert stats["reused_files"] == 0
+    full_dir = tmp_path / "full"
+    _build(corpus, full_dir, _FakeEncoder(), full=True)
+    assert _artifacts(index_dir) == _artifacts(full_dir)
+
+
+def test_build_interrupted_before_publish_keeps_live_index(tmp_path: Path, monkeypatch) -> None:
+    corpus = tmp_path / "corpus"
+    corpus.mkdir()
+    (corpus / "a.txt").write_text("Refunds within 30 days.")
+    index_dir = tmp_path / "index"
+    _build(corpus, index_dir, _FakeEncoder())
+    before = _artifacts(index_dir)
+
+    (corpus / "b.txt").write_text("Warranty lasts two years.")
+
+    def crash(*args, **kwargs):
+        raise RuntimeError("killed")
+
+    monkeypatch.setattr("src.rag.build_index.BM25Builder.build", crash)
+    with pytest.raises(RuntimeError):
+        _build(corpus, index_dir, _FakeEncoder())
+    assert {name: data for name, data in _artifacts(index_dir).items() if name in before} == before
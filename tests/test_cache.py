@@ -0,0 +1,71 @@
+import threading
+
+from src.app.cache import LRUCache, VersionedCache, normalize_query
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_normalize_query_collapses_whitespace() -> None:
+    assert normalize_query("  refund \n policy\t") == "refund policy"
+
+
+def test_evicts_least_recently_used() -> None:
+    cache = LRUCache(2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert len(cache) == 2
+
+
+def test_entries_expire_after_ttl() -> None:
+    clock = FakeClock()
+    cache = LRUCache(4, ttl_seconds=10.0, clock=clock)
+    cache.put("a", 1)
+    clock.now = 10.0
+    assert cache.get("a") == 1
+    clock.now = 10.5
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_zero_size_disables_cache() -> None:
+    cache = LRUCache(0)
+    cache.put("a", 1)
+    assert cache.get("a") is None
+
+
+def test_concurrent_access_stays_bounded() -> None:
+    cache = LRUCache(8)
+
+    def worker(offset: int) -> None:
+        for idx in range(200):
+            cache.put((offset, idx % 16), idx)
+            cache.get((offset, (idx + 1) % 16))
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(cache) == 8
+
+
+def test_versioned_cache_drops_entries_of_old_version() -> None:
+    cache = VersionedCache(4)
+    cache.put("v1", "refund", 1)
+    assert cache.get("v1", "refund") == 1
+    assert cache.get("v2", "refund") is None
+    cache.put("v2", "shipping", 2)
+    assert cache.get("v1", "refund") is None
+    assert cache.get("v2", "shipping") == 2
+    assert len(cache) == 1
@@ -0,0 +1,114 @@
+from pathlib import Path
+
+import numpy as np
+
+from rag.chunk_store import CHUNK_STORE_DIRNAME, ChunkStore, load_chunk_store
+from src.app.retrieval_service import RetrievalService
+
+CHUNKS = [
+    {
+        "doc_id": "refund_policy",
+        "chunk_id": "refund_policy_0",
+        "text": "Refunds are available within 30 days of delivery.",
+        "start_offset": 0,
+        "end_offset": 50,
+    },
+    {
+        "doc_id": "refund_policy",
+        "chunk_id": "refund_policy_1",
+        "text": "Remboursement accordé — café inclus.",
+        "start_offset": 50,
+        "end_offset": 86,
+    },
+    {
+        "doc_id": "shipping_policy",
+        "chunk_id": "shipping_policy_0",
+        "text": "Delivery time is typically 3-5 business days.",
+        "start_offset": 0,
+        "end_offset": 45,
+    },
+]
+
+
+def test_round_trip_decodes_rows(tmp_path: Path) -> None:
+    ChunkStore.write(tmp_path / CHUNK_STORE_DIRNAME, CHUNKS)
+    store = load_chunk_store(tmp_path)
+    assert store is not None
+    assert len(store) == len(CHUNKS)
+    assert list(store) == CHUNKS
+    assert store.doc_table == ["refund_policy", "shipping_policy"]
+    assert isinstance(store.text_pool, np.memmap)
+
+
+def test_empty_store(tmp_path: Path) -> None:
+    ChunkStore.write(tmp_path / CHUNK_STORE_DIRNAME, [])
+    store = load_chunk_store(tmp_path)
+    assert store is not None
+    assert len(store) == 0
+
+
+def test_missing_store_returns_none(tmp_path: Path) -> None:
+    assert load_chunk_store(tmp_path) is None
+
+
+def test_service_uses_mapped_columns(tmp_path: Path) -> None:
+    ChunkStore.write(tmp_path / CHUNK_STORE_DIRNAME, CHUNKS)
+    np.save(tmp_path / "embeddings.npy", np.eye(3, 4, dtype=np.float32))
+    service = RetrievalService(
+        tmp_path,
+        api_version="test",
+        max_top_k=5,
+        snippet_chars=20,
+        default_mode="bm25",
+    )
+    assert isinstance(service.embeddings, np.memmap)
+    citations = service.retrieve("delivery time", "bm25", 1)
+    assert citations[0]["chunk_id"] == "shipping_policy_0"
+    assert citations[0]["snippet"] == "Delivery time is typ"
+
+
+def test_snippets_precomputed_at_build_time(tmp_path: Path) -> None:
+    ChunkStore.write(tmp_path / CHUNK_STORE_DIRNAME, CHUNKS, snippet_chars=12)
+    store = load_chunk_store(tmp_path, snippet_chars=12)
+    assert store is not None
+    assert isinstance(store.snippet_pool, np.memmap)
+    assert store.snippet(0) == "Refunds are "
+
+
+def test_snippets_recomputed_for_other_length(tmp_path: Path) -> None:
+    ChunkStore.write(tmp_path / CHUNK_STORE_DIRNAME, CHUNKS, snippet_chars=12)
+    store = load_chunk_store(tmp_path, snippet_chars=7)
+    assert store is not None
+    assert store.snippet_chars == 7
+    assert [store.snippet(idx) for idx in range(len(store))] == [
+        " ".join(chunk["text"].split())[:7] for chunk in CHUNKS
+    ]
+
+
+def test_from_chunks_normalizes_whitespace_in_snippets() -> None:
+    chunk = dict(CHUNKS[0], text="Refunds\n\n  are   available")
+    store = ChunkStore.from_chunks([chunk], snippet_chars=50)
+    assert store.snippet(0) == "Refunds are available"
+    assert store.text(0) == "Refunds\n\n  are   available"
+
+
+def test_rebuild_in_place_leaves_open_store_readable(tmp_path: Path) -> None:
+    ChunkStore.write(tmp_path / CHUNK_STORE_DIRNAME, CHUNKS)
+    store = load_chunk_store(tmp_path)
+
+    # A smaller rebuild would truncate the mapped files if written in place.
+    ChunkStore.write(tmp_path / CHUNK_STORE_DIRNAME, CHUNKS[:1])
+
+    assert list(store) == CHUNKS
+    assert list(load_chunk_store(tmp_path)) == CHUNKS[:1]
+    assert not list((tmp_path / CHUNK_STORE_DIRNAME).glob(".*.tmp"))
+
+
+def test_streaming_writer_matches_in_memory_save(tmp_path: Path) -> None:
+    ChunkStore.from_chunks(CHUNKS, snippet_chars=12).save(tmp_path / "saved")
+    ChunkStore.write(tmp_path / "streamed", iter(CHUNKS), snippet_chars=12)
+    for saved in sorted((tmp_path / "saved").iterdir()):
+        assert (tmp_path / "streamed" / saved.name).read_bytes() == saved.read_bytes()
+    assert sorted(path.name for path in (tmp_path / "streamed").iterdir()) == sorted(
+        path.name for path in (tmp_path / "saved").iterdir()
+    )
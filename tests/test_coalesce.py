@@ -0,0 +1,60 @@
+import asyncio
+
+import pytest
+
+from src.app.coalesce import SingleFlight
+
+
+def test_concurrent_identical_calls_share_one_computation() -> None:
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return ["refund_policy_0"]
+
+    async def main():
+        flights = SingleFlight()
+        started = [flights.start("refund", work) for _ in range(5)]
+        assert [shared for _, shared in started] == [False, True, True, True, True]
+        results = await asyncio.gather(*(call for call, _ in started))
+        assert len(flights) == 0
+        return results
+
+    results = asyncio.run(main())
+    assert calls == [1]
+    assert results == [["refund_policy_0"]] * 5
+
+
+def test_errors_reach_every_waiter_and_key_is_released() -> None:
+    async def fail():
+        await asyncio.sleep(0)
+        raise ValueError("boom")
+
+    async def main():
+        flights = SingleFlight()
+        first, _ = flights.start("q", fail)
+        second, shared = flights.start("q", fail)
+        assert shared
+        outcomes = await asyncio.gather(first, second, return_exceptions=True)
+        assert all(isinstance(outcome, ValueError) for outcome in outcomes)
+        _, shared = flights.start("q", lambda: asyncio.sleep(0))
+        assert not shared
+
+    asyncio.run(main())
+
+
+def test_waiter_timeout_does_not_cancel_shared_call() -> None:
+    async def slow():
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def main():
+        flights = SingleFlight()
+        impatient, _ = flights.start("q", slow)
+        patient, _ = flights.start("q", slow)
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(impatient, timeout=0.001)
+        return await asyncio.wait_for(patient, timeout=1.0)
+
+    assert asyncio.run(main()) == "done"
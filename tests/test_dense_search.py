@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from rag.dense_search import ExactDenseSearcher
+
+
+def _legacy(embeddings: np.ndarray, query: np.ndarray, k: int) -> list[tuple[int, float]]:
+    scores = np.dot(query.reshape(1, -1), embeddings.T)[0]
+    ranked = sorted(enumerate(scores), key=lambda pair: (-pair[1], pair[0]))
+    return [(idx, float(score)) for idx, score in ranked[:k]]
+
+
+@pytest.mark.parametrize("tile_rows,max_workers", [(256, 1), (256, 3), (300, 2), (4096, 4)])
+def test_matches_full_sort_including_ties(tile_rows: int, max_workers: int) -> None:
+    rng = np.random.default_rng(0)
+    base = rng.standard_normal((40, 8)).astype(np.float32)
+    # Every vector appears several times at scattered rows, so ties span tiles.
+    embeddings = base[rng.integers(0, len(base), 1300)]
+    searcher = ExactDenseSearcher(embeddings, tile_rows=tile_rows, max_workers=max_workers)
+    try:
+        for query in rng.standard_normal((10, 8)).astype(np.float32):
+            for k in (1, 5, 20, 1300, 2000):
+                assert searcher.search(query, k) == _legacy(embeddings, query, k)
+    finally:
+        searcher.close()
+
+
+def test_all_equal_scores_rank_by_index() -> None:
+    embeddings = np.ones((600, 4), dtype=np.float32)
+    searcher = ExactDenseSearcher(embeddings, tile_rows=1, max_workers=2)
+    assert searcher.tile_rows == 256
+    ranked = searcher.search(np.ones(4, dtype=np.float32), 6)
+    assert [idx for idx, _ in ranked] == [0, 1, 2, 3, 4, 5]
+    searcher.close()
+
+
+def test_empty_and_invalid() -> None:
+    searcher = ExactDenseSearcher(np.empty((0, 4), dtype=np.float32))
+    assert searcher.search(np.ones(4, dtype=np.float32), 3) == []
+    with pytest.raises(ValueError):
+        ExactDenseSearcher(np.ones((2, 2), dtype=np.float32), tile_rows=0)
+
+
+@pytest.mark.parametrize("tile_rows,max_workers", [(256, 1), (256, 3)])
+def test_search_batch_matches_single_queries(tile_rows: int, max_workers: int) -> None:
+    rng = np.random.default_rng(1)
+    embeddings = rng.standard_normal((900, 16)).astype(np.float32)
+    queries = rng.standard_normal((6, 16)).astype(np.float32)
+    searcher = ExactDenseSearcher(embeddings, tile_rows=tile_rows, max_workers=max_workers)
+    try:
+        batched = searcher.search_batch(queries, 10)
+        assert len(batched) == len(queries)
+        for query, ranked in zip(queries, batched):
+            single = searcher.search(query, 10)
+            assert [idx for idx, _ in ranked] == [idx for idx, _ in single]
+            assert np.allclose([s for _, s in ranked], [s for _, s in single], atol=1e-5)
+        assert searcher.search_batch(np.empty((0, 16), dtype=np.float32), 3) == []
+    finally:
+        searcher.close()
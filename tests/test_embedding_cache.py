@@ -0,0 +1,144 @@
+import os
+from pathlib import Path
+
+import numpy as np
+
+from src.rag.embedding_cache import CachedEncoder, EmbeddingCache, embedding_key
+
+
+class _CountingModel:
+    def __init__(self) -> None:
+        self.calls: list[list[str]] = []
+
+    def encode(self, texts, normalize_embeddings=True, **kwargs):
+        self.calls.append(list(texts))
+        return np.asarray([[len(text), 1.0] for text in texts], dtype=np.float32)
+
+
+def test_put_get_roundtrip_survives_reopen(tmp_path: Path) -> None:
+    cache = EmbeddingCache(tmp_path)
+    keys = [embedding_key("m", "a"), embedding_key("m", "b")]
+    cache.put(keys, np.asarray([[1.0, 2.0], [3.0, 4.0]], dtype=np.float32))
+    cache.save()
+
+    reopened = EmbeddingCache(tmp_path)
+    found = reopened.get([keys[1], embedding_key("m", "c"), keys[0]])
+    np.testing.assert_array_equal(found[0], [3.0, 4.0])
+    assert found[1] is None
+    np.testing.assert_array_equal(found[2], [1.0, 2.0])
+    assert reopened.report()["hit_rate"] == 2 / 3
+
+
+def test_orphaned_shards_are_collected_only_once_stale(tmp_path: Path) -> None:
+    cache = EmbeddingCache(tmp_path)
+    cache.put([embedding_key("m", "a")], np.ones((1, 2), dtype=np.float32))
+    (orphan,) = tmp_path.glob("shard-*.npy")
+    EmbeddingCache(tmp_path).save()
+
+    # Possibly another writer's unsaved shard: kept.
+    EmbeddingCache(tmp_path)
+    assert orphan.exists()
+
+    os.utime(orphan, (0, 0))
+    reopened = EmbeddingCache(tmp_path)
+    assert reopened.get([embedding_key("m", "a")]) == [None]
+    assert not orphan.exists()
+
+
+def test_writers_sharing_a_directory_keep_each_others_shards(tmp_path: Path) -> None:
+    first, second = EmbeddingCache(tmp_path), EmbeddingCache(tmp_path)
+    key_a, key_b = embedding_key("m", "a"), embedding_key("m", "b")
+    first.put([key_a], np.ones((1, 2), dtype=np.float32))
+    second.put([key_b], np.zeros((1, 2), dtype=np.float32))
+    first.save()
+    EmbeddingCache(tmp_path)
+    second.save()
+
+    assert len(list(tmp_path.glob("shard-*.npy"))) == 2
+    np.testing.assert_array_equal(first.get([key_a])[0], [1.0, 1.0])
+    np.testing.assert_array_equal(EmbeddingCache(tmp_path).get([key_b])[0], [0.0, 0.0])
+
+
+def test_missing_or_corrupt_shards_are_misses(tmp_path: Path) -> None:
+    cache = EmbeddingCache(tmp_path)
+    keys = [embedding_key("m", text) for text in "abc"]
+    cache.put(keys[:1], np.ones((1, 2), dtype=np.float32))
+    cache.put(keys[1:2], np.ones((1, 2), dtype=np.float32))
+    cache.put(keys[2:], np.ones((1, 2), dtype=np.float32))
+    missing, corrupt, intact = (cache.entries[key][0] for key in keys)
+    (tmp_path / missing).unlink()
+    (tmp_path / corrupt).write_bytes(b"not a shard")
+
+    found = cache.get(keys)
+    assert found[0] is None and found[1] is None and found[2] is not None
+    assert (cache.stats["hits"], cache.stats["misses"]) == (1, 2)
+    assert cache.nbytes == 8 and list(cache.shards) == [intact]
+
+
+def test_size_cap_evicts_least_recently_used(tmp_path: Path) -> None:
+    cache = EmbeddingCache(tmp_path, max_bytes=2 * 8)
+    first, second, third = (embedding_key("m", text) for text in "abc")
+    cache.put([first], np.zeros((1, 2), dtype=np.float32))
+    cache.put([second], np.ones((1, 2), dtype=np.float32))
+    cache.get([first])
+    cache.put([third], np.full((1, 2), 2.0, dtype=np.float32))
+
+    assert cache.nbytes == 16
+    assert cache.get([second]) == [None]
+    assert cache.get([first])[0] is not None and cache.get([third])[0] is not None
+    assert len(list(tmp_path.glob("shard-*.npy"))) == 3
+    cache.save()
+    assert len(list(tmp_path.glob("shard-*.npy"))) == 2
+
+
+def test_cached_encoder_only_encodes_misses(tmp_path: Path) -> None:
+    cache = EmbeddingCache(tmp_path)
+    model = _CountingModel()
+    loads = []
+    encoder = CachedEncoder(cache, "m", lambda: loads.append(1) or model)
+
+    first = encoder.encode(["aa", "bbb"], normalize_embeddings=True, batch_size=64)
+    second = encoder.encode(["bbb", "c"], normalize_embeddings=True, batch_size=64)
+
+    assert model.calls == [["aa", "bbb"], ["c"]]
+    assert loads == [1]
+    np.testing.assert_array_equal(second[0], first[1])
+    report = cache.report()
+    assert (report["hits"], report["misses"]) == (1, 3)
+    assert report["time_saved_seconds"] >= 0.0
+
+    untouched = CachedEncoder(cache, "m", lambda: 1 / 0)
+    assert untouched.encode(["c"], normalize_embeddings=True).shape == (1, 2)
+
+
+def _fill_past_cap(root: Path) -> tuple[EmbeddingCache, list[str], np.ndarray]:
+    keys = [embedding_key("m", f"k{number}") for number in range(5)]
+    vectors = np.arange(10, dtype=np.float32).reshape(5, 2)
+    cache = EmbeddingCache(root, max_bytes=3 * 8)
+    cache.put(keys[:3], vectors[:3])
+    cache.save()
+    cache.get(keys[:1])
+    cache.put(keys[3:], vectors[3:])
+    return cache, keys, vectors
+
+
+def test_eviction_without_save_leaves_saved_index_intact(tmp_path: Path) -> None:
+    _, keys, vectors = _fill_past_cap(tmp_path)
+
+    reopened = EmbeddingCache(tmp_path)
+    found = reopened.get(keys)
+    for number in range(3):
+        np.testing.assert_array_equal(found[number], vectors[number])
+    assert found[3] is None and found[4] is None
+
+
+def test_eviction_is_applied_on_save(tmp_path: Path) -> None:
+    cache, keys, vectors = _fill_past_cap(tmp_path)
+    cache.save()
+
+    reopened = EmbeddingCache(tmp_path)
+    found = reopened.get(keys)
+    assert found[1] is None and found[2] is None
+    for number in (0, 3, 4):
+        np.testing.assert_array_equal(found[number], vectors[number])
+    assert len(list(tmp_path.glob("shard-*.npy"))) == len(reopened.shards)
@@ -0,0 +1,108 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from src.app.encoder_pool import EncoderPool
+
+
+class FakeModel:
+    def __init__(self, name: str):
+        self.name = name
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return 3
+
+    def encode(self, texts, normalize_embeddings=True, show_progress_bar=False):
+        if "fail" in texts:
+            raise ValueError("cannot encode")
+        vectors = np.array([[len(text), 1.0, 0.0] for text in texts], dtype=np.float32)
+        if normalize_embeddings:
+            vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors
+
+
+@pytest.fixture(scope="module")
+def pool():
+    pool = EncoderPool("fake", workers=2, max_rows=4, model_factory=FakeModel)
+    yield pool
+    pool.close()
+
+
+def test_matches_in_process_encoding(pool) -> None:
+    texts = [f"query {'x' * n}" for n in range(10)]
+    expected = FakeModel("fake").encode(texts)
+    actual = pool.encode(texts, normalize_embeddings=True)
+    assert pool.dim == 3
+    assert actual.dtype == np.float32
+    assert np.array_equal(actual, expected)
+    raw = pool.encode(["ab"], normalize_embeddings=False)
+    assert raw.tolist() == [[2.0, 1.0, 0.0]]
+    assert pool.encode([]).shape == (0, 3)
+
+
+def test_concurrent_callers_get_their_own_rows(pool) -> None:
+    texts = [["a" * n] for n in range(1, 30)]
+    with ThreadPoolExecutor(max_workers=6) as executor:
+        results = list(executor.map(pool.encode, texts))
+    for text, result in zip(texts, results):
+        assert np.array_equal(result, FakeModel("fake").encode(text))
+
+
+def test_worker_errors_are_raised_and_worker_keeps_serving(pool) -> None:
+    with pytest.raises(RuntimeError, match="cannot encode"):
+        pool.encode(["fail"])
+    assert pool.encode(["ok"]).shape == (1, 3)
+
+
+class _FailsOnceMarked(FakeModel):
+    """Refuses to load once the file named by the model name exists."""
+
+    def __init__(self, name: str):
+        if os.path.exists(name):
+            raise RuntimeError("model unavailable")
+        super().__init__(name)
+
+
+def _kill_only_worker(pool: EncoderPool) -> None:
+    process = pool._workers[0].process
+    process.kill()
+    process.join()
+
+
+def test_dead_worker_is_replaced() -> None:
+    pool = EncoderPool("fake", workers=1, max_rows=4, model_factory=FakeModel)
+    try:
+        _kill_only_worker(pool)
+        with pytest.raises(RuntimeError, match="exited"):
+            pool.encode(["first"])
+        assert pool.encode(["again"]).shape == (1, 3)
+        assert len(pool._workers) == 1
+    finally:
+        pool.close()
+
+
+def test_fails_fast_when_no_worker_can_be_restarted(tmp_path) -> None:
+    marker = str(tmp_path / "marker")
+    pool = EncoderPool(marker, workers=1, max_rows=4, model_factory=_FailsOnceMarked)
+    try:
+        open(marker, "w").close()
+        _kill_only_worker(pool)
+        with pytest.raises(RuntimeError, match="exited"):
+            pool.encode(["first"])
+        with pytest.raises(RuntimeError, match="no encoder workers left"):
+            pool.encode(["again"])
+    finally:
+        pool.close()
+
+
+def test_closed_pool_rejects_calls_and_replaces_nothing() -> None:
+    pool = EncoderPool("fake", workers=1, max_rows=4, model_factory=FakeModel)
+    worker = pool._workers[0]
+    pool.close()
+    pool._replace(worker)
+    assert pool._workers == []
+    with pytest.raises(RuntimeError, match="closed"):
+        pool.encode(["after close"])
+    pool.close()
@@ -0,0 +1,25 @@
+import pytest
+
+from rag.fusion import reciprocal_rank_fusion
+
+
+def test_documents_in_both_lists_rank_first() -> None:
+    bm25 = [(3, 12.0), (1, 8.0), (7, 2.0)]
+    dense = [(1, 0.9), (5, 0.8), (3, 0.1)]
+    fused = reciprocal_rank_fusion([bm25, dense], 4, rrf_k=60)
+    assert [idx for idx, _ in fused] == [1, 3, 5, 7]
+    assert fused[0][1] == pytest.approx(1 / 62 + 1 / 61)
+    assert fused[2][1] == pytest.approx(1 / 62)
+
+
+def test_ties_break_by_index_and_single_list_keeps_order() -> None:
+    fused = reciprocal_rank_fusion([[(4, 1.0)], [(2, 1.0)]], 2)
+    assert [idx for idx, _ in fused] == [2, 4]
+    ranked = [(9, 3.0), (0, 2.0), (5, 1.0)]
+    assert [idx for idx, _ in reciprocal_rank_fusion([ranked], 2)] == [9, 0]
+
+
+def test_empty_inputs() -> None:
+    assert reciprocal_rank_fusion([], 3) == []
+    assert reciprocal_rank_fusion([[], []], 3) == []
+    assert reciprocal_rank_fusion([[(1, 1.0)]], 0) == []
@@ -0,0 +1,84 @@
+import json
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from rag.hnsw import HNSWIndex
+
+
+def _clustered(rows: int = 300, dim: int = 16, clusters: int = 8, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim))
+    vectors = centers[rng.integers(0, clusters, rows)] + 0.3 * rng.standard_normal((rows, dim))
+    vectors = vectors.astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def _exact(embeddings: np.ndarray, query: np.ndarray, k: int) -> list[int]:
+    scores = embeddings @ query
+    return np.lexsort((np.arange(len(scores)), -scores))[:k].tolist()
+
+
+def test_build_is_deterministic_for_seed() -> None:
+    vectors = _clustered()
+    first = HNSWIndex.build(vectors, m=6, seed=4)
+    second = HNSWIndex.build(vectors.copy(), m=6, seed=4)
+    assert np.array_equal(first.levels, second.levels)
+    assert np.array_equal(first.graph0, second.graph0)
+    assert np.array_equal(first.upper, second.upper)
+    other = HNSWIndex.build(vectors, m=6, seed=5)
+    assert not np.array_equal(first.levels, other.levels)
+    with pytest.raises(ValueError):
+        HNSWIndex.build(vectors, m=1)
+
+
+def test_flat_layout() -> None:
+    vectors = _clustered()
+    index = HNSWIndex.build(vectors, m=6)
+    assert index.graph0.shape == (len(vectors), 12)
+    assert index.graph0.dtype == np.int32
+    assert len(index.upper) == int(index.levels.astype(np.int64).sum()) * 6
+    assert index.levels[index.entry_point] == index.levels.max()
+    for node in range(len(vectors)):
+        links = index.neighbours(node, 0)
+        assert links and node not in links
+        assert all(0 <= other < len(vectors) for other in links)
+
+
+def test_search_recall_and_ranking() -> None:
+    vectors = _clustered()
+    index = HNSWIndex.build(vectors, m=8, ef_search=64)
+    recall = []
+    for query in _clustered(20, seed=9):
+        ranked = index.search(query, 10)
+        scores = [score for _, score in ranked]
+        assert scores == sorted(scores, reverse=True)
+        recall.append(len({idx for idx, _ in ranked} & set(_exact(vectors, query, 10))) / 10)
+    assert np.mean(recall) >= 0.95
+    assert index.search(vectors[17], 1)[0][0] == 17
+
+
+def test_load_requires_matching_params(tmp_path: Path) -> None:
+    vectors = _clustered()
+    HNSWIndex.build(vectors, m=6).save(tmp_path)
+    assert HNSWIndex.load(tmp_path, vectors) is None
+    (tmp_path / "params.json").write_text(json.dumps({"hnsw_m": 6}), encoding="utf-8")
+    loaded = HNSWIndex.load(tmp_path, vectors, ef_search=32)
+    assert loaded is not None
+    assert loaded.ef_search == 32
+    assert isinstance(loaded.graph0, np.memmap)
+    assert loaded.search(vectors[3], 1)[0][0] == 3
+    assert HNSWIndex.load(tmp_path, vectors[:-1]) is None
+    (tmp_path / "params.json").write_text(json.dumps({"hnsw_m": 8}), encoding="utf-8")
+    assert HNSWIndex.load(tmp_path, vectors) is None
+
+
+def test_load_rejects_graph_built_in_another_dimension(tmp_path: Path) -> None:
+    reduced = _clustered(dim=8)
+    HNSWIndex.build(reduced, m=6).save(tmp_path)
+    (tmp_path / "params.json").write_text(
+        json.dumps({"hnsw_m": 6, "search_dim": 8}), encoding="utf-8"
+    )
+    assert HNSWIndex.load(tmp_path, reduced) is not None
+    assert HNSWIndex.load(tmp_path, _clustered(dim=16)) is None
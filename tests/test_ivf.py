@@ -0,0 +1,78 @@
+import json
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from rag.ivf import IVFIndex, train_kmeans
+
+
+def _clustered(rows: int = 400, dim: int = 16, clusters: int = 8, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim))
+    vectors = centers[rng.integers(0, clusters, rows)] + 0.3 * rng.standard_normal((rows, dim))
+    vectors = vectors.astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def _exact(embeddings: np.ndarray, query: np.ndarray, k: int) -> list[int]:
+    scores = embeddings @ query
+    return np.lexsort((np.arange(len(scores)), -scores))[:k].tolist()
+
+
+def test_train_kmeans_is_deterministic_and_normalized() -> None:
+    vectors = _clustered()
+    first = train_kmeans(vectors, 8, seed=3)
+    second = train_kmeans(vectors.copy(), 8, seed=3)
+    assert first.shape == (8, 16)
+    assert np.array_equal(first, second)
+    assert np.allclose(np.linalg.norm(first, axis=1), 1.0, atol=1e-5)
+    with pytest.raises(ValueError):
+        train_kmeans(vectors, 0)
+
+
+def test_lists_partition_all_rows() -> None:
+    vectors = _clustered()
+    index = IVFIndex.build(vectors, 8)
+    assert index.list_offsets[0] == 0
+    assert index.list_offsets[-1] == len(vectors)
+    assert np.array_equal(np.sort(index.list_ids), np.arange(len(vectors)))
+    for lst in range(index.n_lists):
+        ids = index.list_ids[index.list_offsets[lst] : index.list_offsets[lst + 1]]
+        assert np.all(np.diff(ids) > 0)
+
+
+def test_probing_all_lists_matches_exact_scan() -> None:
+    vectors = _clustered()
+    index = IVFIndex.build(vectors, 8)
+    for query in _clustered(5, seed=9):
+        ranked = index.search(query, 10, nprobe=index.n_lists)
+        assert [idx for idx, _ in ranked] == _exact(vectors, query, 10)
+
+
+def test_few_probes_keep_high_recall() -> None:
+    vectors = _clustered()
+    index = IVFIndex.build(vectors, 8, nprobe=2)
+    queries = _clustered(20, seed=11)
+    recall = np.mean(
+        [
+            len({idx for idx, _ in index.search(query, 10)} & set(_exact(vectors, query, 10))) / 10
+            for query in queries
+        ]
+    )
+    assert recall >= 0.9
+    assert len(index.candidates(queries[0])) < len(vectors)
+
+
+def test_load_requires_matching_params(tmp_path: Path) -> None:
+    vectors = _clustered()
+    IVFIndex.build(vectors, 8).save(tmp_path)
+    assert IVFIndex.load(tmp_path, vectors) is None
+    (tmp_path / "params.json").write_text(json.dumps({"ivf_lists": 8}), encoding="utf-8")
+    loaded = IVFIndex.load(tmp_path, vectors, nprobe=3)
+    assert loaded is not None
+    assert loaded.nprobe == 3
+    assert isinstance(loaded.list_ids, np.memmap)
+    query = vectors[5]
+    assert loaded.search(query, 1)[0][0] == 5
+    assert IVFIndex.load(tmp_path, vectors[:-1]) is None
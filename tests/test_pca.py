@@ -0,0 +1,59 @@
+import json
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from rag.pca import PCAProjection, load_pca, write_pca
+
+
+def _embeddings(rows: int = 100, dim: int = 16) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    # Most variance in the first 4 directions.
+    scales = np.array([5.0, 4.0, 3.0, 2.0] + [0.1] * (dim - 4))
+    vectors = (rng.standard_normal((rows, dim)) * scales).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def test_fit_rejects_bad_dim() -> None:
+    with pytest.raises(ValueError):
+        PCAProjection.fit(_embeddings(), 0)
+    with pytest.raises(ValueError):
+        PCAProjection.fit(_embeddings(), 17)
+
+
+def test_projection_is_normalized_and_reproducible() -> None:
+    embeddings = _embeddings()
+    first = PCAProjection.fit(embeddings, 4)
+    second = PCAProjection.fit(embeddings.copy(), 4)
+    reduced = first.project(embeddings)
+    assert reduced.shape == (100, 4)
+    assert reduced.dtype == np.float32
+    assert np.allclose(np.linalg.norm(reduced, axis=1), 1.0, atol=1e-5)
+    assert np.array_equal(first.components, second.components)
+
+
+def test_reduced_space_keeps_nearest_neighbours() -> None:
+    embeddings = _embeddings()
+    projection = PCAProjection.fit(embeddings, 4)
+    reduced = projection.project(embeddings)
+    query = embeddings[7]
+    full_top = np.argsort(-(embeddings @ query))[:5]
+    reduced_top = np.argsort(-(reduced @ projection.project(query)))[:5]
+    assert full_top[0] == reduced_top[0] == 7
+    assert len(set(full_top) & set(reduced_top)) >= 3
+
+
+def test_load_requires_matching_params(tmp_path: Path) -> None:
+    embeddings = _embeddings()
+    write_pca(tmp_path, embeddings, 4)
+    assert load_pca(tmp_path, len(embeddings)) is None
+    (tmp_path / "params.json").write_text(json.dumps({"pca_dim": 4}), encoding="utf-8")
+    loaded = load_pca(tmp_path, len(embeddings))
+    assert loaded is not None
+    projection, reduced = loaded
+    assert projection.dim == 4
+    assert isinstance(reduced, np.memmap)
+    assert load_pca(tmp_path, len(embeddings) + 1) is None
+    (tmp_path / "params.json").write_text(json.dumps({"pca_dim": None}), encoding="utf-8")
+    assert load_pca(tmp_path, len(embeddings)) is None
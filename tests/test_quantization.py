@@ -0,0 +1,166 @@
+import json
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from rag.quantization import (
+    QuantizedSearcher,
+    quantize_binary,
+    quantize_int8,
+    recall_vs_exact,
+    write_quantized,
+)
+
+
+def _normalized(rows: int, dim: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((rows, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def _exact(embeddings: np.ndarray, query: np.ndarray, k: int):
+    scores = embeddings @ query
+    ranked = sorted(enumerate(scores), key=lambda pair: (-pair[1], pair[0]))
+    return [idx for idx, _ in ranked[:k]]
+
+
+def _write(tmp_path: Path, embeddings: np.ndarray, modes: list) -> None:
+    write_quantized(tmp_path, embeddings, modes)
+    (tmp_path / "params.json").write_text(json.dumps({"quantization": modes}), encoding="utf-8")
+
+
+def test_int8_codes_reconstruct_within_half_step() -> None:
+    embeddings = _normalized(50, 16)
+    codes, scales = quantize_int8(embeddings)
+    assert codes.dtype == np.int8
+    assert scales.shape == (16,)
+    assert np.all(np.abs(codes * scales - embeddings) <= scales / 2 + 1e-6)
+
+
+def test_binary_codes_pack_signs() -> None:
+    embeddings = np.array([[0.5, -0.1, 0.2, -0.3, 0.0, 0.1, 0.1, -0.1, 0.9]])
+    codes = quantize_binary(embeddings)
+    assert codes.shape == (1, 2)
+    assert codes.tolist() == [[0b10100110, 0b10000000]]
+
+
+def test_unknown_mode_rejected() -> None:
+    with pytest.raises(ValueError):
+        QuantizedSearcher("pq", _normalized(4, 8))
+
+
+@pytest.mark.parametrize("mode", ["int8", "binary"])
+def test_full_depth_rescoring_matches_exact(tmp_path: Path, mode: str) -> None:
+    embeddings = _normalized(200, 32)
+    _write(tmp_path, embeddings, [mode])
+    searcher = QuantizedSearcher.load(tmp_path, mode, embeddings, rescore_candidates=200)
+    assert searcher is not None
+    query = _normalized(1, 32, seed=1)[0]
+    assert [idx for idx, _ in searcher.search(query, 10)] == _exact(embeddings, query, 10)
+
+
+def test_load_returns_none_when_missing_or_stale(tmp_path: Path) -> None:
+    embeddings = _normalized(20, 8)
+    assert QuantizedSearcher.load(tmp_path, "int8", embeddings) is None
+    _write(tmp_path, embeddings, ["int8"])
+    assert QuantizedSearcher.load(tmp_path, "int8", embeddings[:10]) is None
+    _write(tmp_path, embeddings, [])
+    assert QuantizedSearcher.load(tmp_path, "int8", embeddings) is None
+
+
+@pytest.mark.parametrize("mode", ["int8", "binary"])
+def test_load_rejects_codes_built_in_another_dimension(tmp_path: Path, mode: str) -> None:
+    full = _normalized(20, 32)
+    reduced = _normalized(20, 4)
+    _write(tmp_path, reduced, [mode])
+    assert QuantizedSearcher.load(tmp_path, mode, full) is None
+    assert QuantizedSearcher.load(tmp_path, mode, reduced) is not None
+
+    # Binary codes of 12 and 16 dims have the same packed width; search_dim tells them apart.
+    write_quantized(tmp_path, _normalized(20, 12), [mode])
+    (tmp_path / "params.json").write_text(
+        json.dumps({"quantization": [mode], "search_dim": 12}), encoding="utf-8"
+    )
+    assert QuantizedSearcher.load(tmp_path, mode, _normalized(20, 16)) is None
+
+
+def test_int8_first_pass_matches_dequantized_scores_across_tiles(monkeypatch) -> None:
+    monkeypatch.setattr("rag.quantization._INT8_TILE_BYTES", 7 * 4 * 16)
+    embeddings = _normalized(30, 16)
+    codes, scales = quantize_int8(embeddings)
+    searcher = QuantizedSearcher("int8", embeddings, int8_codes=codes, int8_scales=scales)
+    query = _normalized(1, 16, seed=2)[0]
+    expected = (codes * scales).astype(np.float32) @ query
+    np.testing.assert_allclose(searcher.first_pass(query), expected, rtol=1e-5, atol=1e-6)
+
+
+def test_int8_first_pass_does_not_materialize_float32_codes() -> None:
+    embeddings = _normalized(20000, 64)
+    codes, scales = quantize_int8(embeddings)
+    searcher = QuantizedSearcher("int8", embeddings, int8_codes=codes, int8_scales=scales)
+    query = _normalized(1, 64, seed=2)[0]
+    tracemalloc.start()
+    try:
+        searcher.first_pass(query)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    # Scores plus one cache-sized tile; a float32 copy of the codes would be 5 MB.
+    assert peak < 4 * len(codes) + (2 << 20)
+
+
+def test_int8_rescoring_recall_is_high() -> None:
+    embeddings = _normalized(1000, 64)
+    codes, scales = quantize_int8(embeddings)
+    searcher = QuantizedSearcher(
+        "int8", embeddings, int8_codes=codes, int8_scales=scales, rescore_candidates=50
+    )
+    first, rescored = recall_vs_exact(searcher, _normalized(20, 64, seed=3), k=10)
+    assert rescored >= first
+    assert rescored >= 0.95
+
+
+class _QueryModel:
+    def __init__(self, vector: np.ndarray):
+        self.vector = vector
+
+    def encode(self, texts, normalize_embeddings: bool = True, show_progress_bar: bool = False):
+        return np.vstack([self.vector for _ in texts])
+
+
+def test_service_dense_search_uses_quantized_artifacts(tmp_path: Path) -> None:
+    from rag.chunk_store import CHUNK_STORE_DIRNAME, ChunkStore
+    from src.app.retrieval_service import RetrievalService
+
+    embeddings = _normalized(30, 16)
+    chunks = [
+        {
+            "doc_id": f"doc-{idx}",
+            "chunk_id": f"doc-{idx}_0",
+            "text": f"chunk {idx}",
+            "start_offset": 0,
+            "end_offset": 7,
+        }
+        for idx in range(30)
+    ]
+    ChunkStore.write(tmp_path / CHUNK_STORE_DIRNAME, chunks)
+    np.save(tmp_path / "embeddings.npy", embeddings)
+    _write(tmp_path, embeddings, ["int8"])
+    service = RetrievalService(
+        tmp_path,
+        api_version="test",
+        max_top_k=5,
+        snippet_chars=20,
+        default_mode="dense",
+        dense_search="int8",
+        rescore_candidates=30,
+    )
+    assert service.dense_searcher is not None
+    assert service.dense_searcher.mode == "int8"
+    query = _normalized(1, 16, seed=5)[0]
+    service._dense_model = _QueryModel(query)
+    citations = service.retrieve("anything", "dense", 3)
+    expected = _exact(embeddings, query, 3)
+    assert [c["chunk_id"] for c in citations] == [f"doc-{idx}_0" for idx in expected]
@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+from rag.ranking import top_k, top_k_batch, top_k_indices
+
+
+def _reference(scores: np.ndarray, k: int) -> list[tuple[int, float]]:
+    order = sorted(range(len(scores)), key=lambda idx: (-scores[idx], idx))[:k]
+    return [(idx, float(scores[idx])) for idx in order]
+
+
+def test_matches_full_sort_with_ties() -> None:
+    rng = np.random.default_rng(0)
+    for _ in range(200):
+        n = int(rng.integers(1, 60))
+        # Few distinct values, so ties at the k-th position are common.
+        scores = rng.integers(0, 5, n).astype(np.float32)
+        k = int(rng.integers(1, 70))
+        assert top_k(scores, k) == _reference(scores, k)
+
+
+def test_all_ties_rank_by_index() -> None:
+    assert top_k_indices(np.zeros(10), 4).tolist() == [0, 1, 2, 3]
+
+
+def test_min_score_cutoff() -> None:
+    scores = np.array([0.1, 0.9, 0.5, 0.5, 0.0])
+    assert top_k(scores, 3, min_score=0.5) == [(1, 0.9), (2, 0.5), (3, 0.5)]
+    assert top_k(scores, 10, min_score=0.6) == [(1, 0.9)]
+    assert top_k(scores, 3, min_score=2.0) == []
+
+
+def test_empty_and_non_positive_k() -> None:
+    assert top_k(np.empty(0), 3) == []
+    assert top_k(np.ones(3), 0) == []
+    with pytest.raises(ValueError):
+        top_k_indices(np.ones((2, 2)), 1)
+
+
+def test_batch_matches_per_row() -> None:
+    rng = np.random.default_rng(1)
+    scores = rng.integers(0, 4, (30, 25)).astype(np.float64)
+    scores[::3] = rng.standard_normal((10, 25))
+    for k in (1, 5, 25, 40):
+        assert top_k_batch(scores, k) == [_reference(row, k) for row in scores]
+    assert top_k_batch(scores, 3, min_score=2.0) == [
+        top_k(row, 3, min_score=2.0) for row in scores
+    ]
+    assert top_k_batch(np.empty((2, 0)), 3) == [[], []]
+    with pytest.raises(ValueError):
+        top_k_batch(np.ones(3), 1)
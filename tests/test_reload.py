@@ -0,0 +1,74 @@
+import asyncio
+
+import pytest
+
+from src.app.reload import IndexManager
+
+
+class _FakeService:
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.generation = 0
+        self.closed = False
+        self.adopted = None
+
+    def adopt_warm_state(self, previous: "_FakeService") -> None:
+        self.adopted = previous
+
+    def close(self) -> None:
+        self.closed = True
+
+
+def _manager(names):
+    names = iter(names)
+    swaps = []
+    manager = IndexManager(
+        lambda: _FakeService(next(names)),
+        make_batcher=lambda service: f"batcher-{service.name}",
+        on_swap=swaps.append,
+    )
+    return manager, swaps
+
+
+def test_reload_swaps_generation_and_closes_idle_old_service() -> None:
+    manager, swaps = _manager(["a", "b"])
+    old = manager.current
+
+    new = asyncio.run(manager.reload())
+
+    assert manager.current is new
+    assert new.generation == 1 and new.service.generation == 1
+    assert new.batcher == "batcher-b"
+    assert new.service.adopted is old.service
+    assert old.service.closed
+    assert [generation.service.name for generation in swaps] == ["a", "b"]
+
+
+def test_leased_generation_stays_open_until_released() -> None:
+    manager, _ = _manager(["a", "b"])
+
+    with manager.lease() as generation:
+        asyncio.run(manager.reload())
+        assert generation.service.name == "a"
+        assert not generation.service.closed
+        with manager.lease() as newer:
+            assert newer.service.name == "b"
+    assert generation.service.closed
+    assert not manager.current.service.closed
+
+
+def test_failed_reload_keeps_current_generation() -> None:
+    def load():
+        if calls:
+            raise FileNotFoundError("params.json")
+        calls.append(1)
+        return _FakeService("a")
+
+    calls = []
+    manager = IndexManager(load)
+    current = manager.current
+
+    with pytest.raises(FileNotFoundError):
+        asyncio.run(manager.reload())
+    assert manager.current is current
+    assert not current.service.closed
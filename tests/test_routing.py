@@ -0,0 +1,49 @@
+from src.app.routing import ModeRouter
+
+
+def test_prefers_best_mode_that_fits_budget() -> None:
+    router = ModeRouter(["dense", "bm25"], concurrency=4)
+    assert router.choose(0.1) == "dense"
+    router.observe("dense", 0.5)
+    router.observe("bm25", 0.01)
+    assert router.choose(1.0) == "dense"
+    assert router.choose(0.1) == "bm25"
+
+
+def test_falls_back_to_cheapest_when_nothing_fits() -> None:
+    router = ModeRouter(["hybrid", "dense", "bm25"], concurrency=1)
+    router.observe("hybrid", 0.9)
+    router.observe("dense", 0.6)
+    router.observe("bm25", 0.7)
+    assert router.choose(0.05) == "dense"
+    assert router.choose(None) == "hybrid"
+
+
+def test_estimates_follow_ewma_and_scale_with_load() -> None:
+    router = ModeRouter(["dense"], alpha=0.5, concurrency=2, clock=lambda: 0.0)
+    router.observe("dense", 1.0)
+    router.observe("dense", 3.0)
+    assert router.estimates["dense"] == 2.0
+    router.in_flight = 2
+    assert router.predict("dense") == 4.0
+
+
+def test_demoted_mode_is_retried_once_its_estimate_decays() -> None:
+    now = [0.0]
+    router = ModeRouter(
+        ["hybrid", "bm25"], concurrency=1, half_life_seconds=10.0, clock=lambda: now[0]
+    )
+    router.observe("hybrid", 0.8)
+    router.observe("bm25", 0.01)
+    assert router.choose(0.3) == "bm25"
+
+    now[0] = 10.0
+    assert router.predict("hybrid") == 0.4
+    assert router.choose(0.3) == "bm25"
+    now[0] = 20.0
+    assert router.choose(0.3) == "hybrid"
+
+    # The stale average carries a quarter of its usual weight.
+    router.observe("hybrid", 0.1)
+    assert abs(router.estimates["hybrid"] - (0.8 + (1 - 0.8 * 0.25) * (0.1 - 0.8))) < 1e-12
+    assert router.choose(0.3) == "hybrid"